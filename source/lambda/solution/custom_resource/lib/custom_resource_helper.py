@@ -27,6 +27,7 @@ from solution.custom_resource.lib.cloudwatch_events import CloudWatchEvents
 from solution.custom_resource.lib.console_deployment import ConsoleDeployment
 from solution.custom_resource.lib.step_functions import StepFunctions
 from solution.custom_resource.lib.utils import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB, backfill_latest_status
 from solution.custom_resource.lib.utils import (
     sanitize,
     send_metrics,
@@ -163,6 +164,8 @@ def cfn_handler(event: events.CloudFormationCustomResourceEvent, context: Lambda
             response_data = handle_prefix(event)
         elif resource_type == "Custom::CreateServiceLinkedRole":
             response_data = create_service_linked_role(event)
+        elif resource_type == "Custom::BackfillLatestStatus":
+            response_data = handle_latest_status_backfill(event)
 
         logger.info("Completed successfully, sending response to cfn")
     except Exception as err:
@@ -264,6 +267,26 @@ def handle_prefix(event: events.CloudFormationCustomResourceEvent):
     return response
 
 
+def handle_latest_status_backfill(event: events.CloudFormationCustomResourceEvent):
+    """Adds the audit items written before the LatestStatus index existed to the index
+
+    Args:
+        event (dict): event from CloudFormation on create, update or delete
+
+    Returns:
+        dict: number of updated items
+
+        {
+            Updated: string
+        }
+    """
+    response = {}
+    if event["RequestType"] == "Create" or event["RequestType"] == "Update":
+        table_name = event["ResourceProperties"].get("TableName")
+        response = {"Updated": str(backfill_latest_status(DDB(table_name)))}
+    return response
+
+
 def handle_metrics(event: events.CloudFormationCustomResourceEvent):
     """Handles sending launch parameters to aws-solutions 
 
@@ -0,0 +1,48 @@
+#!/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_resource
+
+CHECKPOINT_DATE_FORMAT = '%Y-%m-%d'
+
+
+class MetricsCheckpoint:
+    """Last day collected for each TGW, stored in DynamoDB keyed by TgwId"""
+
+    def __init__(self, table_name: str) -> None:
+        self.table = get_resource('dynamodb').Table(table_name)
+
+    def get_last_collected_date(self, tgw_id: str) -> Optional[date]:
+        item = self.table.get_item(Key={'TgwId': tgw_id}, ConsistentRead=True).get('Item')
+        if not item:
+            return None
+        return datetime.strptime(item['LastCollectedDate'], CHECKPOINT_DATE_FORMAT).date()
+
+    def advance(self, tgw_id: str, last_collected_date: date) -> bool:
+        """Move the checkpoint forward, a backfill of older days never moves it back
+
+        Returns:
+            True if the checkpoint was updated
+        """
+        collected = last_collected_date.strftime(CHECKPOINT_DATE_FORMAT)
+        try:
+            self.table.put_item(
+                Item={
+                    'TgwId': tgw_id,
+                    'LastCollectedDate': collected,
+                    'UpdatedAt': datetime.now(timezone.utc).isoformat()
+                },
+                ConditionExpression='attribute_not_exists(TgwId) OR LastCollectedDate < :collected',
+                ExpressionAttributeValues={':collected': collected}
+            )
+            return True
+        except ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
@@ -3,45 +3,192 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
-import boto3
+import queue
+import threading
+import time
 import hashlib
-from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional, Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timezone, timedelta
+from typing import List, Dict, Optional, Any, Tuple
 from aws_lambda_powertools import Logger
 
-from solution.tgw_vpc_attachment.lib.utils.metrics import Metrics
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.metrics_collector.checkpoint import MetricsCheckpoint
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
+from solution.tgw_vpc_attachment.lib.utils.concurrency import run_concurrently
+from solution.tgw_vpc_attachment.lib.utils.metrics import get_metrics_sink
 
 
 AWS_TRANSIT_GATEWAY_NAMESPACE = 'AWS/TransitGateway'
 METRICS_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+MAX_QUERIES_PER_REQUEST = 500
+MAX_DATAPOINTS_PER_REQUEST = 100800
+BACKFILL_ACTION = 'backfill'
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """CloudWatch metric collected for the TGW and each attachment
+
+    Attributes:
+        key: field name in the emitted payload
+        metric_name: CloudWatch metric name
+        stat: statistic to retrieve
+        period: period in seconds
+        namespace: CloudWatch namespace
+    """
+
+    key: str
+    metric_name: str
+    stat: str = 'Sum'
+    period: int = 86400
+    namespace: str = AWS_TRANSIT_GATEWAY_NAMESPACE
+
+
+METRIC_SPECS: Tuple[MetricSpec, ...] = (
+    MetricSpec('bytes_in', 'BytesIn'),
+    MetricSpec('bytes_out', 'BytesOut'),
+    MetricSpec('drops_packets', 'PacketDropCountBlackhole'),
+    MetricSpec('drops_bytes', 'ByteDropCountBlackhole'),
+)
+
+
+def build_metric_queries(specs: Tuple[MetricSpec, ...], dimension_sets: List[List[Dict[str, str]]]) -> List[Dict[str, Any]]:
+    """Build one query per spec and target, the query id encodes the spec index and the target position"""
+    return [
+        {
+            'Id': f'm{spec_index}_{position}',
+            'MetricStat': {
+                'Metric': {'Namespace': spec.namespace, 'MetricName': spec.metric_name, 'Dimensions': dimensions},
+                'Period': spec.period,
+                'Stat': spec.stat
+            }
+        }
+        for position, dimensions in enumerate(dimension_sets)
+        for spec_index, spec in enumerate(specs)
+    ]
+
+
+def decode_metric_results(results: List[Dict[str, Any]], spec_count: int, target_count: int,
+                          start_time: datetime, day_count: int = 1) -> List[List[List[float]]]:
+    """Decode daily query results into columns[day][spec][target position], missing values are 0"""
+    columns: List[List[List[float]]] = [
+        [[0.0] * target_count for _ in range(spec_count)] for _ in range(day_count)
+    ]
+    for result in results:
+        spec_index, position = result['Id'][1:].split('_')
+        for timestamp, value in zip(result.get('Timestamps', []), result.get('Values', [])):
+            day = (timestamp - start_time).days
+            if 0 <= day < day_count:
+                columns[day][int(spec_index)][int(position)] = value
+    return columns
+
+
+def get_collection_days(event: Dict[str, Any], last_collected_date: Optional[date]) -> List[date]:
+    """Days to collect, oldest first, never including today
+
+    A backfill event collects detail.start_date to detail.end_date. Otherwise the collector resumes
+    the day after the checkpoint, at most MAX_BACKFILL_DAYS days back, or collects the previous day.
+
+    Raises:
+        ValueError: a backfill event without detail.start_date
+    """
+    yesterday: date = (datetime.now(timezone.utc) - timedelta(days=1)).date()
+    detail: Dict[str, Any] = event.get('detail') or {}
+    if detail.get('action') == BACKFILL_ACTION:
+        if not detail.get('start_date'):
+            raise ValueError("Backfill events require detail.start_date (YYYY-MM-DD)")
+        first_day: date = date.fromisoformat(detail['start_date'])
+        last_day: date = min(date.fromisoformat(detail.get('end_date', yesterday.isoformat())), yesterday)
+    else:
+        last_day = yesterday
+        max_days: int = int(os.environ.get('MAX_BACKFILL_DAYS', '14'))
+        first_day = max(last_collected_date + timedelta(days=1), yesterday - timedelta(days=max_days - 1)) \
+            if last_collected_date else yesterday
+    return [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+
+def get_collection_targets(event: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    """(TGW id, region) pairs to collect
+
+    Taken from detail.targets of the event ([{"TgwId": ..., "Region": ...}]), then from the
+    COLLECTOR_TARGETS variable ("tgw-1:us-east-1,tgw-2:eu-west-1"), then from TGW_ID in the Lambda region.
+    """
+    detail: Dict[str, Any] = event.get('detail') or {}
+    targets: List[Tuple[str, Optional[str]]] = [
+        (target['TgwId'], target.get('Region')) for target in detail.get('targets') or []
+    ]
+    if not targets:
+        for target in os.environ.get('COLLECTOR_TARGETS', '').split(','):
+            if target.strip():
+                tgw_id, _, region = target.strip().partition(':')
+                targets.append((tgw_id, region or None))
+    if not targets and os.environ.get('TGW_ID'):
+        targets.append((os.environ['TGW_ID'], None))
+    # the same TGW listed twice would emit its metrics twice
+    return list(dict.fromkeys(targets))
+
+
+class RateLimiter:
+    """Spaces out calls shared by several threads to at most rate_per_second"""
+
+    def __init__(self, rate_per_second: float) -> None:
+        self.interval: float = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.next_call: float = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
 
-ec2_client = boto3.client('ec2', config=boto3_config)
-cloudwatch_client = boto3.client('cloudwatch', config=boto3_config)
 
 class MetricsCollector:
     
-    def __init__(self, event: Dict[str, Any], logger: Logger) -> None:
+    def __init__(self, event: Dict[str, Any], logger: Logger, tgw_id: Optional[str] = None,
+                 region: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None) -> None:
         self.event = event
         self.logger = logger
-        self.ec2_client = ec2_client
-        self.cloudwatch_client = cloudwatch_client
+        self.region: str = region or os.environ.get('AWS_REGION', '')
+        # clients are pooled per region, targets in the same region share them
+        self.ec2_client = get_client('ec2', region)
+        self.cloudwatch_client = get_client('cloudwatch', region)
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        
+        # Defaults to the single TGW managed by this solution
+        self.tgw_id: str = tgw_id or self._get_solution_tgw_id()
+        self.logger.info(f"Initialized with TGW: {self.tgw_id} in {self.region}")
         
-        # Get the single TGW managed by this solution
-        self.tgw_id: str = self._get_solution_tgw_id()
-        self.logger.info(f"Initialized with TGW: {self.tgw_id}")
+        # checkpointing is off when no table is configured, the collector then always takes the previous day
+        table_name: Optional[str] = os.environ.get('CHECKPOINT_TABLE_NAME')
+        self.checkpoint: Optional[MetricsCheckpoint] = MetricsCheckpoint(table_name) if table_name else None
+        last_collected_date: Optional[date] = \
+            self.checkpoint.get_last_collected_date(self.tgw_id) if self.checkpoint else None
         
-        # Calculate previous day start and end times once
-        previous_day = (datetime.now(timezone.utc) - timedelta(days=1)).date()
-        self.start_time: datetime = datetime.combine(previous_day, datetime.min.time()).replace(tzinfo=timezone.utc)
-        self.end_time: datetime = datetime.combine(previous_day, datetime.max.time()).replace(tzinfo=timezone.utc)
+        # all days are fetched with the same GetMetricData calls, one datapoint per day
+        self.days: List[date] = get_collection_days(event, last_collected_date)
+        self.start_time: datetime = datetime.combine(self.days[0], datetime.min.time()).replace(tzinfo=timezone.utc) \
+            if self.days else datetime.now(timezone.utc)
+        self.end_time: datetime = datetime.combine(self.days[-1], datetime.max.time()).replace(tzinfo=timezone.utc) \
+            if self.days else self.start_time
         
         self.solution_uuid: Optional[str] = os.environ.get('SOLUTION_UUID')
+        self.metrics_sink = get_metrics_sink()
         
     def collect_all_metrics(self) -> Dict[str, Any]:
         """Collect all network metrics for TGW and attachments"""
         try:
-            self.logger.info(f"Starting network metrics collection for TGW: {self.tgw_id}")
+            if not self.days:
+                return {
+                    "status": "success",
+                    "message": f"Metrics for TGW {self.tgw_id} are up to date",
+                    "solution_uuid": self.solution_uuid
+                }
+            self.logger.info(f"Starting network metrics collection for TGW: {self.tgw_id} "
+                             f"from {self.days[0]} to {self.days[-1]}")
             
           
             attachments: List[Dict[str, Any]] = self._get_tgw_attachments(self.tgw_id)
@@ -53,15 +200,23 @@ class MetricsCollector:
          
             self._collect_tgw_metrics()
             
+            # only reached when every batch succeeded, a failed run is retried from the same day
+            if self.checkpoint:
+                self.checkpoint.advance(self.tgw_id, self.days[-1])
+            
             return {
                 "status": "success", 
-                "message": f"Collected metrics for TGW {self.tgw_id} with {len(attachments)} attachments",
+                "message": f"Collected metrics for TGW {self.tgw_id} with {len(attachments)} attachments "
+                           f"for {len(self.days)} day(s)",
                 "solution_uuid": self.solution_uuid
             }
             
         except Exception as e:
             self.logger.error(f"Failed to collect metrics: {str(e)}")
             raise
+        finally:
+            # payloads still buffered would otherwise wait for the next invocation of this container
+            self.metrics_sink.flush()
 
     def _get_solution_tgw_id(self) -> str:
         """Get the single TGW ID managed by STNO solution"""
@@ -102,85 +257,71 @@ class MetricsCollector:
         return all_attachments
 
     def _collect_attachment_metrics_batch(self, attachments: List[Dict[str, Any]]) -> None:
-        """Collect metrics for attachments in batches to handle CloudWatch 500 query limit"""
-        batch_size: int = 125
-        
-        for i in range(0, len(attachments), batch_size):
-            batch: List[Dict[str, Any]] = attachments[i:i + batch_size]
-            self.logger.info(f"Processing batch {i//batch_size + 1}: {len(batch)} attachments")
-            self._collect_batch_metrics(batch)
-
-    def _collect_batch_metrics(self, attachments: List[Dict[str, Any]]) -> None:
-        """Collect metrics for a batch of attachments using single CloudWatch call"""        
-        metric_queries: List[Dict[str, Any]] = []
-        for attachment in attachments:
-            attachment_id: str = attachment['TransitGatewayAttachmentId']
-            sanitized_id: str = attachment_id.replace('-', '_')
-            
-            metric_queries.extend([
-                {
-                    'Id': f'{sanitized_id}_bytes_in',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'BytesIn',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id},
-                                {'Name': 'TransitGatewayAttachment', 'Value': attachment_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': f'{sanitized_id}_bytes_out',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'BytesOut',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id},
-                                {'Name': 'TransitGatewayAttachment', 'Value': attachment_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': f'{sanitized_id}_drops_packets',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'PacketDropCountBlackhole',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id},
-                                {'Name': 'TransitGatewayAttachment', 'Value': attachment_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': f'{sanitized_id}_drops_bytes',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'ByteDropCountBlackhole',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id},
-                                {'Name': 'TransitGatewayAttachment', 'Value': attachment_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                }
-            ])
-        
+        """Collect metrics for attachments in batches to handle CloudWatch 500 query limit.
+
+        Each query returns one datapoint per collected day, so batches shrink for long backfills to stay
+        under the datapoint limit of a single response.
+
+        Batches are fetched by a pool of workers sharing a GetMetricData rate limit, while this
+        thread emits the payloads of the batches that are done.
+        """
+        batch_size: int = max(1, min(MAX_QUERIES_PER_REQUEST // len(METRIC_SPECS),
+                                     MAX_DATAPOINTS_PER_REQUEST // (len(METRIC_SPECS) * len(self.days))))
+        batches: List[List[Dict[str, Any]]] = [attachments[i:i + batch_size] for i in range(0, len(attachments), batch_size)]
+        max_workers: int = int(os.environ.get('COLLECTOR_MAX_WORKERS', '4'))
+        rate_limiter = self.rate_limiter or RateLimiter(float(os.environ.get('COLLECTOR_REQUESTS_PER_SECOND', '10')))
+        # bounded, so fetched results never pile up faster than they are emitted
+        results: queue.Queue = queue.Queue(maxsize=max_workers * 2)
+
+        def fetch(batch_number: int, batch: List[Dict[str, Any]]) -> None:
+            try:
+                self.logger.info(f"Processing batch {batch_number + 1}: {len(batch)} attachments")
+                results.put((batch, self._get_batch_metrics(batch, rate_limiter), None))
+            except Exception as e:
+                results.put((batch, None, e))
 
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures: List[Future] = [
+                executor.submit(fetch, batch_number, batch) for batch_number, batch in enumerate(batches)
+            ]
+            errors: List[Exception] = []
+            try:
+                for _ in batches:
+                    batch, metrics_map, error = results.get()
+                    if error:
+                        self.logger.error(f"Failed to collect metrics for {len(batch)} attachments: {str(error)}")
+                        errors.append(error)
+                        continue
+                    self._emit_batch_metrics(batch, metrics_map)
+            finally:
+                # when emitting fails, running fetches block on the full queue and the executor would never
+                # shut down: pending fetches are cancelled and the results of the running ones are drained
+                for future in futures:
+                    future.cancel()
+                while not all(future.done() for future in futures):
+                    try:
+                        results.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+        if errors:
+            raise errors[0]
+
+    def _get_batch_metrics(self, attachments: List[Dict[str, Any]],
+                           rate_limiter: Optional[RateLimiter] = None) -> List[List[List[float]]]:
+        """Fetch the metrics of a batch of attachments as columns[day][spec][attachment position]"""
+        metric_queries: List[Dict[str, Any]] = build_metric_queries(METRIC_SPECS, [
+            [
+                {'Name': 'TransitGateway', 'Value': self.tgw_id},
+                {'Name': 'TransitGatewayAttachment', 'Value': attachment['TransitGatewayAttachmentId']}
+            ]
+            for attachment in attachments
+        ])
+        return decode_metric_results(self._get_metric_data(metric_queries, rate_limiter),
+                                     len(METRIC_SPECS), len(attachments), self.start_time, len(self.days))
+
+    def _get_metric_data(self, metric_queries: List[Dict[str, Any]],
+                         rate_limiter: Optional[RateLimiter] = None) -> List[Dict[str, Any]]:
+        """Run the queries and follow the pagination"""
         all_metric_results: List[Dict[str, Any]] = []
         next_token: Optional[str] = None
         
@@ -192,6 +333,8 @@ class MetricsCollector:
             }
             if next_token:
                 params['NextToken'] = next_token
+            if rate_limiter:
+                rate_limiter.wait()
             
             response = self.cloudwatch_client.get_metric_data(**params)
             all_metric_results.extend(response['MetricDataResults'])
@@ -200,28 +343,28 @@ class MetricsCollector:
             if not next_token:
                 break
         
-        metrics_map: Dict[str, Dict[str, Any]] = {result['Id']: result for result in all_metric_results}
-        
-        for attachment in attachments:
-            attachment_id: str = attachment['TransitGatewayAttachmentId']
-            sanitized_id: str = attachment_id.replace('-', '_')
-            
-            attachment_metrics: Dict[str, Dict[str, Any]] = {
-                'bytes_in': metrics_map.get(f'{sanitized_id}_bytes_in', {}),
-                'bytes_out': metrics_map.get(f'{sanitized_id}_bytes_out', {}),
-                'drops_packets': metrics_map.get(f'{sanitized_id}_drops_packets', {}),
-                'drops_bytes': metrics_map.get(f'{sanitized_id}_drops_bytes', {})
-            }
-            
-            self._emit_attachment_metrics(attachment, attachment_metrics)
+        return all_metric_results
+
+    def _emit_batch_metrics(self, attachments: List[Dict[str, Any]], columns: List[List[List[float]]]) -> None:
+        """Emit metrics for every attachment and day of a fetched batch"""
+        for day_index in range(len(self.days)):
+            for position, attachment in enumerate(attachments):
+                self._emit_attachment_metrics(attachment, self._metric_values(columns, day_index, position))
+
+    def _metric_values(self, columns: List[List[List[float]]], day_index: int, position: int) -> Dict[str, Any]:
+        day: date = self.days[day_index]
+        values: Dict[str, Any] = {
+            spec.key: int(column[position]) for spec, column in zip(METRIC_SPECS, columns[day_index])
+        }
+        values.update({
+            "window_start": datetime.combine(day, datetime.min.time()).strftime(METRICS_TIMESTAMP_FORMAT),
+            "window_end": datetime.combine(day, datetime.max.time()).strftime(METRICS_TIMESTAMP_FORMAT)
+        })
+        return values
 
-    def _emit_attachment_metrics(self, attachment: Dict[str, Any], attachment_metrics: Dict[str, Dict[str, Any]]) -> None:
+    def _emit_attachment_metrics(self, attachment: Dict[str, Any], metric_values: Dict[str, Any]) -> None:
         """Emit metrics for a single attachment"""
         attachment_id: str = attachment['TransitGatewayAttachmentId']
-        bytes_in: float = attachment_metrics['bytes_in'].get('Values', [0])[0] if attachment_metrics['bytes_in'].get('Values') else 0
-        bytes_out: float = attachment_metrics['bytes_out'].get('Values', [0])[0] if attachment_metrics['bytes_out'].get('Values') else 0
-        drops_packets: float = attachment_metrics['drops_packets'].get('Values', [0])[0] if attachment_metrics['drops_packets'].get('Values') else 0
-        drops_bytes: float = attachment_metrics['drops_bytes'].get('Values', [0])[0] if attachment_metrics['drops_bytes'].get('Values') else 0
         
         attachment_created_at = attachment.get('CreationTime')
         if attachment_created_at:
@@ -233,7 +376,7 @@ class MetricsCollector:
             "solution": "SO0058",
             "account_id": os.environ.get('AWS_ACCOUNT_ID', ''),
             "stack_id": os.environ.get('STACK_ID', ''),
-            "region": os.environ.get('AWS_REGION', ''),
+            "region": self.region,
             "data": {
                 "event": {
                     "type": "tgw_attachment",
@@ -244,18 +387,11 @@ class MetricsCollector:
                     "attachment_id_hash": hashlib.sha256(attachment_id.encode()).hexdigest(),
                     "created_at": attachment_created_at
                 },
-                "metrics": {
-                    "bytes_in": int(bytes_in),
-                    "bytes_out": int(bytes_out),
-                    "drops_packets": int(drops_packets),
-                    "drops_bytes": int(drops_bytes),
-                    "window_start": self.start_time.strftime(METRICS_TIMESTAMP_FORMAT),
-                    "window_end": self.end_time.strftime(METRICS_TIMESTAMP_FORMAT)
-                }
+                "metrics": metric_values
             }
         }
         
-        Metrics().metrics(payload)
+        self.metrics_sink.put(payload)
         self.logger.debug(f"Emitted metrics for attachment {attachment_id}")
 
     def _collect_tgw_metrics(self) -> None:
@@ -266,77 +402,17 @@ class MetricsCollector:
             tgw_created_at = tgw_info['TransitGateways'][0]['CreationTime'].strftime(METRICS_TIMESTAMP_FORMAT)
         
         # Get TGW-level metrics
-        response = self.cloudwatch_client.get_metric_data(
-            MetricDataQueries=[
-                {
-                    'Id': 'tgw_bytes_in',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'BytesIn',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': 'tgw_bytes_out',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'BytesOut',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': 'tgw_drops_packets',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'PacketDropCountBlackhole',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                },
-                {
-                    'Id': 'tgw_drops_bytes',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': AWS_TRANSIT_GATEWAY_NAMESPACE,
-                            'MetricName': 'ByteDropCountBlackhole',
-                            'Dimensions': [
-                                {'Name': 'TransitGateway', 'Value': self.tgw_id}
-                            ]
-                        },
-                        'Period': 86400,
-                        'Stat': 'Sum'
-                    }
-                }
-            ],
-            StartTime=self.start_time,
-            EndTime=self.end_time
-        )
-        
-        # Extract metrics
-        metrics_map: Dict[str, Dict[str, Any]] = {result['Id']: result for result in response['MetricDataResults']}
-        
-        bytes_in: float = metrics_map.get('tgw_bytes_in', {}).get('Values', [0])[0] if metrics_map.get('tgw_bytes_in', {}).get('Values') else 0
-        bytes_out: float = metrics_map.get('tgw_bytes_out', {}).get('Values', [0])[0] if metrics_map.get('tgw_bytes_out', {}).get('Values') else 0
-        drops_packets: float = metrics_map.get('tgw_drops_packets', {}).get('Values', [0])[0] if metrics_map.get('tgw_drops_packets', {}).get('Values') else 0
-        drops_bytes: float = metrics_map.get('tgw_drops_bytes', {}).get('Values', [0])[0] if metrics_map.get('tgw_drops_bytes', {}).get('Values') else 0
+        metric_queries: List[Dict[str, Any]] = build_metric_queries(
+            METRIC_SPECS, [[{'Name': 'TransitGateway', 'Value': self.tgw_id}]])
+        columns: List[List[List[float]]] = decode_metric_results(
+            self._get_metric_data(metric_queries, self.rate_limiter), len(METRIC_SPECS), 1, self.start_time,
+            len(self.days))
         
+        for day_index in range(len(self.days)):
+            self._emit_tgw_metrics(tgw_created_at, self._metric_values(columns, day_index, 0))
+        self.logger.info(f"Emitted TGW-level metrics for {self.tgw_id}")
+
+    def _emit_tgw_metrics(self, tgw_created_at: Optional[str], metric_values: Dict[str, Any]) -> None:
         # Create TGW payload
         payload: Dict[str, Any] = {
             "uuid": self.solution_uuid,
@@ -344,7 +420,7 @@ class MetricsCollector:
             "solution": "SO0058",
             "account_id": os.environ.get('AWS_ACCOUNT_ID', ''),
             "stack_id": os.environ.get('STACK_ID', ''),
-            "region": os.environ.get('AWS_REGION', ''),
+            "region": self.region,
             "data": {
                 "event": {
                     "type": "tgw",
@@ -354,17 +430,52 @@ class MetricsCollector:
                     "tgw_id_hash": hashlib.sha256(self.tgw_id.encode()).hexdigest(),
                     "created_at": tgw_created_at
                 },
-                "metrics": {
-                    "bytes_in": int(bytes_in),
-                    "bytes_out": int(bytes_out),
-                    "drops_packets": int(drops_packets),
-                    "drops_bytes": int(drops_bytes),
-                    "window_start": self.start_time.strftime(METRICS_TIMESTAMP_FORMAT),
-                    "window_end": self.end_time.strftime(METRICS_TIMESTAMP_FORMAT)
-                }
+                "metrics": metric_values
             }
         }
         
        
-        Metrics().metrics(payload)
-        self.logger.info(f"Emitted TGW-level metrics for {self.tgw_id}")
+        self.metrics_sink.put(payload)
+
+
+def collect_all_targets(event: Dict[str, Any], logger: Logger) -> Dict[str, Any]:
+    """Collect the metrics of every target concurrently
+
+    A failed target is reported in the summary without stopping the others, the run only fails
+    when no target succeeded.
+    """
+    targets: List[Tuple[str, Optional[str]]] = get_collection_targets(event)
+    if not targets:
+        raise ValueError("TGW_ID environment variable not set")
+
+    # GetMetricData is throttled per region, targets in the same region share one limit
+    requests_per_second: float = float(os.environ.get('COLLECTOR_REQUESTS_PER_SECOND', '10'))
+    rate_limiters: Dict[Optional[str], RateLimiter] = {
+        region: RateLimiter(requests_per_second) for _, region in targets
+    }
+
+    def collect(target: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+        tgw_id, region = target
+        return MetricsCollector(event, logger, tgw_id, region, rate_limiters[region]).collect_all_metrics()
+
+    results = run_concurrently(collect, targets, int(os.environ.get('COLLECTOR_TARGET_WORKERS', '4')))
+    target_summaries: List[Dict[str, Any]] = []
+    for result in results:
+        tgw_id, region = result.item
+        summary: Dict[str, Any] = {"tgw_id": tgw_id, "region": region or os.environ.get('AWS_REGION', '')}
+        if result.error:
+            logger.error(f"Failed to collect metrics for TGW {tgw_id}: {str(result.error)}")
+            summary.update({"status": "failed", "message": str(result.error)})
+        else:
+            summary.update({"status": result.result["status"], "message": result.result["message"]})
+        target_summaries.append(summary)
+
+    failed: int = sum(1 for result in results if result.error)
+    if failed == len(results):
+        raise results[0].error
+    return {
+        "status": "partial_failure" if failed else "success",
+        "message": f"Collected metrics for {len(results) - failed} of {len(results)} transit gateway(s)",
+        "targets": target_summaries,
+        "solution_uuid": os.environ.get('SOLUTION_UUID')
+    }
@@ -8,7 +8,7 @@ import boto3
 import botocore
 from aws_lambda_powertools import Logger
 
-from solution.metrics_collector.handler import MetricsCollector
+from solution.metrics_collector.handler import collect_all_targets
 
 logger = Logger(level=os.getenv('LOG_LEVEL'), service="METRICS_COLLECTOR")
 logger.debug("boto3 version:" + boto3.__version__)
@@ -23,8 +23,7 @@ def lambda_handler(event, _context):
         logger.info("Metrics Collector - Starting scheduled metrics collection")
         logger.info(f"Event: {event}")
         
-        metrics = MetricsCollector(event, logger)
-        response = metrics.collect_all_metrics()
+        response = collect_all_targets(event, logger)
         
         logger.info(f"Metrics collection completed: {response}")
         return response
@@ -0,0 +1,93 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Peering desired-state planner module"""
+
+from dataclasses import dataclass, field
+
+from solution.tgw_peering_attachment.lib.utils import TGWPeer, AttachmentState
+
+# attachments created by the hub that still have to be accepted by the peer region
+ACCEPTABLE_STATES = {
+    AttachmentState.INITIATING.value,
+    AttachmentState.INITIATING_REQUEST.value,
+    AttachmentState.PENDING_ACCEPTANCE.value,
+}
+
+
+@dataclass
+class PeeringPlan:
+    """Changes needed to reach the peers of the tag value
+
+    Attributes:
+        create: peers without a peering attachment
+        delete: peering attachments no longer in the tag value
+        accept: existing peering attachments waiting for acceptance, created ones are added when applied
+        unchanged: peering attachments in the tag value that already exist
+    """
+
+    create: list[TGWPeer] = field(default_factory=list)
+    delete: list[TGWPeer] = field(default_factory=list)
+    accept: list[TGWPeer] = field(default_factory=list)
+    unchanged: list[TGWPeer] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        def _peers(peers: list[TGWPeer]) -> list[dict]:
+            return [
+                {
+                    "TransitGatewayId": peer.transit_gateway,
+                    "Region": peer.aws_region,
+                    "AttachmentId": peer.attachment_id,
+                    "State": peer.state,
+                }
+                for peer in peers
+            ]
+
+        return {
+            "Create": _peers(self.create),
+            "Delete": _peers(self.delete),
+            "Accept": _peers(self.accept),
+            "Unchanged": _peers(self.unchanged),
+        }
+
+
+def parse_peering_tag(tag_value: str) -> dict[tuple[str, str], TGWPeer]:
+    """Desired peers of the tag value indexed by (tgw id, region), 'Delete' desires no peer
+
+    Example: tgw-010101010abababab_us-east-1/tgw-010101011abababab_us-east-2
+    """
+    if tag_value.upper() == "DELETE":
+        return {}
+    desired: dict[tuple[str, str], TGWPeer] = {}
+    for peer_string in tag_value.split("/"):
+        transit_gateway_id, region = peer_string.split("_")[:2]
+        desired[(transit_gateway_id, region)] = TGWPeer(transit_gateway=transit_gateway_id, aws_region=region)
+    return desired
+
+
+def plan_peering_changes(tag_value: str, current_peers: list[TGWPeer]) -> PeeringPlan:
+    """Diffs the desired peers of the tag value against the current peering attachments
+
+    Args:
+        tag_value (str): value of the peering tag
+        current_peers (list[TGWPeer]): peering attachments of the hub, from a single describe
+
+    Returns:
+        PeeringPlan: peers to create, delete and accept
+    """
+    desired = parse_peering_tag(tag_value)
+    current: dict[tuple[str, str], TGWPeer] = {}
+    plan = PeeringPlan()
+    for peer in current_peers:
+        key = (peer.transit_gateway, peer.aws_region)
+        if key not in desired:
+            plan.delete.append(peer)
+        elif key in current:
+            # a second attachment to the same peer is redundant
+            plan.delete.append(peer)
+        else:
+            current[key] = peer
+            plan.unchanged.append(peer)
+            if peer.state in ACCEPTABLE_STATES:
+                plan.accept.append(peer)
+    plan.create = [peer for key, peer in desired.items() if key not in current]
+    return plan
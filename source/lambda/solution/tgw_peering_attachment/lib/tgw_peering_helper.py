@@ -2,18 +2,60 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import asyncio
+import functools
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from os import environ
 
 from aws_lambda_powertools import Logger
 from botocore.exceptions import ClientError
 
+from solution.tgw_peering_attachment.lib.peering_planner import plan_peering_changes
 from solution.tgw_peering_attachment.lib.transit_gateway import TGWPeering
 from solution.tgw_peering_attachment.lib.utils import TGWPeer, AttachmentState
 
 logger = Logger(os.getenv('LOG_LEVEL'))
 
+# upper bound of peering API calls and waiters in flight
+PEERING_MAX_CONCURRENCY = int(os.getenv("PEERING_MAX_CONCURRENCY", "10"))
+
+# event detail action of the scheduled acceptance sweep
+ACCEPT_PENDING_PEERING_ACTION = "accept_pending_peering"
+DEFERRED_ACCEPTANCE_MODE = "deferred"
+
+
+def use_bounded_executor() -> None:
+    """Bounds the blocking calls and waiters offloaded by run_blocking and asyncio.to_thread
+
+    The executor is shut down by asyncio.run at the end of the invocation.
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=PEERING_MAX_CONCURRENCY)
+    )
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking boto3 call on the executor of the running loop"""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def gather_logging_errors(coros, errors: tuple) -> list:
+    """Awaits all coroutines concurrently, the expected errors are logged as warnings
+
+    Returns:
+        list: results in the order of the coroutines, the logged errors in place of their result
+    """
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, errors):
+            logger.warning(str(result))
+        elif isinstance(result, BaseException):
+            raise result
+    return results
+
 
 def validate_tag(event: dict):
     """Validates if the transit gateway tag is consistent with the format
@@ -39,14 +81,22 @@ def validate_tag(event: dict):
             raise ValueError("INVALID_TAG")
 
 
-async def tag_event_router(tag_value: str) -> None:
+async def tag_event_router(tag_value: str, dry_run: bool = False) -> dict:
     """Handles tag events for transit gateway
 
     The tag_value string is composed of multiple elements seperated by the slash character '/'.
     Each element consists of a tgw id and an aws region seperated by underscore '_' character.
     Example: tgw-010101010abababab_us-east-1/tgw-010101011abababab_us-east-2
+
+    Args:
+        tag_value (str): value of the peering tag
+        dry_run (bool): only plan the changes
+
+    Returns:
+        dict: the peering plan
     """
     logger.debug("handling tgw tag event")
+    use_bounded_executor()
     hub_tgw_id = environ.get("TGW_ID")
     tgw = TGWPeering()
     current_peers: list[TGWPeer] = tgw.get_tgw_peers(
@@ -62,68 +112,83 @@ async def tag_event_router(tag_value: str) -> None:
     )
 
     logger.debug("current tgw peers %s", current_peers)
-    current_peer_tgw_ids: list[str] = [i.transit_gateway for i in current_peers]
-
-    if tag_value.upper() == "DELETE":
-        await delete_all_peering_attachments(current_peers, tgw)
-    else:
-        await create_new_peering_attachments(current_peer_tgw_ids, hub_tgw_id, tag_value, tgw)
-
-        await delete_undesired_peering_attachments(current_peers, tag_value, tgw)
+    plan = plan_peering_changes(tag_value, current_peers)
+    logger.info("peering plan %s", plan.to_dict())
+    if dry_run:
+        return plan.to_dict()
 
-        await accept_all_peering_requests(hub_tgw_id, tgw)
+    created_peers = await create_peering_attachments(plan.create, hub_tgw_id, tgw)
 
+    await delete_peering_attachments(plan.delete, tgw)
 
-async def delete_all_peering_attachments(current_peers, tgw):
-    for peer in current_peers:
-        try:
-            tgw.delete_tgw_peering_attachment(peer)
-        except ClientError as err:
-            logger.warning(str(err))
-
+    if environ.get("PEERING_ACCEPTANCE_MODE", "").lower() == DEFERRED_ACCEPTANCE_MODE:
+        # the new attachments are accepted by the next acceptance sweep, no waiter runs here
+        logger.info("peering requests will be accepted by the next acceptance sweep")
+    else:
+        await accept_peering_requests(plan.accept + created_peers, tgw)
+    return plan.to_dict()
 
-async def create_new_peering_attachments(current_peer_tgw_ids, hub_tgw_id, tag_value, tgw):
-    for peer_string in tag_value.split("/"):
-        split = peer_string.split("_")
-        transit_gateway_id = split[0]
-        region = split[1]
 
-        if transit_gateway_id not in current_peer_tgw_ids:
-            try:
-                tgw.create_tgw_peering_attachment(
-                    tgw_id=hub_tgw_id,
-                    peer=TGWPeer(transit_gateway=transit_gateway_id, aws_region=region)
-                )
-            except ClientError as err:
-                logger.warning(str(err))
+async def create_peering_attachments(peers: list[TGWPeer], hub_tgw_id: str, tgw) -> list[TGWPeer]:
+    """Creates the peering attachments of the plan
 
+    Returns:
+        list[TGWPeer]: created peers with their attachment id
+    """
+    coros = [run_blocking(tgw.create_tgw_peering_attachment, tgw_id=hub_tgw_id, peer=peer) for peer in peers]
+    results = await gather_logging_errors(coros, (ClientError,))
+    created_peers: list[TGWPeer] = []
+    for peer, attachment in zip(peers, results):
+        if isinstance(attachment, dict):
+            created_peers.append(TGWPeer(
+                transit_gateway=peer.transit_gateway,
+                aws_region=peer.aws_region,
+                attachment_id=attachment.get("TransitGatewayAttachmentId"),
+                state=attachment.get("State"),
+            ))
+    return created_peers
+
+
+async def delete_peering_attachments(peers: list[TGWPeer], tgw) -> None:
+    coros = [run_blocking(tgw.delete_tgw_peering_attachment, peer) for peer in peers]
+    await gather_logging_errors(coros, (KeyError, ClientError))
+
+
+async def accept_peering_requests(peers: list[TGWPeer], tgw) -> None:
+    coros = [
+        tgw.accept_tgw_peering_attachment(peer) for peer in peers
+    ]
+    await asyncio.gather(*coros, return_exceptions=True)  # fail silently
+    logger.info(
+        "peering requests accepted, for failed requests turn debug mode and check logs"
+    )
 
-async def delete_undesired_peering_attachments(current_peers, tag_value, tgw):
-    # determine desired peers according to the new tag value
-    desired_peer_tgw_ids: list[str] = [peer_string.split("_")[0] for peer_string in tag_value.split("/")]
 
-    # determine which peers from the current state are no longer desired
-    peers_to_delete = [peer for peer in current_peers if peer.transit_gateway not in desired_peer_tgw_ids]
-    for peer in peers_to_delete:
-        try:
-            tgw.delete_tgw_peering_attachment(peer)
-        except (KeyError, ClientError) as err:
-            logger.warning(str(err))
+async def accept_ready_peering_requests(hub_tgw_id: str) -> list[TGWPeer]:
+    """Accepts all peering attachments of the hub that are pending acceptance, without waiting
 
+    The SolutionId tagged attachments in EC2 are the record of pending acceptances, attachments
+    still initiating are picked up by a later sweep.
 
-async def accept_all_peering_requests(hub_tgw_id, tgw):
-    # accept all peering requests
-    peering_requests: list[TGWPeer] = tgw.get_tgw_peers(
+    Returns:
+        list[TGWPeer]: peers accepted in this sweep
+    """
+    use_bounded_executor()
+    tgw = TGWPeering()
+    ready_peers: list[TGWPeer] = await run_blocking(
+        tgw.get_tgw_peers,
         tgw_id=hub_tgw_id,
-        states=[
-            AttachmentState.INITIATING,
-            AttachmentState.INITIATING_REQUEST,
-        ],
+        states=[AttachmentState.PENDING_ACCEPTANCE],
     )
-    coros = [
-        tgw.accept_tgw_peering_attachment(peer) for peer in peering_requests
-    ]
-    await asyncio.gather(*coros, return_exceptions=True)  # fail silently
-    logger.info(
-        "peering requests accepted, for failed requests turn debug mode and check logs"
+    results = await asyncio.gather(
+        *[tgw.accept_tgw_peering_attachment(peer, wait=False) for peer in ready_peers],
+        return_exceptions=True,
     )
+    accepted: list[TGWPeer] = []
+    for peer, result in zip(ready_peers, results):
+        if isinstance(result, BaseException):
+            logger.warning("failed to accept %s: %s", peer.attachment_id, str(result))
+        else:
+            accepted.append(peer)
+    logger.info("accepted %s of %s peering requests pending acceptance", len(accepted), len(ready_peers))
+    return accepted
@@ -1,8 +1,11 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import asyncio
 import os
 from os import environ
+from threading import Lock
+from typing import Optional
 
 import boto3
 from aws_lambda_powertools import Logger
@@ -12,12 +15,36 @@ from botocore.waiter import create_waiter_with_client
 
 from solution.tgw_peering_attachment.lib.utils import TGWPeer, AttachmentState, boto3_config
 
+# one EC2 client per region, kept across warm invocations
+_regional_clients: dict = {}
+_regional_clients_lock = Lock()
+
+
+def get_regional_ec2_client(region_name: Optional[str] = None):
+    """Returns the cached EC2 client of the region, the Lambda region when omitted"""
+    # keyed by the resolved region, so the hub region shares one client whether it is named or omitted
+    region_name = region_name or environ.get("AWS_REGION")
+    client = _regional_clients.get(region_name)
+    if client is None:
+        # boto3 sessions are not thread safe, client creation is serialized
+        with _regional_clients_lock:
+            client = _regional_clients.get(region_name)
+            if client is None:
+                client = boto3.client("ec2", region_name=region_name, config=boto3_config)
+                _regional_clients[region_name] = client
+    return client
+
+
+def clear_regional_client_cache() -> None:
+    with _regional_clients_lock:
+        _regional_clients.clear()
+
 
 class TGWPeering:
 
     def __init__(self):
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
-        self.ec2_client = boto3.client("ec2", config=boto3_config)
+        self.ec2_client = get_regional_ec2_client()
 
     def get_tgw_peers(
         self,
@@ -70,6 +97,7 @@ class TGWPeering:
                             attachment_id=attachment[
                                 "TransitGatewayAttachmentId"
                             ],
+                            state=attachment.get("State"),
                         )
                     )
             return tgw_peering_attachment_list
@@ -155,11 +183,12 @@ class TGWPeering:
             self.logger.error(str(log_message))
             raise
 
-    async def accept_tgw_peering_attachment(self, peer: TGWPeer) -> None:
+    async def accept_tgw_peering_attachment(self, peer: TGWPeer, wait: bool = True) -> None:
         """Accepts a transit gateway peering attachment request
 
         Args:
             tgw_attach_id (str): ID of the tgw attachment
+            wait (bool): wait for the attachment to be in pendingAcceptance state first
 
         Raise:
             WaiterError, ClientError
@@ -171,15 +200,18 @@ class TGWPeering:
         }
         self.logger.debug(str(log_message))
         try:
-            self.tgw_attachment_waiter(
-                desired_state=AttachmentState.PENDING_ACCEPTANCE,
-                attachment_id=peer.attachment_id,
-            )  # waiter for the attachment to be in PENDING_ACCEPTANCE state
-            _ec2_client = boto3.client(
-                "ec2", region_name=peer.aws_region, config=boto3_config
-            )
-            _ec2_client.accept_transit_gateway_peering_attachment(
-                TransitGatewayAttachmentId=peer.attachment_id
+            # the waiter and the accept call block, they run on the executor so that
+            # the waiters of all peers poll at the same time
+            if wait:
+                await asyncio.to_thread(
+                    self.tgw_attachment_waiter,
+                    desired_state=AttachmentState.PENDING_ACCEPTANCE,
+                    attachment_id=peer.attachment_id,
+                )  # waiter for the attachment to be in PENDING_ACCEPTANCE state
+            _ec2_client = get_regional_ec2_client(peer.aws_region)
+            await asyncio.to_thread(
+                _ec2_client.accept_transit_gateway_peering_attachment,
+                TransitGatewayAttachmentId=peer.attachment_id,
             )
         except (WaiterError, ClientError) as err:
             log_message["EXCEPTION"] = str(err)
@@ -4,7 +4,7 @@
 """Solution helper module"""
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional
 
@@ -19,11 +19,13 @@ class TGWPeer:
         transit_gateway: peer transit gateway id
         aws_region: region where tgw exists
         attachment_id: tgw attachment id for the peering tgw
+        state: state of the peering attachment, not part of the peer identity
     """
 
     transit_gateway: str
     aws_region: str
     attachment_id: Optional[str] = None
+    state: Optional[str] = field(default=None, compare=False)
 
 
 class AttachmentState(Enum):
@@ -9,6 +9,8 @@ from aws_lambda_powertools import Logger
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from solution.tgw_peering_attachment.lib.tgw_peering_helper import (
+    ACCEPT_PENDING_PEERING_ACTION,
+    accept_ready_peering_requests,
     validate_tag,
     tag_event_router,
 )
@@ -27,6 +29,9 @@ def lambda_handler(event, context: LambdaContext):
     """
     logger.info("Entering tgw-peering lambda_handler")
     logger.debug(event)
+    if event.get("detail", {}).get("action") == ACCEPT_PENDING_PEERING_ACTION:
+        asyncio.run(accept_ready_peering_requests(environ.get("TGW_ID")))
+        return
     try:
         validate_tag(event)
         environ["AWS_ACCOUNT"] = context.invoked_function_arn.split(":")[4]
@@ -42,7 +47,7 @@ def lambda_handler(event, context: LambdaContext):
         raise
 
     try:
-        asyncio.run(async_handler(event))
+        return asyncio.run(async_handler(event))
     except Exception as err:
         logger.error(str(err))
         raise
@@ -52,8 +57,12 @@ async def async_handler(event):
     """asynchronous lambda handler
 
     Args:
-        event (dict): lambda triggering event
+        event (dict): lambda triggering event, with "dry_run": true the peering plan is only returned
+
+    Returns:
+        dict: the peering plan
     """
-    await tag_event_router(
-        event["detail"]["tags"][environ.get("TGW_PEERING_TAG")]
+    return await tag_event_router(
+        event["detail"]["tags"][environ.get("TGW_PEERING_TAG")],
+        dry_run=bool(event.get("dry_run", False)),
     )
@@ -0,0 +1,97 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""boto3 client factory module"""
+import os
+from threading import Lock
+
+import boto3
+
+from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+# clients are kept alive across warm invocations so that the service model
+# and the urllib3 connection pool are only built once per
+# (service, region, credential identity)
+CLIENT_CACHE_SIZE = int(os.getenv('CLIENT_CACHE_SIZE', '128'))
+
+_session = None
+_session_lock = Lock()
+_clients = LRUCache(max_size=CLIENT_CACHE_SIZE)
+_resources = LRUCache(max_size=CLIENT_CACHE_SIZE)
+
+
+def _get_session() -> boto3.session.Session:
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def _cache_key(service_name: str, region_name: str = None, credentials: dict = None) -> tuple:
+    access_key_id = credentials.get("AccessKeyId") if credentials else None
+    return service_name, region_name, access_key_id
+
+
+def _client_kwargs(region_name: str = None, credentials: dict = None) -> dict:
+    kwargs = {"config": boto3_config}
+    if region_name:
+        kwargs["region_name"] = region_name
+    if credentials:
+        kwargs["aws_access_key_id"] = credentials.get("AccessKeyId")
+        kwargs["aws_secret_access_key"] = credentials.get("SecretAccessKey")
+        kwargs["aws_session_token"] = credentials.get("SessionToken")
+    return kwargs
+
+
+def get_client(service_name: str, region_name: str = None, credentials: dict = None):
+    """Returns a pooled low-level client for the service, region and credentials.
+
+    Args:
+        service_name: AWS service name, e.g. 'ec2'
+        region_name: AWS region, the session default is used when omitted
+        credentials: assumed role credentials, the Lambda role is used when omitted
+
+    Returns:
+        boto3 client
+    """
+    key = _cache_key(service_name, region_name, credentials)
+    client = _clients.get(key)
+    if client is None:
+        # boto3 sessions are not thread safe, client creation is serialized
+        with _session_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _get_session().client(service_name, **_client_kwargs(region_name, credentials))
+                _clients.put(key, client)
+    return client
+
+
+def get_resource(service_name: str, region_name: str = None, credentials: dict = None):
+    """Returns a pooled service resource for the service, region and credentials.
+
+    Args:
+        service_name: AWS service name, e.g. 'dynamodb'
+        region_name: AWS region, the session default is used when omitted
+        credentials: assumed role credentials, the Lambda role is used when omitted
+
+    Returns:
+        boto3 service resource
+    """
+    key = _cache_key(service_name, region_name, credentials)
+    resource = _resources.get(key)
+    if resource is None:
+        with _session_lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = _get_session().resource(service_name, **_client_kwargs(region_name, credentials))
+                _resources.put(key, resource)
+    return resource
+
+
+def clear_client_cache() -> None:
+    global _session
+    with _session_lock:
+        _clients.clear()
+        _resources.clear()
+        _session = None
@@ -6,16 +6,15 @@ import os
 import uuid
 from datetime import datetime, timezone
 
-import boto3
 from aws_lambda_powertools import Logger
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
 
 class CloudWatchLogs:
 
     def __init__(self):
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
-        self.cw_logs = boto3.client("logs", config=boto3_config)
+        self.cw_logs = get_client("logs")
 
     def log(self, log_group, message):
         """
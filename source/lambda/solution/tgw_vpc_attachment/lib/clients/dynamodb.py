@@ -4,20 +4,52 @@
 
 
 import os
+from typing import List
 
-import boto3
 from aws_lambda_powertools import Logger
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 from mypy_boto3_dynamodb import DynamoDBServiceResource
 from mypy_boto3_dynamodb.service_resource import Table
 from mypy_boto3_dynamodb.type_defs import PutItemOutputTableTypeDef
 
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_resource
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+# global secondary index of the STNO table keyed by VpcId, projects the keys and VpcCidr
+VPC_ID_INDEX = "VpcId-index"
+# sparse global secondary index of the STNO table, only the "latest" items carry its LatestStatus key
+LATEST_STATUS_INDEX = "LatestStatus-index"
+# statuses listed on the dashboard, the latest items with any other status are action items
+COMPLETED_STATUSES = ("approved", "rejected", "auto-approved", "auto-rejected")
+
+# placeholder the audit items use for unknown values
+NONE_PLACEHOLDER = "None"
+# attributes of the audit items that can be rebuilt from another attribute
+DERIVED_ATTRIBUTES = ("PropagationRouteTablesString",)
+
+_ddb_clients = LRUCache(max_size=16)
+
+
+def get_ddb(table_name: str) -> "DDB":
+    """Returns the DDB client of the table, kept across warm invocations"""
+    ddb = _ddb_clients.get(table_name)
+    if ddb is None:
+        ddb = DDB(table_name)
+        _ddb_clients.put(table_name, ddb)
+    return ddb
+
+
+def clear_ddb_cache() -> None:
+    _ddb_clients.clear()
+
 
 class DDB:
 
     def __init__(self, table_name):
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
         self.table_name = table_name
-        self.dynamodb_client: DynamoDBServiceResource = boto3.resource('dynamodb')
+        self.dynamodb_client: DynamoDBServiceResource = get_resource('dynamodb')
         self.table: Table = self.dynamodb_client.Table(self.table_name)
 
     def put_item(self, item) -> PutItemOutputTableTypeDef:
@@ -28,3 +60,93 @@ class DDB:
             self.logger.exception(f"Error while putting the item {item} in DynamoDB")
             self.logger.exception(error)
             raise error
+
+    def query_index(self, index_name: str, key_name: str, key_value: str) -> List[dict]:
+        """All items of the index with the given hash key value, across pages"""
+        query_kwargs = {
+            "IndexName": index_name,
+            "KeyConditionExpression": Key(key_name).eq(key_value),
+        }
+        items = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def scan(self, **scan_kwargs) -> List[dict]:
+        """All items of the table matching the scan arguments, across pages"""
+        items = []
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def transact_put_items(self, items: List[dict]) -> None:
+        """Puts all items in one transaction, either every item is written or none"""
+        # the client of the resource serializes the python values like Table.put_item
+        transact_items = [{"Put": {"TableName": self.table_name, "Item": item}} for item in items]
+        try:
+            self.dynamodb_client.meta.client.transact_write_items(TransactItems=transact_items)
+        except Exception as error:
+            self.logger.exception(f"Error while writing {len(items)} items to DynamoDB in a transaction")
+            self.logger.exception(error)
+            raise error
+
+
+def compact_audit_record(item: dict) -> dict:
+    """History item without the "None" placeholders and the derived attributes, the key is always kept"""
+    return {
+        key: value for key, value in item.items()
+        if key in ("SubnetId", "Version")
+        or (value is not None and value != NONE_PLACEHOLDER and key not in DERIVED_ATTRIBUTES)
+    }
+
+
+def latest_status(status: str) -> str:
+    """LatestStatus of a "latest" item, "completed" for the dashboard and "pending" for the action items"""
+    return "completed" if status in COMPLETED_STATUSES else "pending"
+
+
+def latest_audit_record(item: dict) -> dict:
+    """"latest" copy of an audit record, the only item of the record in LATEST_STATUS_INDEX"""
+    return dict(item, Version="latest", LatestStatus=latest_status(item.get("Status")))
+
+
+def backfill_latest_status(ddb: DDB) -> int:
+    """Adds LatestStatus to the "latest" items written before LATEST_STATUS_INDEX existed
+
+    Returns:
+        number of updated items
+    """
+    items = ddb.scan(
+        ProjectionExpression="SubnetId, #status",
+        ExpressionAttributeNames={"#status": "Status"},
+        FilterExpression=Attr("Version").eq("latest") & Attr("LatestStatus").not_exists(),
+    )
+    updated = 0
+    for item in items:
+        try:
+            ddb.table.update_item(
+                Key={"SubnetId": item["SubnetId"], "Version": "latest"},
+                UpdateExpression="SET LatestStatus = :latest_status",
+                # a record written meanwhile already carries the LatestStatus of its own status
+                ConditionExpression="attribute_not_exists(LatestStatus)",
+                ExpressionAttributeValues={":latest_status": latest_status(item.get("Status"))},
+            )
+            updated += 1
+        except ClientError as err:
+            if err.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+    return updated
+
+
+def write_audit_record(ddb: DDB, item: dict) -> None:
+    """Writes the versioned item of an audit record and its "latest" copy in one transaction
+
+    The versioned item is stored compact, the "latest" item keeps every attribute for the UI.
+    """
+    ddb.transact_put_items([compact_audit_record(item), latest_audit_record(item)])
@@ -5,7 +5,6 @@
 import os
 from typing import Sequence, Union, List
 
-import boto3
 from aws_lambda_powertools import Logger
 from mypy_boto3_ec2 import EC2Client
 from mypy_boto3_ec2.literals import TransitGatewayAttachmentStateType
@@ -20,9 +19,10 @@ from mypy_boto3_ec2.type_defs import DescribeVpcsResultTypeDef, VpcTypeDef, Desc
     DisableTransitGatewayRouteTablePropagationResultTypeDef, DisassociateTransitGatewayRouteTableResultTypeDef, \
     EnableTransitGatewayRouteTablePropagationResultTypeDef, GetTransitGatewayAttachmentPropagationsResultTypeDef, \
     TransitGatewayAttachmentPropagationTypeDef, GetTransitGatewayRouteTableAssociationsResultTypeDef, \
-    TransitGatewayRouteTableAssociationTypeDef, ModifyTransitGatewayVpcAttachmentResultTypeDef, TagTypeDef
+    TransitGatewayRouteTableAssociationTypeDef, ModifyTransitGatewayVpcAttachmentResultTypeDef, TagTypeDef, \
+    TransitGatewayRouteTablePropagationTypeDef
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
 from solution.tgw_vpc_attachment.lib.exceptions import resource_exception_handler, service_exception_handler
 
 
@@ -36,22 +36,16 @@ class EC2:
                 self.logger.debug(
                     "Setting up EC2 BOTO3 Client with default credentials"
                 )
-                self.ec2_client: EC2Client = boto3.client("ec2", config=boto3_config)
+                self.ec2_client: EC2Client = get_client("ec2")
             else:
                 self.logger.debug(
                     "Setting up EC2 BOTO3 Client with ASSUMED ROLE credentials"
                 )
                 cred = kwargs.get("credentials")
-                self.ec2_client: EC2Client = boto3.client(
-                    "ec2",
-                    config=boto3_config,
-                    aws_access_key_id=cred.get("AccessKeyId"),
-                    aws_secret_access_key=cred.get("SecretAccessKey"),
-                    aws_session_token=cred.get("SessionToken"),
-                )
+                self.ec2_client: EC2Client = get_client("ec2", credentials=cred)
         else:
             self.logger.info("There were no key worded variables passed.")
-            self.ec2_client: EC2Client = boto3.client("ec2", config=boto3_config)
+            self.ec2_client: EC2Client = get_client("ec2")
 
     @service_exception_handler
     @resource_exception_handler
@@ -76,6 +70,38 @@ class EC2:
             raise ValueError("Expected 1 value in describe_vpcs reponse.")
         return subnet_list[0]
 
+    @service_exception_handler
+    @resource_exception_handler
+    def describe_subnets_for_vpc(self, vpc_id: str) -> List[SubnetTypeDef]:
+        return self._describe_subnets_with_filter("vpc-id", [vpc_id])
+
+    @service_exception_handler
+    @resource_exception_handler
+    def describe_subnets_by_ids(self, subnet_ids: List[str]) -> List[SubnetTypeDef]:
+        # the subnet-id filter skips deleted subnets instead of failing the whole call
+        return self._describe_subnets_with_filter("subnet-id", subnet_ids)
+
+    def _describe_subnets_with_filter(self, filter_name: str, values: List[str]) -> List[SubnetTypeDef]:
+        return self._paginate("describe_subnets", "Subnets", Filters=[{"Name": filter_name, "Values": values}])
+
+    @service_exception_handler
+    @resource_exception_handler
+    def list_subnets(self) -> List[SubnetTypeDef]:
+        return self._paginate("describe_subnets", "Subnets")
+
+    @service_exception_handler
+    @resource_exception_handler
+    def list_vpcs(self) -> List[VpcTypeDef]:
+        return self._paginate("describe_vpcs", "Vpcs")
+
+    def _paginate(self, operation_name: str, result_key: str, **kwargs) -> list:
+        result_list = []
+        paginator = self.ec2_client.get_paginator(operation_name)
+        for page in paginator.paginate(**kwargs):
+            result_list.extend(page.get(result_key, []))
+        self.logger.debug(result_list)
+        return result_list
+
     @service_exception_handler
     @resource_exception_handler
     def describe_main_route_table_id(self, vpc_id: str) -> RouteTableTypeDef:
@@ -158,6 +184,23 @@ class EC2:
         self.logger.debug(response)
         return response
 
+    @service_exception_handler
+    @resource_exception_handler
+    def replace_route(
+            self,
+            destination: str,
+            route_table_id: str,
+            transit_gateway_id: str
+    ) -> EmptyResponseMetadataTypeDef:
+        destination_key = "DestinationPrefixListId" if destination.startswith("pl-") else "DestinationCidrBlock"
+        response = self.ec2_client.replace_route(
+            RouteTableId=route_table_id,
+            TransitGatewayId=transit_gateway_id,
+            **{destination_key: destination}
+        )
+        self.logger.debug(response)
+        return response
+
     @service_exception_handler
     @resource_exception_handler
     def describe_route_tables_for_subnet(
@@ -207,10 +250,20 @@ class EC2:
             tgw_id: str,
             vpc_id: str,
             subnet_id: str
+    ) -> CreateTransitGatewayVpcAttachmentResultTypeDef:
+        return self.create_transit_gateway_vpc_attachment_with_subnets(tgw_id, vpc_id, [subnet_id])
+
+    @service_exception_handler
+    @resource_exception_handler
+    def create_transit_gateway_vpc_attachment_with_subnets(
+            self,
+            tgw_id: str,
+            vpc_id: str,
+            subnet_ids: List[str]
     ) -> CreateTransitGatewayVpcAttachmentResultTypeDef:
         response: CreateTransitGatewayVpcAttachmentResultTypeDef = \
             self.ec2_client.create_transit_gateway_vpc_attachment(
-                TransitGatewayId=tgw_id, VpcId=vpc_id, SubnetIds=[subnet_id]
+                TransitGatewayId=tgw_id, VpcId=vpc_id, SubnetIds=subnet_ids
             )
         self.logger.debug(response)
         return response
@@ -303,6 +356,42 @@ class EC2:
 
         return transit_gateway_vpc_attachments_list
 
+    @service_exception_handler
+    @resource_exception_handler
+    def describe_transit_gateway_vpc_attachments_for_tgw(
+            self,
+            tgw_id: str
+    ) -> list[TransitGatewayVpcAttachmentTypeDef]:
+        return self._paginate(
+            "describe_transit_gateway_vpc_attachments", "TransitGatewayVpcAttachments",
+            Filters=[
+                {"Name": "transit-gateway-id", "Values": [tgw_id]},
+                {"Name": "state", "Values": ["available", "pending", "modifying"]},
+            ]
+        )
+
+    @service_exception_handler
+    @resource_exception_handler
+    def list_transit_gateway_route_table_associations(
+            self,
+            transit_gateway_route_table_id: str
+    ) -> list[TransitGatewayRouteTableAssociationTypeDef]:
+        return self._paginate(
+            "get_transit_gateway_route_table_associations", "Associations",
+            TransitGatewayRouteTableId=transit_gateway_route_table_id
+        )
+
+    @service_exception_handler
+    @resource_exception_handler
+    def get_transit_gateway_route_table_propagations(
+            self,
+            transit_gateway_route_table_id: str
+    ) -> list[TransitGatewayRouteTablePropagationTypeDef]:
+        return self._paginate(
+            "get_transit_gateway_route_table_propagations", "TransitGatewayRouteTablePropagations",
+            TransitGatewayRouteTableId=transit_gateway_route_table_id
+        )
+
     @service_exception_handler
     @resource_exception_handler
     def describe_transit_gateway_attachments(
@@ -361,6 +450,19 @@ class EC2:
         self.logger.debug(route_table_list)
         return route_table_list
 
+    @service_exception_handler
+    @resource_exception_handler
+    def describe_transit_gateway_route_tables_by_ids(
+            self,
+            route_table_ids: List[str]
+    ) -> list[TransitGatewayRouteTableTypeDef]:
+        response: DescribeTransitGatewayRouteTablesResultTypeDef = \
+            self.ec2_client.describe_transit_gateway_route_tables(
+                TransitGatewayRouteTableIds=route_table_ids
+            )
+        self.logger.debug(response.get("TransitGatewayRouteTables", []))
+        return response.get("TransitGatewayRouteTables", [])
+
     @service_exception_handler
     @resource_exception_handler
     def disable_transit_gateway_route_table_propagation(
@@ -499,6 +601,22 @@ class EC2:
         self.logger.debug(response)
         return response
 
+    @service_exception_handler
+    @resource_exception_handler
+    def modify_tgw_attachment_subnets(
+            self,
+            tgw_attachment_id: str,
+            add_subnet_ids: List[str],
+            remove_subnet_ids: List[str]
+    ) -> Union[ModifyTransitGatewayVpcAttachmentResultTypeDef, dict]:
+        response = self.ec2_client.modify_transit_gateway_vpc_attachment(
+            TransitGatewayAttachmentId=tgw_attachment_id,
+            AddSubnetIds=add_subnet_ids,
+            RemoveSubnetIds=remove_subnet_ids,
+        )
+        self.logger.debug(response)
+        return response
+
     @service_exception_handler
     @resource_exception_handler
     def create_tags(
@@ -523,10 +641,12 @@ class EC2:
     @resource_exception_handler
     def create_tags_batch(
             self,
-            resource_id: str,
+            resource_id: Union[str, Sequence[str]],
             tags_list: Sequence[TagTypeDef]):
+        # every tag of the list is written to every resource
+        resource_ids = [resource_id] if isinstance(resource_id, str) else list(resource_id)
         self.logger.debug(f"Tagging resource id {resource_id} with list of tags {tags_list}")
-        self.ec2_client.create_tags(Resources=[resource_id], Tags=tags_list)
+        self.ec2_client.create_tags(Resources=resource_ids, Tags=tags_list)
         self.logger.debug(f"Successfully tagged resource id {resource_id} with list of tags {tags_list}")
 
     @service_exception_handler
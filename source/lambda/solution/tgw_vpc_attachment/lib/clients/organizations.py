@@ -8,12 +8,24 @@ from mypy_boto3_organizations import OrganizationsClient
 from mypy_boto3_organizations.type_defs import DescribeAccountResponseTypeDef, DescribeOrganizationalUnitResponseTypeDef
 from typing import Union
 
-import boto3
 from aws_lambda_powertools import Logger
 from botocore.exceptions import ClientError
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
 from solution.tgw_vpc_attachment.lib.clients.sts import STS
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+# the org tree rarely changes and the Organizations API allows very few calls per second,
+# so parents and names are memoized across warm invocations for ORGANIZATIONS_CACHE_TTL seconds
+ORGANIZATIONS_CACHE_TTL = int(os.getenv('ORGANIZATIONS_CACHE_TTL', '900'))
+ORGANIZATIONS_CACHE_SIZE = int(os.getenv('ORGANIZATIONS_CACHE_SIZE', '2048'))
+parents_cache = LRUCache(max_size=ORGANIZATIONS_CACHE_SIZE, ttl=ORGANIZATIONS_CACHE_TTL)
+names_cache = LRUCache(max_size=ORGANIZATIONS_CACHE_SIZE, ttl=ORGANIZATIONS_CACHE_TTL)
+
+
+def clear_organizations_cache() -> None:
+    parents_cache.clear()
+    names_cache.clear()
 
 
 class Organizations:
@@ -29,16 +41,7 @@ class Organizations:
             sts = STS()
             credentials = sts.assume_role(org_role_arn, "stno-get-org-details", external_id="STNOOrganizationInformation")
 
-        if credentials is not None:
-            self.org_client: OrganizationsClient = boto3.client(
-                "organizations",
-                config=boto3_config,
-                aws_access_key_id=credentials.get("AccessKeyId"),
-                aws_secret_access_key=credentials.get("SecretAccessKey"),
-                aws_session_token=credentials.get("SessionToken"),
-            )
-        else:
-            self.org_client: OrganizationsClient = boto3.client("organizations", config=boto3_config)
+        self.org_client: OrganizationsClient = get_client("organizations", credentials=credentials)
 
     def get_account_name(self, account_id: str) -> Union[str, None]:
         self.log_message = {
@@ -46,9 +49,13 @@ class Organizations:
             "MESSAGE": f"getting account name for: XXXXXXXX{account_id[-4:]}",
         }
         self.logger.debug(json.dumps(self.log_message, indent=4))
+        account_name = names_cache.get(account_id)
+        if account_name is not None:
+            return account_name
         try:
             response: DescribeAccountResponseTypeDef = self.org_client.describe_account(AccountId=account_id)
             account_name = response.get("Account").get("Name")
+            names_cache.put(account_id, account_name)
             return account_name
         except ClientError as err:
             self.log_message["EXCEPTION"] = str(err)
@@ -61,11 +68,16 @@ class Organizations:
             "MESSAGE": f"getting OU name for: {ou_id[-4:]}",
         }
         self.logger.debug(json.dumps(self.log_message, indent=4))
+        ou_name = names_cache.get(ou_id)
+        if ou_name is not None:
+            return ou_name
         try:
             response: DescribeOrganizationalUnitResponseTypeDef = self.org_client.describe_organizational_unit(
                 OrganizationalUnitId=ou_id
             )
-            return response.get("OrganizationalUnit").get("Name")
+            ou_name = response.get("OrganizationalUnit").get("Name")
+            names_cache.put(ou_id, ou_name)
+            return ou_name
         except ClientError as err:
             self.log_message["EXCEPTION"] = str(err)
             self.logger.warning(json.dumps(self.log_message, indent=4))
@@ -80,17 +92,17 @@ class Organizations:
         current_id = account_id
         ou_path = []
         try:
-            response = self.org_client.list_parents(ChildId=current_id)
-            self.logger.debug(f"response is {response}")
-            while response["Parents"][0]["Type"] != "Root":
-                parent_id = response["Parents"][0]["Id"]
+            parent = self._get_parent(current_id)
+            self.logger.debug(f"parent is {parent}")
+            while parent["Type"] != "Root":
+                parent_id = parent["Id"]
                 self.logger.debug(f"parent id is : {parent_id}")
                 ou_name = self.get_ou_name(parent_id)
                 if not ou_name:
                     break
                 ou_path.append(ou_name)
                 current_id = parent_id
-                response = self.org_client.list_parents(ChildId=current_id)
+                parent = self._get_parent(current_id)
             ou_path.append("Root")
             ou_path.reverse()
             ou_path_string = "/".join(ou_path) + "/"
@@ -103,3 +115,10 @@ class Organizations:
             self.log_message["EXCEPTION"] = str(e)
             self.logger.warning(json.dumps(self.log_message, indent=4))
             return None
+
+    def _get_parent(self, child_id: str) -> dict:
+        parent = parents_cache.get(child_id)
+        if parent is None:
+            parent = self.org_client.list_parents(ChildId=child_id)["Parents"][0]
+            parents_cache.put(child_id, parent)
+        return parent
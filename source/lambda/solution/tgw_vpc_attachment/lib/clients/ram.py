@@ -5,11 +5,10 @@
 import os
 from typing import List
 
-import boto3
 from aws_lambda_powertools import Logger
 from mypy_boto3_ram.type_defs import GetResourceShareInvitationsResponseTypeDef, ResourceShareInvitationTypeDef
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
 
 
 class RAM:
@@ -20,14 +19,7 @@ class RAM:
             "Setting up RAM BOTO3 Client with ASSUMED ROLE credentials"
         )
         cred = kwargs.get("credentials")
-        self.ram_client = boto3.client(
-            "ram",
-            region_name=region,
-            config=boto3_config,
-            aws_access_key_id=cred.get("AccessKeyId"),
-            aws_secret_access_key=cred.get("SecretAccessKey"),
-            aws_session_token=cred.get("SessionToken"),
-        )
+        self.ram_client = get_client("ram", region_name=region, credentials=cred)
 
     def get_resource_share_invitations(self, resource_share_arn) -> List[ResourceShareInvitationTypeDef]:
         """
@@ -0,0 +1,27 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+from aws_lambda_powertools import Logger
+from mypy_boto3_s3 import S3Client
+from mypy_boto3_s3.type_defs import PutObjectOutputTypeDef
+
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
+
+
+class S3:
+
+    def __init__(self):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.s3_client: S3Client = get_client("s3")
+
+    def put_object(self, bucket: str, key: str, body: bytes) -> PutObjectOutputTypeDef:
+        try:
+            response = self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+            return response
+        except Exception as error:
+            self.logger.exception(f"Error while putting the object {key} in the bucket {bucket}")
+            self.logger.exception(error)
+            raise error
@@ -4,19 +4,18 @@
 
 import os
 
-import boto3
 from aws_lambda_powertools import Logger
 from mypy_boto3_sns import SNSClient
 from mypy_boto3_sns.type_defs import PublishResponseTypeDef
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
 
 
 class SNS:
 
     def __init__(self):
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
-        self.sns_client: SNSClient = boto3.client("sns", config=boto3_config)
+        self.sns_client: SNSClient = get_client("sns")
 
     def publish(self, topic_arn: str, message: str, subject: str) -> PublishResponseTypeDef:
         try:
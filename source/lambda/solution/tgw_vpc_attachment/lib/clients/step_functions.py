@@ -0,0 +1,35 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+from aws_lambda_powertools import Logger
+from mypy_boto3_stepfunctions import SFNClient
+
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
+
+
+class StepFunctions:
+
+    def __init__(self):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.state_machine_client: SFNClient = get_client("stepfunctions")
+
+    def start_execution(self, state_machine_arn: str, sf_input: dict, name: str) -> str:
+        try:
+            response = self.state_machine_client.start_execution(
+                stateMachineArn=state_machine_arn,
+                input=json.dumps(sf_input),
+                name=name,
+            )
+            return response.get("executionArn")
+        except self.state_machine_client.exceptions.ExecutionAlreadyExists:
+            # the message was delivered again, the execution was started by the first delivery
+            self.logger.info(f"Execution {name} already exists")
+            return f"{state_machine_arn.replace(':stateMachine:', ':execution:')}:{name}"
+        except Exception as error:
+            self.logger.exception(f"Error while starting the execution {name} of {state_machine_arn}")
+            self.logger.exception(error)
+            raise error
@@ -5,15 +5,25 @@
 
 import json
 import os
+from datetime import datetime, timezone
 from os import environ
 
-import boto3
 from aws_lambda_powertools import Logger
 from botocore.exceptions import ClientError
 from mypy_boto3_sts import STSClient
 from mypy_boto3_sts.type_defs import CredentialsTypeDef, GetCallerIdentityResponseTypeDef
 
-from solution.tgw_vpc_attachment.lib.clients.boto3_config import boto3_config
+from solution.tgw_vpc_attachment.lib.clients.client_factory import get_client
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+# assumed role credentials are reused across warm invocations until they are
+# within CREDENTIAL_REFRESH_SECONDS of their Expiration
+CREDENTIAL_REFRESH_SECONDS = int(os.getenv('STS_CREDENTIAL_REFRESH_SECONDS', '120'))
+credentials_cache = LRUCache(max_size=int(os.getenv('STS_CREDENTIAL_CACHE_SIZE', '256')))
+
+
+def clear_credentials_cache() -> None:
+    credentials_cache.clear()
 
 
 class STS:
@@ -21,7 +31,7 @@ class STS:
         """Initialize the STS object's attributes"""
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
         self.log_message = {}
-        self.sts_client: STSClient = boto3.client("sts", config=boto3_config)
+        self.sts_client: STSClient = get_client("sts")
 
     def assume_transit_network_execution_role(
             self,
@@ -61,6 +71,12 @@ class STS:
             "MESSAGE": f"assuming role: {role_arn}",
         }
         self.logger.debug(self.log_message)
+        # credentials differ by session name, external id and duration, not only by role
+        cache_key = (role_arn.split(":")[4], role_arn, session_name, external_id, duration_in_seconds)
+        cached_credentials = credentials_cache.get(cache_key)
+        if cached_credentials:
+            self.logger.debug(f"using cached credentials for role: {role_arn}")
+            return cached_credentials
         try:
             assume_role_params = {
                 "RoleArn": role_arn,
@@ -69,14 +85,27 @@ class STS:
             }
             if external_id:
                 assume_role_params["ExternalId"] = external_id
-            
+
             response = self.sts_client.assume_role(**assume_role_params)
-            return response["Credentials"]
+            credentials = response["Credentials"]
+            self._cache_credentials(cache_key, credentials)
+            return credentials
         except ClientError as err:
             self.log_message["EXCEPTION"] = str(err)
             self.logger.error(json.dumps(self.log_message, indent=4))
             raise
 
+    @staticmethod
+    def _cache_credentials(cache_key: tuple, credentials: CredentialsTypeDef) -> None:
+        expiration = credentials.get("Expiration")
+        if not isinstance(expiration, datetime):
+            return
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        refresh_at = expiration.timestamp() - CREDENTIAL_REFRESH_SECONDS
+        if refresh_at > datetime.now(timezone.utc).timestamp():
+            credentials_cache.put(cache_key, credentials, expires_at=refresh_at)
+
     def get_account_id(self):
         self.log_message = {
             "METHOD": "get_account_id",
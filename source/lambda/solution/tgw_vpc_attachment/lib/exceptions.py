@@ -79,3 +79,9 @@ class ResourceBusyException(Exception):
 class RouteTableNotFoundException(Exception):
     # Thrown when a named route table (association or propagation) was not found
     pass
+
+
+class VpcLeaseLostException(Exception):
+    # Thrown when the VPC lease of the execution expired and was taken over by another
+    # execution, the resources read by the earlier steps may be stale
+    pass
@@ -12,6 +12,7 @@ from solution.tgw_vpc_attachment.lib.clients.sns import SNS
 from solution.tgw_vpc_attachment.lib.clients.sts import STS
 from solution.tgw_vpc_attachment.lib.handlers.dynamodb_handler import DynamoDb
 from solution.tgw_vpc_attachment.lib.utils.helper import timestamp_message
+from solution.tgw_vpc_attachment.lib.utils.tag_writer import TagWriter
 
 CLASS_EVENT = " Class Event"
 EXECUTING = "Executing: "
@@ -25,6 +26,7 @@ class ApprovalNotification:
         self.spoke_account_id = self.event.get("account")
         self.spoke_region = environ.get("AWS_REGION")
         self.sts = STS()
+        self.tag_writer = None
         self.logger.debug(event)
 
     def _ec2_client(self, account_id):
@@ -86,6 +88,7 @@ class ApprovalNotification:
                     "Approval notifications are disabled. Please set CFN template variable "
                     "'ApprovalNotification' to 'Yes' if you wish to receive notifications."
                 )
+            self._flush_tags()
             return self.event
         except Exception as e:
             message = {
@@ -124,14 +127,24 @@ class ApprovalNotification:
                 + "/"
                 + inspect.stack()[0][3]
             )
-            ec2 = self._ec2_client(self.spoke_account_id)
-            ec2.create_tags(
+            if self.tag_writer is None:
+                self.tag_writer = TagWriter(self._ec2_client(self.spoke_account_id))
+            self.tag_writer.add(
                 resource, "STNOStatus-" + key, timestamp_message(message)
             )
         except Exception as e:
             message = self._message(inspect.stack()[0][3], e)
             self.logger.exception(message)
 
+    def _flush_tags(self):
+        # the association and propagation messages of the VPC go out in one CreateTags call
+        try:
+            if self.tag_writer is not None:
+                self.tag_writer.flush()
+        except Exception as e:
+            message = self._message(inspect.stack()[0][3], e)
+            self.logger.exception(message)
+
     def _message(self, method, e):
         return {
             "FILE": __file__.split("/")[-1],
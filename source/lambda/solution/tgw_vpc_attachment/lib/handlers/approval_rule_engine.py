@@ -0,0 +1,155 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Compiles the ApprovalRule-* tags of a TGW route table into an immutable rule set"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+APPROVAL_REQUIRED = "approvalrequired"
+RULE_TAG_PATTERN = re.compile(r"^approvalrule-(\d{2})-(.*)$")
+
+# compiled rule sets are shared by all invocations served by a warm container
+_compiled_rules = LRUCache(max_size=64)
+
+
+@dataclass(frozen=True)
+class ApprovalRuleGroup:
+    """One numbered ApprovalRule-NN-* group
+
+    Attributes:
+        number: rule number, groups are evaluated in ascending order
+        in_ous: normalized OU paths of the InOUs tag, takes precedence over not_in_ous
+        not_in_ous: normalized OU paths of the NotInOUs tag
+        association: action for associations when the group matches
+        propagation: action for propagations when the group matches
+    """
+
+    number: int
+    in_ous: Optional[FrozenSet[str]] = None
+    not_in_ous: Optional[FrozenSet[str]] = None
+    association: Optional[str] = None
+    propagation: Optional[str] = None
+
+    def matches(self, ou_prefixes: FrozenSet[str]) -> bool:
+        if self.in_ous is not None:
+            return not self.in_ous.isdisjoint(ou_prefixes)
+        if self.not_in_ous is not None:
+            # matches as soon as the account is outside one of the listed OUs
+            return not self.not_in_ous <= ou_prefixes
+        return False
+
+    def action(self, route_type: str) -> str:
+        return (self.association if route_type == "association" else self.propagation) or APPROVAL_REQUIRED
+
+
+@dataclass(frozen=True)
+class ApprovalRuleSet:
+    """Conditional approval rules of one route table
+
+    Attributes:
+        default_association: action for associations when no group matches
+        default_propagation: action for propagations when no group matches
+        groups: numbered groups in evaluation order
+    """
+
+    default_association: str = APPROVAL_REQUIRED
+    default_propagation: str = APPROVAL_REQUIRED
+    groups: Tuple[ApprovalRuleGroup, ...] = ()
+
+    def default_action(self, route_type: str) -> str:
+        return self.default_association if route_type == "association" else self.default_propagation
+
+
+def normalize_ou_path(ou_path: str) -> str:
+    # complete the OU path if the user put in "Sandbox" for the OU instead of "Root/Sandbox/"
+    ou_path = ou_path.lower()
+    if not ou_path.startswith("root/"):
+        ou_path = f"root/{ou_path}"
+    if not ou_path.endswith("/"):
+        ou_path = f"{ou_path}/"
+    return ou_path
+
+
+def ou_path_prefixes(account_ou_path: str) -> FrozenSet[str]:
+    """All OU paths the account is in, e.g. root/, root/workloads/ and root/workloads/dev/"""
+    account_ou_path = account_ou_path.lower()
+    return frozenset(account_ou_path[:index + 1] for index, char in enumerate(account_ou_path) if char == "/")
+
+
+def compile_approval_rules(rule_tags: Dict[str, str]) -> ApprovalRuleSet:
+    """Parses the lowercased ApprovalRule-* tags of a route table in a single pass.
+
+    Numbered groups are read from 01 upwards and stop at the first missing number.
+    """
+    defaults = {"association": APPROVAL_REQUIRED, "propagation": APPROVAL_REQUIRED}
+    group_fields: Dict[int, dict] = {}
+    for key, value in rule_tags.items():
+        if key in ("approvalrule-default-association", "approvalrule-default-propagation"):
+            defaults[key.rsplit("-", 1)[1]] = value.lower()
+            continue
+        match = RULE_TAG_PATTERN.match(key)
+        if not match:
+            continue
+        fields = group_fields.setdefault(int(match.group(1)), {})
+        field = match.group(2)
+        if not value:
+            continue
+        if field in ("inous", "notinous"):
+            fields[field] = frozenset(normalize_ou_path(ou.strip()) for ou in value.split(",") if ou.strip())
+        elif field in ("association", "propagation"):
+            fields[field] = value.lower()
+
+    groups = []
+    number = 1
+    while number in group_fields:
+        fields = group_fields[number]
+        groups.append(ApprovalRuleGroup(
+            number=number,
+            in_ous=fields.get("inous"),
+            not_in_ous=fields.get("notinous"),
+            association=fields.get("association"),
+            propagation=fields.get("propagation"),
+        ))
+        number += 1
+    return ApprovalRuleSet(defaults["association"], defaults["propagation"], tuple(groups))
+
+
+def get_approval_rules(route_table_id: str, rule_tags: Dict[str, str]) -> ApprovalRuleSet:
+    """Compiled rule set of the route table, recompiled only when its rule tags change"""
+    tag_hash = hashlib.sha256(repr(sorted(rule_tags.items())).encode()).hexdigest()
+    key = (route_table_id, tag_hash)
+    rule_set = _compiled_rules.get(key)
+    if rule_set is None:
+        rule_set = compile_approval_rules(rule_tags)
+        _compiled_rules.put(key, rule_set)
+    return rule_set
+
+
+def clear_approval_rules_cache() -> None:
+    _compiled_rules.clear()
+
+
+def evaluate_approval_rules(rule_set: ApprovalRuleSet, route_type: str, account_ou_path: Optional[str]) -> str:
+    """Returns the action of the first matching group, or the default action of the route type.
+
+    Args:
+        rule_set: compiled rule set of the route table
+        route_type: "association" or "propagation"
+        account_ou_path: OU path of the spoke account, e.g. "Root/Workloads/"
+
+    Returns:
+        one of "accept", "reject" or "approvalrequired"
+    """
+    route_type = route_type.lower()
+    if not account_ou_path:
+        return rule_set.default_action(route_type)
+    ou_prefixes = ou_path_prefixes(account_ou_path)
+    for group in rule_set.groups:
+        if group.matches(ou_prefixes):
+            return group.action(route_type)
+    return rule_set.default_action(route_type)
@@ -0,0 +1,99 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Archives the audit items expired by the DynamoDB TTL to S3 as gzipped JSON Lines"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from os import environ
+from typing import Dict, List
+
+from aws_lambda_powertools import Logger
+from boto3.dynamodb.types import TypeDeserializer
+
+from solution.tgw_vpc_attachment.lib.clients.s3 import S3
+
+TTL_PRINCIPAL = "dynamodb.amazonaws.com"
+DEFAULT_ARCHIVE_PREFIX = "audit-history"
+
+
+def is_ttl_removal(record: dict) -> bool:
+    """Stream record of an item deleted by the TTL process, not by a user or the solution"""
+    identity = record.get("userIdentity") or {}
+    return (
+        record.get("eventName") == "REMOVE"
+        and identity.get("type") == "Service"
+        and identity.get("principalId") == TTL_PRINCIPAL
+    )
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _partition_date(item: dict, record: dict) -> datetime:
+    # partitioned by the day of the tag event, the removal time when the request time is unknown
+    try:
+        return datetime.strptime((item.get("RequestTimeStamp") or "")[:10], "%Y-%m-%d")
+    except ValueError:
+        return datetime.fromtimestamp(record.get("dynamodb", {}).get("ApproximateCreationDateTime", 0), timezone.utc)
+
+
+class AuditArchiver:
+
+    def __init__(self, bucket_name: str = None, prefix: str = None):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.bucket_name = bucket_name if bucket_name else environ.get("ARCHIVE_BUCKET_NAME")
+        self.prefix = prefix if prefix else environ.get("ARCHIVE_PREFIX", DEFAULT_ARCHIVE_PREFIX)
+        self.s3 = S3()
+
+    def archive(self, records: List[dict]) -> dict:
+        """Writes one object per event day with the history items of the stream batch.
+
+        The object key ends with the first sequence number of the day in the batch, so a retried
+        batch overwrites its objects instead of duplicating the items.
+
+        Args:
+            records: DynamoDB stream records with the old image of the removed items
+
+        Returns:
+            {"Archived": int, "Skipped": int, "Objects": [...]}
+        """
+        deserializer = TypeDeserializer()
+        lines: Dict[str, List[str]] = {}
+        object_keys: Dict[str, str] = {}
+        skipped = 0
+        for record in records:
+            image = record.get("dynamodb", {}).get("OldImage")
+            if not is_ttl_removal(record) or not image:
+                skipped += 1
+                continue
+            item = {key: deserializer.deserialize(value) for key, value in image.items()}
+            # the "latest" item expires with the history item of the same version
+            if item.get("Version") == "latest":
+                skipped += 1
+                continue
+            partition = _partition_date(item, record).strftime(f"{self.prefix}/year=%Y/month=%m/day=%d")
+            if partition not in lines:
+                lines[partition] = []
+                object_keys[partition] = f"{partition}/{record['dynamodb']['SequenceNumber']}.jsonl.gz"
+            lines[partition].append(json.dumps(item, default=_json_default, sort_keys=True))
+
+        for partition, partition_lines in lines.items():
+            body = gzip.compress(("\n".join(partition_lines) + "\n").encode("utf-8"))
+            self.s3.put_object(self.bucket_name, object_keys[partition], body)
+
+        response = {
+            "Archived": sum(len(partition_lines) for partition_lines in lines.values()),
+            "Skipped": skipped,
+            "Objects": list(object_keys.values())
+        }
+        self.logger.info(response)
+        return response
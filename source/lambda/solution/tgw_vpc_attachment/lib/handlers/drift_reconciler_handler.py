@@ -0,0 +1,250 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Compares the desired state in spoke subnet/VPC tags with the TGW attachments, associations and propagations"""
+
+import os
+from os import environ
+from typing import Dict, List
+
+from aws_lambda_powertools import Logger
+
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import LATEST_STATUS_INDEX, NONE_PLACEHOLDER, get_ddb
+from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
+from solution.tgw_vpc_attachment.lib.clients.organizations import Organizations
+from solution.tgw_vpc_attachment.lib.clients.sts import STS
+from solution.tgw_vpc_attachment.lib.handlers.approval_tag_handler import ApprovalTagHandler
+from solution.tgw_vpc_attachment.lib.handlers.tgw_route_table_snapshot import RouteTableSnapshot, \
+    get_route_table_snapshot
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_batch_handler import select_subnets_per_az
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_model import TgwVpcAttachmentModel
+from solution.tgw_vpc_attachment.lib.handlers.vpc_lease import VpcLease, is_lease_enabled
+from solution.tgw_vpc_attachment.lib.utils.concurrency import run_concurrently
+
+MISSING_ATTACHMENT = "MissingAttachment"
+UNTAGGED_ATTACHMENT = "UntaggedAttachment"
+SUBNET_DRIFT = "SubnetDrift"
+ASSOCIATION_DRIFT = "AssociationDrift"
+PROPAGATION_DRIFT = "PropagationDrift"
+UNKNOWN_ROUTE_TABLE = "UnknownRouteTable"
+
+
+def split_propagation_tag(value: str) -> List[str]:
+    # same separators as VPCTagManager: organizations tag policies do not allow commas
+    return [x.lower().strip() for x in value.replace('/', ',').replace(':', ',').split(",") if x.strip()]
+
+
+class TransitGatewayDriftReconciler:
+
+    def __init__(self, tgw_id: str = None):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.tgw_id = tgw_id if tgw_id else environ.get("TGW_ID")
+        self.max_workers = int(environ.get("RECONCILER_MAX_WORKERS", 8))
+        self.hub_ec2_client = EC2()
+        self.snapshot: RouteTableSnapshot = None
+
+    def reconcile(self, account_ids: List[str] = None, apply: bool = False) -> dict:
+        """Builds the drift report for every spoke account with an attachment or an audit record (plus account_ids).
+
+        MissingAttachment can only be found in accounts that are scanned. Accounts whose VPCs were never
+        processed by the solution have no attachment and no audit record, pass them in account_ids.
+
+        Args:
+            account_ids: additional spoke accounts to scan, e.g. accounts without any attachment yet
+            apply: correct hub-side association/propagation drift that does not require approval
+
+        Returns:
+            {"Drift": [...], "Actions": [...], "Errors": [...]}
+        """
+        actual_state = self.get_actual_state()
+        accounts = sorted({state["account"] for state in actual_state.values()}
+                          | set(self.get_audited_accounts()) | set(account_ids or []))
+
+        desired_state: Dict[str, TgwVpcAttachmentModel] = {}
+        errors = []
+        # one worker per spoke account, so a single account is never described concurrently
+        for task in run_concurrently(lambda account_id: self.get_desired_state(account_id, actual_state),
+                                     accounts, self.max_workers):
+            if task.error:
+                self.logger.error(f"Error while reading the tags of account {task.item}: {task.error}")
+                errors.append({"account": task.item, "Comment": str(task.error)})
+            else:
+                desired_state.update(task.result)
+
+        failed_accounts = {error["account"] for error in errors}
+        drift = [entry for entry in self.diff(actual_state, desired_state) if entry["account"] not in failed_accounts]
+        actions = self.apply_corrections(drift) if apply else []
+        report = {"TgwId": self.tgw_id, "Drift": drift, "Actions": actions, "Errors": errors}
+        self.logger.info(report)
+        return report
+
+    def get_actual_state(self) -> Dict[str, TgwVpcAttachmentModel]:
+        """Reads the hub view of all VPC attachments, two paginated calls per route table"""
+        self.snapshot = get_route_table_snapshot(self.hub_ec2_client, self.tgw_id, refresh=True)
+        associations: Dict[str, str] = {}
+        propagations: Dict[str, List[str]] = {}
+        for route_table_id in self.snapshot.route_table_ids:
+            for association in self.hub_ec2_client.list_transit_gateway_route_table_associations(route_table_id):
+                if association.get("State") in ("associating", "associated"):
+                    associations[association.get("TransitGatewayAttachmentId")] = route_table_id
+            for propagation in self.hub_ec2_client.get_transit_gateway_route_table_propagations(route_table_id):
+                if propagation.get("State") == "enabled":
+                    propagations.setdefault(propagation.get("TransitGatewayAttachmentId"), []).append(route_table_id)
+
+        actual_state: Dict[str, TgwVpcAttachmentModel] = {}
+        for attachment in self.hub_ec2_client.describe_transit_gateway_vpc_attachments_for_tgw(self.tgw_id):
+            attachment_id = attachment.get("TransitGatewayAttachmentId")
+            actual_state[attachment.get("VpcId")] = {
+                "account": attachment.get("VpcOwnerId"),
+                "VpcId": attachment.get("VpcId"),
+                "TransitGatewayAttachmentId": attachment_id,
+                "AttachmentState": attachment.get("State"),
+                "AttachmentSubnetIds": sorted(attachment.get("SubnetIds", [])),
+                "ExistingAssociationRouteTableId": associations.get(attachment_id, "none"),
+                "ExistingPropagationRouteTableIds": sorted(propagations.get(attachment_id, [])),
+            }
+        return actual_state
+
+    def get_audited_accounts(self) -> List[str]:
+        """Spoke accounts with a "latest" audit item, e.g. accounts whose attachments were deleted since"""
+        try:
+            # the sparse index only holds the "latest" items
+            items = get_ddb(environ.get("TABLE_NAME")).scan(
+                IndexName=LATEST_STATUS_INDEX, ProjectionExpression="AWSSpokeAccountId")
+        except Exception as error:
+            self.logger.error(f"Error while reading the spoke accounts of the audit table: {error}")
+            return []
+        return sorted({item["AWSSpokeAccountId"] for item in items
+                       if item.get("AWSSpokeAccountId") not in (None, NONE_PLACEHOLDER)})
+
+    def get_desired_state(self, account_id: str,
+                          actual_state: Dict[str, TgwVpcAttachmentModel] = None) -> Dict[str, TgwVpcAttachmentModel]:
+        """Reads the subnet and VPC tags of one spoke account, subnets already in an attachment are preferred"""
+        credentials = STS().assume_transit_network_execution_role(account_id)
+        spoke_ec2_client = EC2(credentials=credentials)
+        association_tag = environ.get("ASSOCIATION_TAG").lower().strip()
+        propagation_tag = environ.get("PROPAGATION_TAG").lower().strip()
+
+        subnets_by_vpc: Dict[str, list] = {}
+        for subnet in spoke_ec2_client.list_subnets():
+            subnets_by_vpc.setdefault(subnet.get("VpcId"), []).append(subnet)
+
+        desired_state: Dict[str, TgwVpcAttachmentModel] = {}
+        for vpc in spoke_ec2_client.list_vpcs():
+            vpc_id = vpc.get("VpcId")
+            tags = {tag.get("Key").lower().strip(): tag.get("Value") for tag in vpc.get("Tags") or []}
+            current_subnet_ids = (actual_state or {}).get(vpc_id, {}).get("AttachmentSubnetIds", [])
+            desired_subnet_ids, _ = select_subnets_per_az(subnets_by_vpc.get(vpc_id, []), current_subnet_ids)
+            association_name = (tags.get(association_tag) or "").lower().strip()
+            propagation_names = split_propagation_tag(tags.get(propagation_tag) or "")
+            if not desired_subnet_ids and not association_name and not propagation_names:
+                continue
+            desired_state[vpc_id] = {
+                "account": account_id,
+                "VpcId": vpc_id,
+                "DesiredSubnetIds": sorted(desired_subnet_ids),
+                "AssociationRouteTable": association_name,
+                "PropagationRouteTables": propagation_names,
+            }
+        return desired_state
+
+    def diff(self, actual_state: Dict[str, TgwVpcAttachmentModel],
+             desired_state: Dict[str, TgwVpcAttachmentModel]) -> List[TgwVpcAttachmentModel]:
+        drift_list = []
+        for vpc_id in sorted(set(actual_state) | set(desired_state)):
+            actual = actual_state.get(vpc_id)
+            desired = desired_state.get(vpc_id) or {"DesiredSubnetIds": [], "AssociationRouteTable": "",
+                                                    "PropagationRouteTables": []}
+            entry = dict(actual or {}, **desired)
+            entry["account"] = (actual or desired)["account"]
+            drift = []
+
+            if not actual:
+                if desired["DesiredSubnetIds"]:
+                    drift.append(MISSING_ATTACHMENT)
+            elif not desired["DesiredSubnetIds"]:
+                drift.append(UNTAGGED_ATTACHMENT)
+            elif set(actual["AttachmentSubnetIds"]) != set(desired["DesiredSubnetIds"]):
+                drift.append(SUBNET_DRIFT)
+
+            unknown_names = [name for name in [desired["AssociationRouteTable"]] + desired["PropagationRouteTables"]
+                             if name and not self.snapshot.get_ids(name)]
+            if unknown_names:
+                drift.append(UNKNOWN_ROUTE_TABLE)
+                entry["Comment"] = f"Route tables not found on the TGW: {unknown_names}"
+
+            if actual and desired["DesiredSubnetIds"]:
+                association_ids = self.snapshot.get_ids(desired["AssociationRouteTable"])
+                association_id = association_ids[-1] if association_ids else "none"
+                propagation_ids = {rtb_id for name in desired["PropagationRouteTables"]
+                                   for rtb_id in self.snapshot.get_ids(name)}
+                existing_propagation_ids = set(actual["ExistingPropagationRouteTableIds"])
+                entry.update({
+                    "AssociationRouteTableId": association_id,
+                    "PropagationRouteTableIds": sorted(propagation_ids),
+                    "EnablePropagationRouteTableIds": sorted(propagation_ids - existing_propagation_ids),
+                    "DisablePropagationRouteTableIds": sorted(existing_propagation_ids - propagation_ids),
+                })
+                if association_id != actual["ExistingAssociationRouteTableId"]:
+                    entry["UpdateAssociationRouteTableId"] = "yes"
+                    drift.append(ASSOCIATION_DRIFT)
+                if entry["EnablePropagationRouteTableIds"] or entry["DisablePropagationRouteTableIds"]:
+                    drift.append(PROPAGATION_DRIFT)
+
+            if drift:
+                entry["Drift"] = drift
+                drift_list.append(entry)
+        return drift_list
+
+    def apply_corrections(self, drift_list: List[TgwVpcAttachmentModel]) -> List[dict]:
+        """Applies hub-side association/propagation corrections that the approval rules auto-approve.
+
+        Attachment and subnet drift is only reported: fixing it means changing spoke resources, which
+        is left to the tag-driven workflow (re-tag the subnet).
+        """
+        actions = []
+        for entry in drift_list:
+            if entry.get("AttachmentState") != "available" or UNKNOWN_ROUTE_TABLE in entry["Drift"] \
+                    or not {ASSOCIATION_DRIFT, PROPAGATION_DRIFT} & set(entry["Drift"]):
+                continue
+            if not self._is_auto_approved(entry):
+                actions.append({"VpcId": entry["VpcId"], "Action": "None", "Comment": "Requires approval"})
+                continue
+            try:
+                if is_lease_enabled():
+                    with VpcLease(entry["VpcId"]):
+                        actions.extend(self._apply_correction(entry))
+                else:
+                    actions.extend(self._apply_correction(entry))
+            except Exception as error:
+                self.logger.error(f"Error while correcting the drift of VPC {entry['VpcId']}: {error}")
+                actions.append({"VpcId": entry["VpcId"], "Action": "Failed", "Comment": str(error)})
+        return actions
+
+    def _apply_correction(self, entry: TgwVpcAttachmentModel) -> List[dict]:
+        attachment_id = entry["TransitGatewayAttachmentId"]
+        actions = []
+        # associating over an existing association needs a disassociation first, that is left to the state machine
+        if ASSOCIATION_DRIFT in entry["Drift"] and entry["ExistingAssociationRouteTableId"] == "none" \
+                and entry["AssociationRouteTableId"] != "none":
+            self.hub_ec2_client.associate_transit_gateway_route_table(entry["AssociationRouteTableId"], attachment_id)
+            actions.append({"VpcId": entry["VpcId"], "Action": "AssociateTgwRouteTable",
+                            "RouteTableId": entry["AssociationRouteTableId"]})
+        for route_table_id in entry.get("EnablePropagationRouteTableIds", []):
+            self.hub_ec2_client.enable_transit_gateway_route_table_propagation(route_table_id, attachment_id)
+            actions.append({"VpcId": entry["VpcId"], "Action": "EnableTgwRtPropagation", "RouteTableId": route_table_id})
+        for route_table_id in entry.get("DisablePropagationRouteTableIds", []):
+            self.hub_ec2_client.disable_transit_gateway_route_table_propagation(route_table_id, attachment_id)
+            actions.append({"VpcId": entry["VpcId"], "Action": "DisableTgwRtPropagation", "RouteTableId": route_table_id})
+        return actions
+
+    def _is_auto_approved(self, entry: TgwVpcAttachmentModel) -> bool:
+        event = {
+            "AssociationRouteTableId": entry["AssociationRouteTableId"],
+            "PropagationRouteTableIds": entry["PropagationRouteTableIds"],
+        }
+        account_ou_path = Organizations().get_ou_path(entry["account"])
+        if account_ou_path:
+            event["AccountOuPath"] = account_ou_path
+        event = ApprovalTagHandler(event).analyze(self.snapshot.route_tables)
+        return event.get("ApprovalRequired") == "no" and event.get("ConditionalApproval") != "auto-rejected"
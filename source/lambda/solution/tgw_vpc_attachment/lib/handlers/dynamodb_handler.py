@@ -8,7 +8,7 @@ from os import environ
 
 from aws_lambda_powertools import Logger
 
-from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import get_ddb, write_audit_record
 from solution.tgw_vpc_attachment.lib.handlers.general_functions_handler import GeneralFunctions
 from solution.tgw_vpc_attachment.lib.utils.helper import current_time
 
@@ -30,6 +30,7 @@ class DynamoDb:
         return str(int((ttl - datetime(1970, 1, 1)).total_seconds()))
 
     def put_item(self):
+        """Writes the audit record of the event and its "latest" copy in one transaction"""
         try:
             self.logger.info(
                 EXECUTING
@@ -37,7 +38,6 @@ class DynamoDb:
                 + "/"
                 + inspect.stack()[0][3]
             )
-            ddb = DDB(environ.get("TABLE_NAME"))
 
             # The SubnetId is the hash key for the table, and is used by the UI to get the latest event.
             # If there is a association/propagation tag change on an existing VPC already added to the TGW,
@@ -53,7 +53,8 @@ class DynamoDb:
                 "SubnetId": self.event.get("SubnetId", "None"),
                 "Version": str(self.event.get("detail", {}).get("version", "None")),
                 "AvailabilityZone": self.event.get("AvailabilityZone", "None"),
-                "VpcId": self.event.get("VpcId", "None"),
+                # VpcId is the hash key of the VpcId-index, an explicit None could not be written
+                "VpcId": self.event.get("VpcId") or "None",
                 "VpcName": self.event.get("VpcName", "None"),
                 "TgwId": environ.get("TGW_ID", "None"),
                 "PropagationRouteTables": self.event.get(environ.get("PROPAGATION_TAG")),
@@ -78,11 +79,8 @@ class DynamoDb:
             }
 
             self.logger.info(item)
-            # add item to the DDB table with version in event
-            ddb.put_item(item)
-
-            item.update({"Version": "latest"})
-            ddb.put_item(item)
+            # add item to the DDB table with version in event, together with the "latest" item
+            write_audit_record(get_ddb(environ.get("TABLE_NAME")), item)
 
             return self.event
         except Exception as e:
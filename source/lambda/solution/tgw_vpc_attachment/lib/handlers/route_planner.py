@@ -0,0 +1,98 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Plans the default routes to the transit gateway from a single describe of the route table"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+CREATE_ROUTES = "create"
+DELETE_ROUTES = "delete"
+BLACKHOLE = "blackhole"
+
+# route targets in the order they are reported in GatewayId
+ROUTE_TARGET_KEYS = ("TransitGatewayId", "GatewayId", "NatGatewayId", "VpcPeeringConnectionId")
+
+
+def route_destination(route: dict) -> Optional[str]:
+    """CIDR block or prefix list id of the route"""
+    return route.get("DestinationCidrBlock") or route.get("DestinationPrefixListId")
+
+
+def route_target(route: dict) -> str:
+    for key in ROUTE_TARGET_KEYS:
+        if route.get(key) is not None:
+            return route[key]
+    return "custom-target"
+
+
+def index_routes(routes: List[dict]) -> Dict[str, dict]:
+    """Routes of the route table indexed by destination"""
+    indexed = {}
+    for route in routes:
+        destination = route_destination(route)
+        if destination:
+            indexed[destination] = route
+    return indexed
+
+
+@dataclass
+class RoutePlan:
+    """Route changes needed for the default route destinations
+
+    Attributes:
+        create: destinations without a route
+        replace: destinations with a blackhole route to a transit gateway
+        delete: destinations routed to a transit gateway
+        unchanged: destinations left as they are, e.g. routed to a NAT gateway
+        existing: current route of each destination that has one
+    """
+
+    create: List[str] = field(default_factory=list)
+    replace: List[str] = field(default_factory=list)
+    delete: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    existing: Dict[str, dict] = field(default_factory=dict)
+
+    def has_changes(self) -> bool:
+        return bool(self.create or self.replace or self.delete)
+
+    def to_dict(self) -> dict:
+        return {
+            "Create": self.create,
+            "Replace": self.replace,
+            "Delete": self.delete,
+            "Unchanged": self.unchanged,
+        }
+
+
+def plan_route_changes(destinations: List[str], existing_routes: List[dict], operation: Optional[str]) -> RoutePlan:
+    """Diffs the default route destinations against the routes of the route table
+
+    Routes to other targets than a transit gateway are never changed.
+
+    Args:
+        destinations: CIDR blocks and prefix list ids that should be routed to the transit gateway
+        existing_routes: routes of the route table, from a single describe
+        operation: CREATE_ROUTES, DELETE_ROUTES or None to only report the existing routes
+
+    Returns:
+        RoutePlan: destinations to create, replace and delete
+    """
+    routes = index_routes(existing_routes)
+    plan = RoutePlan()
+    for destination in dict.fromkeys(destinations):
+        route = routes.get(destination)
+        if route is not None:
+            plan.existing[destination] = route
+        to_transit_gateway = route is not None and route.get("TransitGatewayId") is not None
+
+        if operation == CREATE_ROUTES and route is None:
+            plan.create.append(destination)
+        elif operation == CREATE_ROUTES and to_transit_gateway and route.get("State") == BLACKHOLE:
+            plan.replace.append(destination)
+        elif operation == DELETE_ROUTES and to_transit_gateway:
+            plan.delete.append(destination)
+        else:
+            plan.unchanged.append(destination)
+    return plan
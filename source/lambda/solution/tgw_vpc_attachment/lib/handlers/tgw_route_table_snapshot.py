@@ -0,0 +1,83 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Transit Gateway route table snapshot module"""
+
+import os
+import time
+from collections import Counter
+from typing import Dict, List
+
+from mypy_boto3_ec2.type_defs import TransitGatewayRouteTableTypeDef
+
+from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
+from solution.tgw_vpc_attachment.lib.utils.cache import LRUCache
+
+# snapshots are shared by all state machine steps served by a warm container
+_snapshots = LRUCache(max_size=16)
+
+
+def route_table_name(tgw_route_table: TransitGatewayRouteTableTypeDef) -> str:
+    # use tgw id instead of name if there's no name tag. tgw id is unique in terms of duplicate detection.
+    return next(
+        (tag['Value'] for tag in tgw_route_table.get('Tags', []) if tag['Key'].strip().lower() == 'name'),
+        tgw_route_table['TransitGatewayRouteTableId']
+    )
+
+
+class RouteTableSnapshot:
+    """Route tables of one TGW, indexed by normalized 'Name' tag value
+
+    The snapshot only resolves names to ids. Other tags, like the approval tags, must be read fresh.
+    """
+
+    def __init__(self, tgw_id: str, route_tables: List[TransitGatewayRouteTableTypeDef]):
+        self.tgw_id = tgw_id
+        self.route_tables = route_tables
+        self.route_table_ids: List[str] = [rtb['TransitGatewayRouteTableId'] for rtb in route_tables]
+        self.ids_by_name: Dict[str, List[str]] = {}
+        for rtb in route_tables:
+            for tag in rtb.get('Tags', []):
+                if tag['Key'].lower().strip() == 'name':
+                    self.ids_by_name.setdefault(tag['Value'].lower().strip(), []).append(
+                        rtb['TransitGatewayRouteTableId'])
+
+        name_counts = Counter(route_table_name(rtb) for rtb in route_tables)
+        self.duplicate_names: List[str] = [name for name, count in name_counts.items() if count > 1]
+
+    def get_ids(self, name: str) -> List[str]:
+        """Returns the ids of the route tables tagged with the given (normalized) name"""
+        return self.ids_by_name.get(name, [])
+
+    def throw_exception_if_duplicate_names(self):
+        if self.duplicate_names:
+            raise ValueError(
+                f"Invalid TGW route table setup. Multiple route tables are tagged with the name {', '.join(self.duplicate_names)}, which prevents deterministic TGW association. Please tag each route table with a unique name.")
+
+
+def get_route_table_snapshot(ec2_client: EC2, tgw_id: str, refresh: bool = False) -> RouteTableSnapshot:
+    """Read-through cache of the TGW route tables.
+
+    Args:
+        ec2_client: hub EC2 client used on a cache miss
+        tgw_id: transit gateway id
+        refresh: bypass the cached snapshot and describe the route tables again
+
+    Returns:
+        route table snapshot, at most ROUTE_TABLE_CACHE_TTL seconds old
+    """
+    snapshot = None if refresh else _snapshots.get(tgw_id)
+    if snapshot is None:
+        snapshot = RouteTableSnapshot(tgw_id, ec2_client.describe_transit_gateway_route_tables(tgw_id))
+        ttl = int(os.getenv('ROUTE_TABLE_CACHE_TTL', '60'))
+        if ttl > 0:
+            _snapshots.put(tgw_id, snapshot, expires_at=time.time() + ttl)
+    return snapshot
+
+
+def invalidate_route_table_snapshot(tgw_id: str = None) -> None:
+    if tgw_id is None:
+        _snapshots.clear()
+    else:
+        _snapshots.invalidate(tgw_id)
+
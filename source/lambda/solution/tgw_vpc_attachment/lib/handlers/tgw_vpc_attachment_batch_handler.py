@@ -0,0 +1,250 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Coalesces queued subnet/VPC tag events and applies one TGW attachment change per VPC"""
+
+import os
+from os import environ
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from aws_lambda_powertools import Logger
+from mypy_boto3_ec2.type_defs import SubnetTypeDef
+
+from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
+from solution.tgw_vpc_attachment.lib.clients.step_functions import StepFunctions
+from solution.tgw_vpc_attachment.lib.clients.sts import STS
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceBusyException
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_handler import TransitGatewayVPCAttachments
+from solution.tgw_vpc_attachment.lib.handlers.vpc_handler import VPCHandler
+from solution.tgw_vpc_attachment.lib.utils.helper import timestamp_message
+from solution.tgw_vpc_attachment.lib.utils.tag_writer import TagWriter
+
+DUPLICATE_AZ_COMMENT = "You can only add one subnet in a TGW-VPC attachment per Availability Zone. Please delete " \
+                       "and create the tag with RoutingTag provided in the Hub Template"
+
+
+def requires_state_machine(event: dict) -> bool:
+    """Only subnet attachment tag changes are batched.
+
+    VPC tags (association and propagation) go through the approval workflow and the routing tag
+    creates the default routes, both are handled by the state machine.
+    """
+    if any(":subnet/" not in resource_arn for resource_arn in event.get("resources", [])):
+        return True
+    attachment_tag = environ.get("ATTACHMENT_TAG").lower().strip()
+    changed_tag_keys = {key.lower().strip() for key in event.get("detail", {}).get("changed-tag-keys", [])}
+    return changed_tag_keys != {attachment_tag}
+
+
+def forward_to_state_machine(event: dict, action: Optional[str] = None) -> str:
+    """Starts the state machine with the same input as the tag event rule would
+
+    Args:
+        event: tag event
+        action: attachment change of the subnet already applied by the batch handler, the state machine
+            continues with the default routes, the association, the propagations and the attachment tags
+    """
+    state_machine_arn = environ.get("STATE_MACHINE_ARN")
+    sf_input = {key: event.get(key) for key in ("detail", "source", "account", "resources")}
+    sf_input.update({"state-machine": state_machine_arn, "StateMachineArn": state_machine_arn})
+    if action:
+        sf_input.update({"Action": action})
+    # the event id keeps the name stable when the message is delivered again
+    name = f"event-from-batch-{event.get('id') or uuid4()}"
+    return StepFunctions().start_execution(state_machine_arn, sf_input, name)
+
+
+def latest_tag_events(events: List[dict]) -> Dict[str, dict]:
+    """Latest tag event of each tagged resource id"""
+    latest: Dict[str, dict] = {}
+    for _, event in events:
+        for resource_arn in event.get("resources", []):
+            latest[resource_arn.split("/")[-1]] = event
+    return latest
+
+
+def get_handoff_action(result: dict, subnet_id: str) -> Optional[str]:
+    """Attachment change of the subnet in the desired state of its VPC, as the state machine names it.
+
+    None for a subnet rejected for its availability zone, the state machine rejects it again and records it.
+    """
+    if subnet_id in result.get("RejectedSubnetIds", []):
+        return None
+    if subnet_id in result["DesiredSubnetIds"]:
+        return "CreateTgwVpcAttachment" if result.get("Action") == "CreateTgwVpcAttachment" else "AddSubnet"
+    return "RemoveSubnet" if result["DesiredSubnetIds"] else "DeleteTgwVpcAttachment"
+
+
+def coalesce_tag_events(events: List[dict]) -> Dict[str, Dict[str, List[str]]]:
+    """Groups tag events by spoke account and tagged resource id.
+
+    Args:
+        events: list of (message id, tag event) tuples as queued by the event rule
+
+    Returns:
+        {account id: {resource id: [message ids]}}
+    """
+    coalesced: Dict[str, Dict[str, List[str]]] = {}
+    for message_id, event in events:
+        for resource_arn in event.get("resources", []):
+            # arn:aws:ec2:<region>:<account>:subnet/subnet-xxx
+            account_id = event.get("account") or resource_arn.split(":")[4]
+            resource_id = resource_arn.split("/")[-1]
+            coalesced.setdefault(account_id, {}).setdefault(resource_id, []).append(message_id)
+    return coalesced
+
+
+def is_tagged_for_attachment(subnet: SubnetTypeDef) -> bool:
+    # same rule as VPCHandler._check_subnet_tags: the attachment or the routing tag adds the subnet
+    tag_keys = {tag.get("Key").lower().strip() for tag in subnet.get("Tags") or []}
+    return environ.get("ATTACHMENT_TAG").lower().strip() in tag_keys \
+        or environ.get("ROUTING_TAG").lower().strip() in tag_keys
+
+
+def select_subnets_per_az(subnets: List[SubnetTypeDef], current_subnet_ids: List[str]) -> Tuple[List[str], List[str]]:
+    """Picks one tagged subnet per availability zone.
+
+    Subnets already in the attachment win, then the lowest subnet id.
+
+    Returns:
+        (desired subnet ids, rejected subnet ids)
+    """
+    subnets_by_az: Dict[str, List[str]] = {}
+    for subnet in subnets:
+        if is_tagged_for_attachment(subnet):
+            subnets_by_az.setdefault(subnet.get("AvailabilityZone"), []).append(subnet.get("SubnetId"))
+    desired_subnet_ids, rejected_subnet_ids = [], []
+    for subnet_ids in subnets_by_az.values():
+        subnet_ids.sort(key=lambda subnet_id: (subnet_id not in current_subnet_ids, subnet_id))
+        desired_subnet_ids.append(subnet_ids[0])
+        rejected_subnet_ids.extend(subnet_ids[1:])
+    return desired_subnet_ids, rejected_subnet_ids
+
+
+class TransitGatewayVPCAttachmentBatch:
+
+    def __init__(self, account_id: str):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.account_id = account_id
+        credentials = STS().assume_transit_network_execution_role(account_id)
+        self.spoke_ec2_client = EC2(credentials=credentials)
+        self.tag_writer = TagWriter(self.spoke_ec2_client)
+
+    def group_resources_by_vpc(self, resource_ids: List[str]) -> Dict[str, List[str]]:
+        """Maps the tagged subnets and VPCs to the VPC they belong to, deleted subnets are dropped"""
+        resources_by_vpc: Dict[str, List[str]] = {}
+        subnet_ids = [resource_id for resource_id in resource_ids if resource_id.startswith("subnet")]
+        for resource_id in resource_ids:
+            if resource_id.startswith("vpc"):
+                resources_by_vpc.setdefault(resource_id, []).append(resource_id)
+        if subnet_ids:
+            for subnet in self.spoke_ec2_client.describe_subnets_by_ids(subnet_ids):
+                resources_by_vpc.setdefault(subnet.get("VpcId"), []).append(subnet.get("SubnetId"))
+        return resources_by_vpc
+
+    def get_desired_state(self, vpc_id: str) -> dict:
+        """Builds the desired-state document of the VPC from the current subnet tags"""
+        tgw_id = environ.get("TGW_ID")
+        attachment = next(
+            (attachment for attachment in self.spoke_ec2_client.describe_transit_gateway_vpc_attachments(tgw_id, vpc_id)
+             if attachment.get("VpcId") == vpc_id), None)
+        current_subnet_ids = attachment.get("SubnetIds", []) if attachment else []
+
+        desired_subnet_ids, rejected_subnet_ids = select_subnets_per_az(
+            self.spoke_ec2_client.describe_subnets_for_vpc(vpc_id), current_subnet_ids)
+
+        return {
+            "account": self.account_id,
+            "VpcId": vpc_id,
+            "TgwId": tgw_id,
+            "TransitGatewayAttachmentId": attachment.get("TransitGatewayAttachmentId") if attachment else None,
+            "AttachmentState": attachment.get("State") if attachment else "deleted",
+            "CurrentSubnetIds": sorted(current_subnet_ids),
+            "DesiredSubnetIds": sorted(desired_subnet_ids),
+            "RejectedSubnetIds": sorted(rejected_subnet_ids),
+        }
+
+    def apply_desired_state(self, desired_state: dict) -> dict:
+        """Creates, modifies or deletes the TGW attachment with a single API call"""
+        vpc_id = desired_state["VpcId"]
+        attachment_id = desired_state["TransitGatewayAttachmentId"]
+        if desired_state["AttachmentState"] in ("pending", "modifying"):
+            raise ResourceBusyException(
+                f"TGW attachment {attachment_id} of VPC {vpc_id} is {desired_state['AttachmentState']}")
+
+        current_subnet_ids = set(desired_state["CurrentSubnetIds"])
+        desired_subnet_ids = set(desired_state["DesiredSubnetIds"])
+        add_subnet_ids = sorted(desired_subnet_ids - current_subnet_ids)
+        remove_subnet_ids = sorted(current_subnet_ids - desired_subnet_ids)
+        result = dict(desired_state, Action="None")
+
+        if attachment_id is None and desired_subnet_ids:
+            self.logger.info(f"Creating TGW Attachment for VPC {vpc_id} with Subnet IDs: {add_subnet_ids}")
+            response = self.spoke_ec2_client.create_transit_gateway_vpc_attachment_with_subnets(
+                desired_state["TgwId"], vpc_id, add_subnet_ids)
+            attachment = response.get("TransitGatewayVpcAttachment", {})
+            result.update({
+                "Action": "CreateTgwVpcAttachment",
+                "TransitGatewayAttachmentId": attachment.get("TransitGatewayAttachmentId"),
+                "AttachmentState": attachment.get("State"),
+            })
+            self._create_tag(vpc_id, "VPCAttachment", "VPC has been attached to the Transit Gateway")
+        elif attachment_id is not None and not desired_subnet_ids:
+            self.logger.info(f"Deleting TGW Attachment {attachment_id} of VPC {vpc_id}")
+            response = self.spoke_ec2_client.delete_transit_gateway_vpc_attachment(attachment_id)
+            result.update({
+                "Action": "DeleteTgwVpcAttachment",
+                "AttachmentState": response.get("TransitGatewayVpcAttachment", {}).get("State"),
+            })
+            self._create_tag(vpc_id, "VPCAttachment", "VPC has been detached from the Transit Gateway")
+        elif add_subnet_ids or remove_subnet_ids:
+            self.logger.info(f"Modifying TGW Attachment {attachment_id}, add: {add_subnet_ids}, "
+                             f"remove: {remove_subnet_ids}")
+            response = self.spoke_ec2_client.modify_tgw_attachment_subnets(
+                attachment_id, add_subnet_ids, remove_subnet_ids)
+            if response.get("Error"):
+                raise ValueError(f"Failed to modify TGW attachment {attachment_id}: {response.get('Error')}")
+            result.update({
+                "Action": "ModifyTgwVpcAttachment",
+                "AttachmentState": response.get("TransitGatewayVpcAttachment", {}).get("State"),
+            })
+
+        for subnet_id in add_subnet_ids:
+            self._create_tag(subnet_id, "Subnet", "Subnet added to the TGW attachment.")
+        for subnet_id in remove_subnet_ids:
+            self._create_tag(subnet_id, "Subnet", "Subnet removed from the TGW attachment.")
+        for subnet_id in desired_state["RejectedSubnetIds"]:
+            self._create_tag(subnet_id, "Subnet", DUPLICATE_AZ_COMMENT)
+        self.tag_writer.flush()
+        result.update({"AddedSubnetIds": add_subnet_ids, "RemovedSubnetIds": remove_subnet_ids})
+        return result
+
+    def requires_approval(self, event: dict) -> bool:
+        """Evaluates the approval rules for a tag event of the VPC, as the state machine does before any change.
+
+        The rules depend on the VPC tags and the spoke account only, one tag event stands for the VPC.
+        """
+        event = {key: event.get(key) for key in ("detail", "source", "account", "region", "resources")}
+        event = VPCHandler(event).describe_resources()
+        tgw_vpc_attachments = TransitGatewayVPCAttachments(event)
+        tgw_vpc_attachments.describe_transit_gateway_vpc_attachments()
+        event = tgw_vpc_attachments.describe_transit_gateway_route_tables()
+        self.logger.info(f"Approval status of VPC {event.get('VpcId')}: {event.get('Status')}")
+        return event.get("Status") != "auto-approved"
+
+    @staticmethod
+    def hand_off(result: dict, events: List[dict]) -> List[str]:
+        """Starts the state machine for each tag event of the VPC after the attachment change.
+
+        The state machine programs the default routes, associates and propagates the attachment, tags it
+        and writes the audit record, the same steps as for a tag event that is not batched.
+
+        Returns:
+            execution arns
+        """
+        return [forward_to_state_machine(event, get_handoff_action(result, event["resources"][0].split("/")[-1]))
+                for event in events]
+
+    def _create_tag(self, resource, key, message):
+        self.tag_writer.add(resource, "STNOStatus-" + key, timestamp_message(message))
@@ -4,7 +4,6 @@
 
 import os
 import hashlib
-from collections import Counter
 from datetime import datetime, timezone
 from os import environ
 from secrets import choice
@@ -18,38 +17,32 @@ from mypy_boto3_ec2.type_defs import TransitGatewayRouteTableTypeDef
 from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
 from solution.tgw_vpc_attachment.lib.clients.sts import STS
 from solution.tgw_vpc_attachment.lib.exceptions import (
+    AlreadyConfiguredException,
     ResourceBusyException,
     RouteTableNotFoundException, service_exception_handler,
 )
 from solution.tgw_vpc_attachment.lib.handlers.approval_tag_handler import ApprovalTagHandler
+from solution.tgw_vpc_attachment.lib.handlers.tgw_route_table_snapshot import RouteTableSnapshot, \
+    get_route_table_snapshot, route_table_name as get_route_table_name
 from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_model import TgwVpcAttachmentModel
+from solution.tgw_vpc_attachment.lib.handlers.vpc_lease import EXECUTION_LEASE, renews_vpc_lease, vpc_lease
+from solution.tgw_vpc_attachment.lib.utils.concurrency import run_concurrently
 from solution.tgw_vpc_attachment.lib.utils.helper import timestamp_message
 from solution.tgw_vpc_attachment.lib.utils.metrics import Metrics
+from solution.tgw_vpc_attachment.lib.utils.tag_writer import TagWriter
 
 TGW_VPC_ERROR = "The TGW-VPC Attachment is not in 'available' state."
 METRICS_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 
 
-def throw_exception_if_duplicate_names(tgw_route_tables: List[
-    TransitGatewayRouteTableTypeDef
-]):
-    # Extract the 'Name' tag values from all route tables
-    route_table_names = [
-        next((tag['Value'] for tag in tgw['Tags'] if tag['Key'].strip().lower() == 'name'),
-             # use tgw id instead of name if there's no name tag. tgw id is unique in terms of duplicate detection.
-             tgw['TransitGatewayRouteTableId'])
-        for tgw in tgw_route_tables
+def get_tag_delta(existing_tags, required_tags) -> List[dict]:
+    """Required tags that are missing or have a different value in the existing tag list"""
+    existing = {tag["Key"]: tag["Value"] for tag in existing_tags or []}
+    return [
+        {"Key": key, "Value": value} for key, value in (required_tags or {}).items()
+        if existing.get(key) != value
     ]
 
-    # Use collections.Counter to find duplicates
-    name_counts = Counter(route_table_names)
-    duplicates = [name for name, count in name_counts.items() if count > 1]
-
-    # If duplicates are found, raise an exception
-    if duplicates:
-        raise ValueError(
-            f"Invalid TGW route table setup. Multiple route tables are tagged with the name {', '.join(duplicates)}, which prevents deterministic TGW association. Please tag each route table with a unique name.")
-
 
 class TransitGatewayVPCAttachments:
 
@@ -63,7 +56,10 @@ class TransitGatewayVPCAttachments:
         credentials = self.sts.assume_transit_network_execution_role(spoke_account_id)
         self.spoke_ec2_client = EC2(credentials=credentials)
         self.hub_ec2_client = EC2()
+        # status tags are written when the state machine step ends, see main.transit_gateway
+        self.tag_writer = TagWriter(self.spoke_ec2_client)
 
+    @renews_vpc_lease
     def get_transit_gateway_vpc_attachment_state(self):
         # skip checking the TGW attachment status if it does not exist
         if self.event.get("TgwAttachmentExist").lower() == "yes":
@@ -72,7 +68,9 @@ class TransitGatewayVPCAttachments:
                     self.event.get("TransitGatewayAttachmentId")
                 )
             self.event.update({"AttachmentState": transit_gateway_vpc_attachment_state})
-            self.check_state_and_wait_for_random_time_to_avoid_race_condition(transit_gateway_vpc_attachment_state)
+            # an execution holding the VPC lease is not racing other executions on this VPC
+            if not self.event.get(EXECUTION_LEASE):
+                self.check_state_and_wait_for_random_time_to_avoid_race_condition(transit_gateway_vpc_attachment_state)
             self.logger.info(f"STATE : {transit_gateway_vpc_attachment_state}")
         return self.event
 
@@ -85,6 +83,7 @@ class TransitGatewayVPCAttachments:
             _seconds = choice(range(5, 10))
             sleep(_seconds)
 
+    @renews_vpc_lease
     def describe_transit_gateway_vpc_attachments(self):
 
         vpc_id = self.event.get("VpcId")
@@ -112,6 +111,7 @@ class TransitGatewayVPCAttachments:
         self.event.update({"TgwAttachmentExist": found_attachment})
         return self.event
 
+    @vpc_lease
     def tgw_attachment_crud_operations(self):
         if (
                 self.event.get("TgwAttachmentExist") == "no"
@@ -370,15 +370,12 @@ class TransitGatewayVPCAttachments:
     # and a propagate-to tag with multiple tgw route table names.
     # this function maps the route table names to route table ids and updates the event.
     # (careful, self.event is used as output parameter for functions that seem to return nothing.)
+    @renews_vpc_lease
     def describe_transit_gateway_route_tables(self):
 
-        # describe tgw route tables for the provided TGW ID
+        # route tables of the provided TGW ID, shared with the other steps served by this container
         tgw_id = environ.get("TGW_ID")
-        tgw_route_tables: list[
-            TransitGatewayRouteTableTypeDef
-        ] = self.hub_ec2_client.describe_transit_gateway_route_tables(tgw_id)
-
-        throw_exception_if_duplicate_names(tgw_route_tables)
+        snapshot = get_route_table_snapshot(self.hub_ec2_client, tgw_id)
 
         association_route_table_name, propagation_route_table_names = self._get_route_table_names_in_tags()
         self.logger.info(
@@ -386,9 +383,27 @@ class TransitGatewayVPCAttachments:
             f" {propagation_route_table_names}")
 
         # map route table names route table ids; throws exception if a name doesn't match a route table on the TGW
-        route_table_ids: List[str] = self._get_route_table_ids_for_given_route_table_names(
-            association_route_table_name, propagation_route_table_names, tgw_route_tables
-        )
+        try:
+            route_table_ids: List[str] = self._get_route_table_ids_for_given_route_table_names(
+                association_route_table_name, propagation_route_table_names, snapshot
+            )
+        except (ValueError, RouteTableNotFoundException):
+            # the snapshot may predate a route table being created, renamed or fixed, retry with a fresh one
+            snapshot = get_route_table_snapshot(self.hub_ec2_client, tgw_id, refresh=True)
+            route_table_ids = self._get_route_table_ids_for_given_route_table_names(
+                association_route_table_name, propagation_route_table_names, snapshot
+            )
+
+        # the snapshot only maps names to ids, read the selected route tables again for their current tags
+        selected_route_tables = self._describe_selected_route_tables()
+        if not self._selected_route_tables_match_names(
+                selected_route_tables, association_route_table_name, propagation_route_table_names):
+            # a route table was renamed after the snapshot was taken, map the names again
+            snapshot = get_route_table_snapshot(self.hub_ec2_client, tgw_id, refresh=True)
+            route_table_ids = self._get_route_table_ids_for_given_route_table_names(
+                association_route_table_name, propagation_route_table_names, snapshot
+            )
+            selected_route_tables = self._describe_selected_route_tables()
         self.event.update({"RouteTableList": route_table_ids})
 
         # find existing TGW route table association to support update action
@@ -401,13 +416,39 @@ class TransitGatewayVPCAttachments:
         self.get_transit_gateway_attachment_propagations()
 
         # set approval flag
-        self.event = ApprovalTagHandler(self.event).analyze(tgw_route_tables)
+        self.event = ApprovalTagHandler(self.event).analyze(selected_route_tables)
 
         # set status based on the approval workflow
         self._set_approval_status()
 
         return self.event
 
+    # describes the association and propagation route tables mapped from the tags, with their current tags
+    def _describe_selected_route_tables(self) -> List[TransitGatewayRouteTableTypeDef]:
+        association_route_table_id = self.event.get("AssociationRouteTableId")
+        route_table_ids = list(dict.fromkeys(
+            ([association_route_table_id] if association_route_table_id not in (None, "none") else [])
+            + self.event.get("PropagationRouteTableIds", [])
+        ))
+        if not route_table_ids:
+            return []
+        return self.hub_ec2_client.describe_transit_gateway_route_tables_by_ids(route_table_ids)
+
+    def _selected_route_tables_match_names(
+            self,
+            selected_route_tables: List[TransitGatewayRouteTableTypeDef],
+            association_route_table_name: str | None,
+            propagation_route_table_names: List[str]
+    ) -> bool:
+        current_names = {rtb['TransitGatewayRouteTableId']: get_route_table_name(rtb).lower().strip()
+                         for rtb in selected_route_tables}
+        association_route_table_id = self.event.get("AssociationRouteTableId")
+        if association_route_table_id not in (None, "none") \
+                and current_names.get(association_route_table_id) != association_route_table_name:
+            return False
+        return all(current_names.get(rtb_id) in propagation_route_table_names
+                   for rtb_id in self.event.get("PropagationRouteTableIds", []))
+
     # looks at the tags in the input event and extracts the values of the association tag and propagation tag
     def _get_route_table_names_in_tags(self) -> Tuple[str | None, List]:
         association_tag = environ.get("ASSOCIATION_TAG").lower().strip()
@@ -432,43 +473,37 @@ class TransitGatewayVPCAttachments:
                 propagation_route_table_names_in_tags = [x.lower().strip() for x in value]
         return association_route_table_name_in_tags, propagation_route_table_names_in_tags
 
-    # this function maps the list of tgw_route_tables to a list of ids,
-    # and validates the route table names in the given tags against the existing route tables on the TGW.
+    # this function maps the route table names in the given tags to route table ids using the snapshot index,
+    # and validates them against the existing route tables on the TGW.
     # it also updates self.event as a side effect.
     def _get_route_table_ids_for_given_route_table_names(
             self,
             association_route_table_name: str | None,  # from tags
             propagation_route_table_names: List[str],  # from tags
-            tgw_route_tables: list[TransitGatewayRouteTableTypeDef]
+            snapshot: RouteTableSnapshot
     ) -> List[str]:
-        propagate_to_table_ids, tgw_route_table_ids = [], []
-        # Keep track of whether the route table name in the associate-with tag exists on a TGW route table:
-        association_table_not_found = True
-        # Propagation is harder to keep track of as it's a list, any of which could be missing
-        # So keep the propagate_to route table names in the list, and remove them as they are found:
-        if propagation_route_table_names:
-            propagation_tables_that_are_not_found = (
-                propagation_route_table_names.copy()
-            )
-        else:
-            propagation_tables_that_are_not_found = []
+        snapshot.throw_exception_if_duplicate_names()
+
         # If subnet is tagged before the VPC, the associations/propagations may not be set,
         # in this case we still need to create the attachment.
+        association_table_not_found = False
         if not association_route_table_name:
             self.event.update({"AssociationRouteTableId": "none"})
-            association_table_not_found = False
-
-        for tgw_route_table in tgw_route_tables:
-            # make a list of Route Table ids
-            tgw_route_table_ids.append(tgw_route_table.get("TransitGatewayRouteTableId"))
-            association_table_not_found, propagation_tables_that_are_not_found = self.check_tags_for_tgw_route_table(
-                association_route_table_name,
-                association_table_not_found,  # careful, used as output parameter
-                propagate_to_table_ids,  # careful, used as output parameter
-                propagation_route_table_names,
-                propagation_tables_that_are_not_found,  # careful, used as output parameter
-                tgw_route_table
-            )
+        else:
+            association_table_ids = snapshot.get_ids(association_route_table_name)
+            association_table_not_found = not association_table_ids
+            if association_table_ids:
+                self.logger.debug(f"Association RTB Name found: {association_route_table_name}")
+                self.event.update({"AssociationRouteTableId": association_table_ids[-1]})
+
+        propagate_to_table_ids, propagation_tables_that_are_not_found = [], []
+        for route_table_name in dict.fromkeys(propagation_route_table_names):
+            propagation_table_ids = snapshot.get_ids(route_table_name)
+            if propagation_table_ids:
+                self.logger.info(f"Propagation RTB Name Found: {route_table_name}")
+                propagate_to_table_ids.extend(propagation_table_ids)
+            else:
+                propagation_tables_that_are_not_found.append(route_table_name)
 
         # throw exception if 'associate-with' tag or 'propagate-to' tag contains a name that doesn't match any route table name of the TGW
         self.throw_if_not_found(association_route_table_name, association_table_not_found,
@@ -476,43 +511,8 @@ class TransitGatewayVPCAttachments:
         self.event.update(
             {"PropagationRouteTableIds": propagate_to_table_ids}
         )
-        self.logger.debug(f"TGW Route Tables: {tgw_route_table_ids}")
-        return tgw_route_table_ids
-
-    def check_tags_for_tgw_route_table(
-            self,
-            association_route_table_name: str | None,
-            association_table_not_found: bool,  # careful, used as output parameter
-            propagate_to_table_ids: List[str],  # careful, used as output parameter
-            propagation_route_table_names: List[str],
-            propagation_tables_that_are_not_found: List[str],  # careful, used as output parameter
-            tgw_route_table: TransitGatewayRouteTableTypeDef
-    ):
-        # iterate through tags for each route table
-        for tag in tgw_route_table.get("Tags"):
-            # if tag key is 'Name' then match the value with extracted name from the event
-            if tag.get("Key").lower().strip() == "name":
-                route_table_name = tag.get("Value").lower().strip()
-                if route_table_name == association_route_table_name:
-                    # update event with route table id for association
-                    association_table_not_found = False
-                    self.logger.debug(f"Association RTB Name found: {tag.get('Value')}")
-                    self.event.update(
-                        {
-                            "AssociationRouteTableId": tgw_route_table.get(
-                                "TransitGatewayRouteTableId"
-                            )
-                        }
-                    )
-                if route_table_name in propagation_route_table_names:
-                    # extract route table id for propagation
-                    propagation_tables_that_are_not_found.remove(route_table_name)
-                    self.logger.info(
-                        f"Propagation RTB Name Found: {tag.get('Value')}")
-                    propagate_to_table_ids.append(
-                        tgw_route_table.get("TransitGatewayRouteTableId")
-                    )
-        return association_table_not_found, propagation_tables_that_are_not_found
+        self.logger.debug(f"TGW Route Tables: {snapshot.route_table_ids}")
+        return list(snapshot.route_table_ids)
 
     @staticmethod
     def throw_if_not_found(
@@ -583,6 +583,7 @@ class TransitGatewayVPCAttachments:
                 )
                 self.event.update({"ExistingAssociationRouteTableId": rtb})
 
+    @renews_vpc_lease
     def get_transit_gateway_attachment_propagations(self):
         if self.event.get("AttachmentState") in ("available", "modifying"):
             transit_gateway_attachment_id = self.event.get("TransitGatewayAttachmentId")
@@ -622,6 +623,7 @@ class TransitGatewayVPCAttachments:
         self.event.update({"Status": status})
 
     @service_exception_handler
+    @vpc_lease
     def associate_transit_gateway_route_table(self):
         attachment_state = self.event.get("AttachmentState")
         association_route_table_id = self.event.get("AssociationRouteTableId")
@@ -658,6 +660,7 @@ class TransitGatewayVPCAttachments:
             )
         return self.event
 
+    @vpc_lease
     def disassociate_transit_gateway_route_table(self):
         if self.event.get("AttachmentState") == "available":
             existing_association_route_table = self.event.get("ExistingAssociationRouteTableId")
@@ -707,6 +710,7 @@ class TransitGatewayVPCAttachments:
 
 
     @service_exception_handler
+    @renews_vpc_lease
     def enable_transit_gateway_route_table_propagation(self):
         attachment_state: TransitGatewayAttachmentStateType = self.event.get("AttachmentState")
         propagation_route_tables = self._get_propagation_route_tables_to_enable()
@@ -724,18 +728,15 @@ class TransitGatewayVPCAttachments:
             self.event.update({"EnablePropagationRouteTableIds": propagation_route_tables})
             self.event.update({"Action": "EnableTgwRtPropagation"})
 
-            # if the return list is empty the API to enable tgw rt propagation will be skipped.
-            for tgw_route_table_id in propagation_route_tables:
-                self.logger.info(f"Enabling RT: {tgw_route_table_id} Propagation To Tgw Attachment")
-                self.hub_ec2_client.enable_transit_gateway_route_table_propagation(
-                    tgw_route_table_id,
-                    self.event.get("TransitGatewayAttachmentId"))
+            self.logger.info(f"Enabling RTs: {propagation_route_tables} Propagation To Tgw Attachment")
+            self._run_for_route_tables(
+                self.hub_ec2_client.enable_transit_gateway_route_table_propagation, propagation_route_tables)
 
-                self._create_tag(
-                    self.event.get("VpcId"),
-                    "VPCPropagation",
-                    "VPC RT propagation has been enabled to the Transit Gateway Routing Table/Domain",
-                )
+            self._create_tag(
+                self.event.get("VpcId"),
+                "VPCPropagation",
+                "VPC RT propagation has been enabled to the Transit Gateway Routing Table/Domain",
+            )
         return self.event
 
     def _get_propagation_route_tables_to_enable(self):
@@ -746,6 +747,7 @@ class TransitGatewayVPCAttachments:
         enable_rtb_list = list(event_set - event_set.intersection(existing_set))
         return enable_rtb_list
 
+    @renews_vpc_lease
     def disable_transit_gateway_route_table_propagation(self):
         if self.event.get("AttachmentState") == "available":
             propagation_route_tables = self._get_propagation_route_tables_to_disable()
@@ -755,12 +757,11 @@ class TransitGatewayVPCAttachments:
                 }
             )
             # if the return list is empty the API to disable tgw rt propagation will be skipped.
-            for tgw_route_table_id in propagation_route_tables:
-                self.logger.info(f"Disabling RT: {tgw_route_table_id} Propagation From Tgw Attachment")
+            if propagation_route_tables:
+                self.logger.info(f"Disabling RTs: {propagation_route_tables} Propagation From Tgw Attachment")
                 self.event.update({"Action": "DisableTgwRtPropagation"})
-                self.hub_ec2_client.disable_transit_gateway_route_table_propagation(
-                    tgw_route_table_id,
-                    self.event.get("TransitGatewayAttachmentId"))
+                self._run_for_route_tables(
+                    self.hub_ec2_client.disable_transit_gateway_route_table_propagation, propagation_route_tables)
                 self._create_tag(
                     self.event.get("VpcId"),
                     "VPCPropagation",
@@ -771,43 +772,70 @@ class TransitGatewayVPCAttachments:
             self.logger.info(TGW_VPC_ERROR)
         return self.event
 
+    def _run_for_route_tables(self, ec2_function, route_table_ids: List[str]) -> None:
+        """Calls ec2_function(route table id, attachment id) for all route tables on a bounded thread pool.
+
+        Every route table is attempted. Afterwards the first unexpected error is raised, otherwise
+        AlreadyConfiguredException if any of the route tables was already configured.
+        """
+        attachment_id = self.event.get("TransitGatewayAttachmentId")
+        results = run_concurrently(
+            lambda route_table_id: ec2_function(route_table_id, attachment_id),
+            route_table_ids,
+            int(environ.get("PROPAGATION_MAX_WORKERS", 8))
+        )
+        errors = []
+        for result in results:
+            if result.error is not None:
+                self.logger.warning(f"RT: {result.item} failed with: {repr(result.error)}")
+                errors.append(result.error)
+        unexpected_errors = [error for error in errors if not isinstance(error, AlreadyConfiguredException)]
+        if errors:
+            raise (unexpected_errors or errors)[0]
+
     def _get_propagation_route_tables_to_disable(self):
         event_set = set(self.event.get("PropagationRouteTableIds"))
         existing_set = set(self.event.get("ExistingPropagationRouteTableIds"))
         disable_rtb_list = list(event_set.union(existing_set) - event_set)
         return disable_rtb_list
 
+    @renews_vpc_lease
     def tag_transit_gateway_attachment(self):
         # Tags the Transit Gateway attachment with the key/values in "AttachmentTagsRequired"
 
         transit_gateway_attachment_id = self.event.get(
             "TransitGatewayAttachmentId"
         )
+        required_tags = self.event.get("AttachmentTagsRequired")
 
         # Since the tags are not shared between the hub and spoke, we need to tag
-        # both the hub account and the spoke account
-
-        for ec2_client in (self.hub_ec2_client, self.spoke_ec2_client):
-            # Get existing transit gateway attachment tags
-            response = ec2_client.describe_transit_gateway_attachments(
-                transit_gateway_attachment_id
-            )
-            if len(response) == 0:
-                return self.event
-            attachment = response[0]
-            existing_tags = {
-                i["Key"]: i["Value"] for i in attachment.get("Tags")
-            }
-            required_tags = self.event.get("AttachmentTagsRequired")
-            for key, val in required_tags.items():
-                if key not in existing_tags or existing_tags[key] != val:
-                    self.logger.info(
-                        f"Tagging attachment {transit_gateway_attachment_id} key {key} with value {val}"
-                    )
-                    ec2_client.create_tags(transit_gateway_attachment_id, key, val)
+        # both the hub account and the spoke account, the two sides are synced concurrently
+        results = run_concurrently(
+            lambda ec2_client: self._sync_attachment_tags(ec2_client, transit_gateway_attachment_id, required_tags),
+            (self.hub_ec2_client, self.spoke_ec2_client),
+            max_workers=2
+        )
+        errors = [result.error for result in results if result.error]
+        if errors:
+            raise errors[0]
 
         return self.event
 
+    def _sync_attachment_tags(self, ec2_client, transit_gateway_attachment_id, required_tags):
+        """Writes the tags that are missing or different on one side with a single CreateTags call"""
+        response = ec2_client.describe_transit_gateway_attachments(
+            transit_gateway_attachment_id
+        )
+        if len(response) == 0:
+            return []
+        tag_delta = get_tag_delta(response[0].get("Tags"), required_tags)
+        if tag_delta:
+            self.logger.info(
+                f"Tagging attachment {transit_gateway_attachment_id} with {tag_delta}"
+            )
+            ec2_client.create_tags_batch(transit_gateway_attachment_id, tag_delta)
+        return tag_delta
+
     @service_exception_handler
     def subnet_deletion_event(self):
         # This is an event from CloudTrail, so the location of the IDs in the event are different:
@@ -863,9 +891,8 @@ class TransitGatewayVPCAttachments:
             "DeleteTransitGatewayVpcAttachment",
             "ModifyTransitGatewayVpcAttachment",
         ]
-        for operation in subnet_tag_operations:
-            if operation in error_message:
-                self._create_tag(subnet_id, "Subnet-Error", error_message)
+        if any(operation in error_message for operation in subnet_tag_operations):
+            self._create_tag(subnet_id, "Subnet-Error", error_message)
 
     def _update_vpc_id_tags(self, vpc_id, error_message):
         vpc_tag_operations = [
@@ -879,12 +906,11 @@ class TransitGatewayVPCAttachments:
             "RouteTableNotFoundException",
         ]
 
-        for operation in vpc_tag_operations:
-            if operation in error_message:
-                self._create_tag(vpc_id, "VPC-Error", error_message)
+        if any(operation in error_message for operation in vpc_tag_operations):
+            self._create_tag(vpc_id, "VPC-Error", error_message)
 
     def _create_tag(self, resource, key, message):
-        self.spoke_ec2_client.create_tags(
+        self.tag_writer.add(
             resource,
             "STNOStatus-" + key,
             timestamp_message(message)
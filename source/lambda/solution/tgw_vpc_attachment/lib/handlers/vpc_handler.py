@@ -5,16 +5,22 @@ import os
 from os import environ
 
 from aws_lambda_powertools import Logger
+from botocore.exceptions import ClientError
 from mypy_boto3_ec2.type_defs import RouteTableTypeDef
 
 from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
-from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB, VPC_ID_INDEX
 from solution.tgw_vpc_attachment.lib.clients.organizations import Organizations
 from solution.tgw_vpc_attachment.lib.clients.sts import STS
 from solution.tgw_vpc_attachment.lib.exceptions import service_exception_handler
+from solution.tgw_vpc_attachment.lib.handlers.route_planner import CREATE_ROUTES, DELETE_ROUTES, RoutePlan, \
+    plan_route_changes, route_target
 from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_model import TgwVpcAttachmentModel
+from solution.tgw_vpc_attachment.lib.handlers.vpc_lease import renews_vpc_lease
+from solution.tgw_vpc_attachment.lib.utils.concurrency import run_concurrently
 from solution.tgw_vpc_attachment.lib.utils.helper import timestamp_message, current_time
 from solution.tgw_vpc_attachment.lib.utils.list_utils import convert_string_to_list_with_no_whitespaces
+from solution.tgw_vpc_attachment.lib.utils.tag_writer import TagWriter
 
 EXECUTING = "Executing: "
 
@@ -30,6 +36,8 @@ class VPCHandler:
         self.sts = STS()
         credentials = self.sts.assume_transit_network_execution_role(self.event.get("account"))
         self.spoke_ec2_client = EC2(credentials=credentials)
+        # status tags are written when the state machine step ends, see main.vpc
+        self.tag_writer = TagWriter(self.spoke_ec2_client)
         self.logger.debug(event)
 
     @service_exception_handler
@@ -164,25 +172,47 @@ class VPCHandler:
         ]
         return ", ".join(cidrs) if cidrs else vpc.get("CidrBlock", "None")
 
+    @staticmethod
+    def _find_vpc_items(ddb, vpc_id):
+        """DynamoDB records of the VPC
+
+        Read from the VpcId index once VPC_ID_INDEX_ENABLED is set. The table does not have the index yet,
+        a stack update adds one index at a time, so the records are scanned for now.
+        """
+        if environ.get("VPC_ID_INDEX_ENABLED", "No").lower() == "yes":
+            return ddb.query_index(VPC_ID_INDEX, "VpcId", vpc_id)
+        return ddb.scan(
+            FilterExpression="VpcId = :vpc_id",
+            ExpressionAttributeValues={":vpc_id": vpc_id}
+        )
+
     @staticmethod
     def _update_vpc_cidr_in_ddb(table_name, vpc_id, new_cidr):
-        """Update VpcCidr for all DynamoDB records matching the given VPC."""
+        """Update VpcCidr for all DynamoDB records matching the given VPC.
+
+        Returns:
+            number of records read, updated and skipped because they already had the CIDR
+        """
         ddb = DDB(table_name)
-        scan_kwargs = {
-            "FilterExpression": "VpcId = :vpc_id",
-            "ExpressionAttributeValues": {":vpc_id": vpc_id}
+        items = VPCHandler._find_vpc_items(ddb, vpc_id)
+        stale_items = [item for item in items if item.get("VpcCidr") != new_cidr]
+
+        def _update(item):
+            ddb.table.update_item(
+                Key={"SubnetId": item["SubnetId"], "Version": item["Version"]},
+                UpdateExpression="SET VpcCidr = :cidr",
+                ExpressionAttributeValues={":cidr": new_cidr}
+            )
+
+        results = run_concurrently(_update, stale_items, int(environ.get("DDB_UPDATE_MAX_WORKERS", "8")))
+        errors = [result.error for result in results if result.error]
+        if errors:
+            raise errors[0]
+        return {
+            "ItemsRead": len(items),
+            "ItemsUpdated": len(stale_items),
+            "ItemsSkipped": len(items) - len(stale_items),
         }
-        while True:
-            response = ddb.table.scan(**scan_kwargs)
-            for item in response.get("Items", []):
-                ddb.table.update_item(
-                    Key={"SubnetId": item["SubnetId"], "Version": item["Version"]},
-                    UpdateExpression="SET VpcCidr = :cidr",
-                    ExpressionAttributeValues={":cidr": new_cidr}
-                )
-            if "LastEvaluatedKey" not in response:
-                break
-            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
     @service_exception_handler
     def update_vpc_cidr(self):
@@ -194,11 +224,13 @@ class VPCHandler:
             return self.event
 
         new_cidr = self._get_associated_cidrs(vpc_id)
-        self._update_vpc_cidr_in_ddb(environ.get("TABLE_NAME"), vpc_id, new_cidr)
+        counts = self._update_vpc_cidr_in_ddb(environ.get("TABLE_NAME"), vpc_id, new_cidr)
+        self.event.update({"VpcCidrUpdate": counts})
 
-        self.logger.info(f"Updated VpcCidr to '{new_cidr}' for VPC {vpc_id}")
+        self.logger.info(f"Updated VpcCidr to '{new_cidr}' for VPC {vpc_id}: {counts}")
         return self.event
 
+    @renews_vpc_lease
     def default_route_crud_operations(self):
         # this condition will be met if VPC is tagged and not is Subnet
 
@@ -214,20 +246,9 @@ class VPCHandler:
             # "Custom-Destinations"
             # "Configure-Manually
 
-            if "All-Traffic" in environ.get("DEFAULT_ROUTE"):
-                all_traffic_route = environ.get("ALL_TRAFFIC")  # 0.0.0.0/0
-                self._find_existing_default_route(existing_routes, all_traffic_route)
-                self._update_route_table(all_traffic_route)
-            elif "RFC-1918" in environ.get("DEFAULT_ROUTE"):
-                rfc_1918_routes = convert_string_to_list_with_no_whitespaces(environ.get("RFC_1918_ROUTES"))
-                for route in rfc_1918_routes:
-                    self._find_existing_default_route(existing_routes, route)
-                    self._update_route_table(route)
-            elif "Custom-Destinations" in environ.get("DEFAULT_ROUTE"):
-                self._update_route_table_with_cidr_blocks(existing_routes)
-                self._update_route_table_with_prefix_lists(existing_routes)
-            elif "Configure-Manually" in environ.get("DEFAULT_ROUTE"):
-                self.logger.info("Admin opted to configure route table manually")
+            destinations = self._get_default_route_destinations()
+            if destinations:
+                self._apply_route_plan(destinations, existing_routes)
         return self.event
 
     def _describe_route_table_for_subnet(self):
@@ -261,106 +282,144 @@ class VPCHandler:
 
         return main_route_table.get('Routes', [])
 
-    def _update_route_table(self, route):
-        # if adding subnet to tgw attachment - create route
-        # else if removing subnet from tgw attachment - delete route
+    def _get_default_route_destinations(self) -> list:
+        default_route = environ.get("DEFAULT_ROUTE")
+        if "All-Traffic" in default_route:
+            return [environ.get("ALL_TRAFFIC")]  # 0.0.0.0/0
+        elif "RFC-1918" in default_route:
+            return convert_string_to_list_with_no_whitespaces(environ.get("RFC_1918_ROUTES"))
+        elif "Custom-Destinations" in default_route:
+            return (convert_string_to_list_with_no_whitespaces(environ.get("CIDR_BLOCKS"))
+                    + convert_string_to_list_with_no_whitespaces(environ.get("PREFIX_LISTS")))
+        elif "Configure-Manually" in default_route:
+            self.logger.info("Admin opted to configure route table manually")
+        return []
+
+    def _get_route_operation(self):
+        # if adding subnet to tgw attachment - create routes
+        # else if removing subnet from tgw attachment - delete routes
         if (
                 self.event.get("Action") == "AddSubnet"
                 or self.event.get("Action") == "CreateTgwVpcAttachment"
                 or self.event.get("RouteToTgw") == "create"
         ):
-            self._create_route(route)
+            return CREATE_ROUTES
         elif (
                 self.event.get("Action") == "RemoveSubnet" and self.event.get("RouteTableType") == 'Explicit'
                 or self.event.get("Action") == "DeleteTgwVpcAttachment"
                 or self.event.get("RouteToTgw") == "delete"
         ):
-            self._delete_route(route)
+            return DELETE_ROUTES
+        return None
 
-    def _create_route(self, destination):
+    def _apply_route_plan(self, destinations, existing_routes):
         """
-        This function creates routes in the route table associated with the
-        tagged subnet.
-        :param destination: destination that would TGW as the
-        target. Destination can be a CIDR block or prefix list.
+        Plans the routes of all destinations against the existing routes
+        of the route table and applies the changes concurrently.
+        :param destinations: CIDR blocks and prefix lists that should have
+        the TGW as the target.
+        :param existing_routes: routes of the route table associated with
+        the tagged subnet.
         :return: None
         """
-        try:
-            if (
-                    self.event.get("DefaultRouteToTgwExists") == "no"
-                    and self.event.get("DestinationRouteExists") == "no"
-            ):
-                self.logger.info(
-                    f"Adding destination: {destination} to TGW gateway: "
-                    f"{environ.get('TGW_ID')} into the route table:"
-                    f" {self.event.get('RouteTableId')}"
-                )
-                if destination.startswith("pl-"):
-                    self.spoke_ec2_client.create_route_prefix_list(
-                        destination,
-                        self.event.get("RouteTableId"),
-                        environ.get("TGW_ID"),
-                    )
-                else:
-                    self.spoke_ec2_client.create_route_cidr_block(
-                        destination,
-                        self.event.get("RouteTableId"),
-                        environ.get("TGW_ID"),
-                    )
-                self._create_tag(
-                    self.event.get("RouteTableId"),
-                    "RouteTable",
-                    "Route(s) added to the route table.",
-                )
-        except Exception as e:
+        route_table_id = self.event.get("RouteTableId")
+        plan = plan_route_changes(destinations, existing_routes, self._get_route_operation())
+        self._update_event_with_existing_routes(plan)
+
+        if plan.delete and self.event.get("Action") == "RemoveSubnet" \
+                and self._has_other_tgw_subnets_using_route_table():
+            self.logger.info(f"Skipping route deletion, other subnets still using route table {route_table_id}")
+            plan.unchanged.extend(plan.delete)
+            plan.delete = []
+        self.event.update({"RoutePlan": plan.to_dict()})
+        self.logger.info(f"Route plan for the route table {route_table_id}: {plan.to_dict()}")
+        if not plan.has_changes():
+            return
+
+        changes = ([(self._create_route, destination) for destination in plan.create]
+                   + [(self._replace_route, destination) for destination in plan.replace]
+                   + [(self._delete_route, destination) for destination in plan.delete])
+        results = run_concurrently(
+            lambda change: change[0](change[1]), changes, int(environ.get("ROUTE_MAX_WORKERS", 4))
+        )
+        errors = [result.error for result in results if result.error is not None]
+        if errors:
+            self._create_tag(route_table_id, "RouteTable-Error", errors[0])
+            raise errors[0]
+        # _replace_route returns False when the spoke role may not replace routes
+        not_replaced = [result.item[1] for result in results
+                        if result.item[0] == self._replace_route and result.result is False]
+        if not_replaced:
+            plan.replace = [destination for destination in plan.replace if destination not in not_replaced]
+            plan.unchanged.extend(not_replaced)
+            self.event.update({"RoutePlan": plan.to_dict()})
             self._create_tag(
-                self.event.get("RouteTableId"), "RouteTable-Error", e
+                route_table_id, "RouteTable-Error",
+                f"Blackhole route(s) to {', '.join(not_replaced)} not replaced, "
+                f"update the spoke stack to allow ec2:ReplaceRoute."
             )
-            raise e
+        if plan.create or plan.replace:
+            self._create_tag(route_table_id, "RouteTable", "Route(s) added to the route table.")
+        elif plan.delete:
+            self._create_tag(route_table_id, "RouteTable", "Route(s) removed from the route table.")
 
-    def _delete_route(self, destination):
-        """
-        This function deletes routes in the route table associated
-        with the tagged subnet.
-        :param destination: destination that would TGW as the
-        target. Destination can be a CIDR block or prefix list.
-        :return: None
-        """
+    def _create_route(self, destination):
+        self.logger.info(
+            f"Adding destination: {destination} to TGW gateway: "
+            f"{environ.get('TGW_ID')} into the route table:"
+            f" {self.event.get('RouteTableId')}"
+        )
+        if destination.startswith("pl-"):
+            self.spoke_ec2_client.create_route_prefix_list(
+                destination,
+                self.event.get("RouteTableId"),
+                environ.get("TGW_ID"),
+            )
+        else:
+            self.spoke_ec2_client.create_route_cidr_block(
+                destination,
+                self.event.get("RouteTableId"),
+                environ.get("TGW_ID"),
+            )
+
+    def _replace_route(self, destination) -> bool:
+        self.logger.info(
+            f"Replacing blackhole route of destination: {destination} with TGW gateway: "
+            f"{environ.get('TGW_ID')} in the route table:"
+            f" {self.event.get('RouteTableId')}"
+        )
         try:
-            if (
-                    self.event.get("DefaultRouteToTgwExists") == "yes"
-                    and self.event.get("DestinationRouteExists") == "yes"
-            ):
-                if self.event.get("Action") == "RemoveSubnet" and self._has_other_tgw_subnets_using_route_table():
-                    self.logger.info(
-                        f"Skipping route deletion, other subnets still using route table {self.event.get('RouteTableId')}"
-                    )
-                    return
-
-                self.logger.info(
-                    f"Removing destination : {destination} "
-                    f"to TGW gateway: {environ.get('TGW_ID')}  "
-                    f"from the route table:"
-                    f" {self.event.get('RouteTableId')}"
-                )
-                if destination.startswith("pl-"):
-                    self.spoke_ec2_client.delete_route_prefix_list(
-                        destination, self.event.get("RouteTableId")
-                    )
-                else:
-                    self.spoke_ec2_client.delete_route_cidr_block(
-                        destination, self.event.get("RouteTableId")
-                    )
-                self._create_tag(
-                    self.event.get("RouteTableId"),
-                    "RouteTable",
-                    "Route(s) removed from the route table.",
-                )
-        except Exception as e:
-            self._create_tag(
-                self.event.get("RouteTableId"), "RouteTable-Error", e
+            self.spoke_ec2_client.replace_route(
+                destination,
+                self.event.get("RouteTableId"),
+                environ.get("TGW_ID"),
+            )
+        except ClientError as err:
+            # spoke stacks deployed before ec2:ReplaceRoute was added to the spoke role
+            if err.response['Error']['Code'] != "UnauthorizedOperation":
+                raise
+            self.logger.warning(
+                f"Not allowed to replace the blackhole route of destination: {destination} "
+                f"in the route table: {self.event.get('RouteTableId')}, the spoke role is missing ec2:ReplaceRoute"
+            )
+            return False
+        return True
+
+    def _delete_route(self, destination):
+        self.logger.info(
+            f"Removing destination : {destination} "
+            f"to TGW gateway: {environ.get('TGW_ID')}  "
+            f"from the route table:"
+            f" {self.event.get('RouteTableId')}"
+        )
+        if destination.startswith("pl-"):
+            self.spoke_ec2_client.delete_route_prefix_list(
+                destination, self.event.get("RouteTableId")
+            )
+        else:
+            self.spoke_ec2_client.delete_route_cidr_block(
+                destination, self.event.get("RouteTableId")
             )
-            raise e
 
     def _has_other_tgw_subnets_using_route_table(self):
         try:
@@ -391,63 +450,20 @@ class VPCHandler:
                 return True
         return False
 
-    def _update_route_table_with_cidr_blocks(self, existing_routes):
-        cidr_blocks = convert_string_to_list_with_no_whitespaces(environ.get("CIDR_BLOCKS"))
-        if len(cidr_blocks) > 0:
-            for route in cidr_blocks:
-                self.logger.debug(f"Adding route: {route}")
-                self._find_existing_default_route(existing_routes, route)
-                self._update_route_table(route)
-
-    def _update_route_table_with_prefix_lists(self, existing_routes):
-
-        prefix_lists = convert_string_to_list_with_no_whitespaces(environ.get("PREFIX_LISTS"))
-        if len(prefix_lists) > 0:
-            for prefix_list_id in prefix_lists:
-                self.logger.info(f"Adding prefix list id: {prefix_list_id}")
-                self._find_existing_default_route(
-                    existing_routes, prefix_list_id
-                )
-                self._update_route_table(prefix_list_id)
-
-    def _find_existing_default_route(self, existing_routes, destination_route):
-        gateway_id = None
-        self.event.update({"DefaultRouteToTgwExists": "no"})
-        self.event.update({"DestinationRouteExists": "no"})
-        for route in existing_routes:
-            if route.get("DestinationCidrBlock") == destination_route:
-                # if destination route already exists in the route table - set flag
-                self.event.update({"DestinationRouteExists": "yes"})
-                # Check if default route has Transit gateway as the target
-                if route.get("TransitGatewayId") is not None:
-                    comment = f"Found Transit Gateway as a target to the default route: {destination_route}"
-                    self.event.update({"DefaultRouteToTgwExists": "yes"})
-                    self.logger.debug(comment)
-                    gateway_id = route.get("TransitGatewayId")
-                    self.logger.debug(f"Transit Gateway Id: {gateway_id}")
-                elif route.get("GatewayId") is not None:
-                    comment = f"Found existing gateway as a target to the default route: {destination_route}"
-                    self.logger.debug(comment)
-                    gateway_id = route.get("GatewayId")
-                    self.logger.debug(f"Gateway Id: {gateway_id}")
-                elif route.get("NatGatewayId") is not None:
-                    comment = f"Found NAT Gateway as a target to the default route: {destination_route}"
-                    self.logger.info(comment)
-                    gateway_id = route.get("NatGatewayId")
-                    self.logger.debug(f"NAT Gateway Id: {gateway_id}")
-                elif route.get("VpcPeeringConnectionId") is not None:
-                    comment = f"Found VPC Peering Connection as a target to the default route: {destination_route}"
-                    self.logger.info(comment)
-                    gateway_id = route.get("VpcPeeringConnectionId")
-                    self.logger.debug(f"Peering Connection Id: {gateway_id}")
-                else:
-                    self.logger.info("Found an existing target for the default route.")
-                    gateway_id = "custom-target"
-                    self.logger.debug("Route", route)
-        self.event.update({"GatewayId": gateway_id})
+    def _update_event_with_existing_routes(self, plan: RoutePlan):
+        # "yes" when any of the destinations already had a route, resp. a route to a transit gateway
+        existing_routes = list(plan.existing.values())
+        for destination, route in plan.existing.items():
+            self.logger.debug(f"Found {route_target(route)} as a target to the default route: {destination}")
+        self.event.update({
+            "DestinationRouteExists": "yes" if existing_routes else "no",
+            "DefaultRouteToTgwExists":
+                "yes" if any(route.get("TransitGatewayId") is not None for route in existing_routes) else "no",
+            "GatewayId": route_target(existing_routes[-1]) if existing_routes else None,
+        })
 
     def _create_tag(self, resource, key, message, prefix=True):
-        self.spoke_ec2_client.create_tags(
+        self.tag_writer.add(
             resource, "STNOStatus-" + key, timestamp_message(message) if prefix else message
         )
 
@@ -0,0 +1,187 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Per-VPC lease on the lease table, serializes state machine executions working on the same VPC"""
+
+import os
+import time
+import uuid
+from functools import wraps
+from os import environ
+
+from aws_lambda_powertools import Logger
+from botocore.exceptions import ClientError
+
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceBusyException, VpcLeaseLostException
+
+# key of the lease held by a state machine execution in the event
+EXECUTION_LEASE = "VpcLease"
+# lease items are purged by the table TTL long after they expire
+LEASE_ITEM_TTL_SECONDS = 86400
+
+
+def is_lease_enabled() -> bool:
+    return environ.get("VPC_LEASE_ENABLED", "No").lower() == "yes"
+
+
+class VpcLease:
+    """Conditional-write lease with expiry and a monotonically increasing fencing token.
+
+    The lease is granted when it is free, expired, or already held by the same owner. A holder that
+    outlives its lease can no longer renew or release it, because both are conditioned on the fencing token.
+    """
+
+    def __init__(self, vpc_id: str, owner: str = None, duration_in_seconds: int = None, fencing_token: int = None):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.vpc_id = vpc_id
+        self.owner = owner if owner else str(uuid.uuid4())
+        self.duration_in_seconds = duration_in_seconds if duration_in_seconds \
+            else int(environ.get("VPC_LEASE_DURATION", 900))
+        self.fencing_token = fencing_token
+        self.table = DDB(environ.get("LEASE_TABLE_NAME")).table
+
+    @classmethod
+    def from_event(cls, event: dict):
+        """Lease held by the state machine execution, None if the execution holds no lease"""
+        lease = event.get(EXECUTION_LEASE)
+        if not lease:
+            return None
+        return cls(lease["VpcId"], owner=lease["Owner"], fencing_token=int(lease["FencingToken"]))
+
+    @property
+    def key(self) -> dict:
+        return {"VpcId": self.vpc_id}
+
+    def to_event(self) -> dict:
+        return {"VpcId": self.vpc_id, "Owner": self.owner, "FencingToken": self.fencing_token}
+
+    def acquire(self) -> int:
+        now = int(time.time())
+        try:
+            response = self.table.update_item(
+                Key=self.key,
+                UpdateExpression="SET LeaseOwner = :owner, LeaseExpiresAt = :expires_at, "
+                                 "TimeToLive = :ttl ADD FencingToken :one",
+                ConditionExpression="attribute_not_exists(LeaseOwner) OR LeaseExpiresAt < :now "
+                                    "OR LeaseOwner = :owner",
+                ExpressionAttributeValues={
+                    ":owner": self.owner,
+                    ":expires_at": now + self.duration_in_seconds,
+                    ":ttl": now + LEASE_ITEM_TTL_SECONDS,
+                    ":one": 1,
+                    ":now": now,
+                },
+                ReturnValues="UPDATED_NEW",
+            )
+        except ClientError as err:
+            if err.response['Error']['Code'] == "ConditionalCheckFailedException":
+                raise ResourceBusyException(
+                    f"VPC {self.vpc_id} is leased by another execution, try again later.")
+            raise
+        self.fencing_token = int(response["Attributes"]["FencingToken"])
+        self.logger.debug(f"Acquired lease on VPC {self.vpc_id}, fencing token: {self.fencing_token}")
+        return self.fencing_token
+
+    def renew(self) -> None:
+        """Extends the lease, fails if it was taken over since it was acquired with the fencing token"""
+        now = int(time.time())
+        try:
+            self.table.update_item(
+                Key=self.key,
+                UpdateExpression="SET LeaseExpiresAt = :expires_at, TimeToLive = :ttl",
+                ConditionExpression="LeaseOwner = :owner AND FencingToken = :token",
+                ExpressionAttributeValues={
+                    ":owner": self.owner,
+                    ":token": self.fencing_token,
+                    ":expires_at": now + self.duration_in_seconds,
+                    ":ttl": now + LEASE_ITEM_TTL_SECONDS,
+                },
+            )
+        except ClientError as err:
+            if err.response['Error']['Code'] == "ConditionalCheckFailedException":
+                raise VpcLeaseLostException(
+                    f"Lease on VPC {self.vpc_id} expired and was taken over by another execution.")
+            raise
+        self.logger.debug(f"Renewed lease on VPC {self.vpc_id}, fencing token: {self.fencing_token}")
+
+    def release(self) -> bool:
+        if self.fencing_token is None:
+            return False
+        try:
+            self.table.update_item(
+                Key=self.key,
+                UpdateExpression="REMOVE LeaseOwner, LeaseExpiresAt",
+                ConditionExpression="LeaseOwner = :owner AND FencingToken = :token",
+                ExpressionAttributeValues={":owner": self.owner, ":token": self.fencing_token},
+            )
+        except ClientError as err:
+            if err.response['Error']['Code'] != "ConditionalCheckFailedException":
+                raise
+            self.logger.warning(f"Lease on VPC {self.vpc_id} expired and was taken over before release.")
+            return False
+        finally:
+            self.fencing_token = None
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+
+def acquire_execution_lease(event: dict) -> dict:
+    """Acquires the lease of the VPC for the rest of the state machine execution, before its state is read"""
+    vpc_id = event.get("VpcId")
+    if not is_lease_enabled() or not vpc_id or event.get(EXECUTION_LEASE):
+        return event
+    lease = VpcLease(vpc_id)
+    lease.acquire()
+    event.update({EXECUTION_LEASE: lease.to_event()})
+    return event
+
+
+def renew_execution_lease(event: dict) -> None:
+    """Keeps the lease of the execution alive across the wait loops and checks its fencing token"""
+    lease = VpcLease.from_event(event)
+    if lease is not None:
+        lease.renew()
+
+
+def release_execution_lease(event: dict) -> dict:
+    """Releases the lease of the execution, on success as on the failure path"""
+    lease = VpcLease.from_event(event)
+    if lease is not None:
+        lease.release()
+        event.pop(EXECUTION_LEASE)
+    return event
+
+
+def vpc_lease(func):
+    """Runs the handler method while holding the lease of the VPC in self.event, if leases are enabled.
+
+    When the execution holds the lease, its fencing token is checked right before the change instead.
+    """
+    @wraps(func)
+    def wrapper_func(self, *args, **kwargs):
+        vpc_id = self.event.get("VpcId")
+        if not is_lease_enabled() or not vpc_id:
+            return func(self, *args, **kwargs)
+        if self.event.get(EXECUTION_LEASE):
+            renew_execution_lease(self.event)
+            return func(self, *args, **kwargs)
+        with VpcLease(vpc_id):
+            return func(self, *args, **kwargs)
+    return wrapper_func
+
+
+def renews_vpc_lease(func):
+    """Renews the lease held by the execution before the handler method runs, e.g. in the wait loops"""
+    @wraps(func)
+    def wrapper_func(self, *args, **kwargs):
+        renew_execution_lease(self.event)
+        return func(self, *args, **kwargs)
+    return wrapper_func
@@ -0,0 +1,31 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional
+
+
+class TaskResult(NamedTuple):
+    item: Any
+    result: Any = None
+    error: Optional[Exception] = None
+
+
+def run_concurrently(func: Callable, items: Iterable, max_workers: int = 8) -> List[TaskResult]:
+    """Calls func(item) for every item on a bounded thread pool.
+
+    Errors are collected per item instead of aborting the other calls, results keep the order of items.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def _run(item) -> TaskResult:
+        try:
+            return TaskResult(item, func(item))
+        except Exception as error:
+            return TaskResult(item, error=error)
+
+    if len(items) == 1 or max_workers <= 1:
+        return [_run(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(_run, items))
@@ -2,16 +2,45 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import atexit
 import json
 import os
 import ssl
 from datetime import datetime, timezone
 from decimal import Decimal
+from http.client import HTTPException, HTTPSConnection
+from threading import Lock
+from typing import List, Optional, Union
 from urllib import request, error
+from urllib.parse import urlparse
 
 from aws_lambda_powertools import Logger
 
 METRICS_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # This is the required format for the metrics API. Any changes should be taken with care
+METRICS_URL = 'https://metrics.awssolutionsbuilder.com/generic'
+
+_ssl_context: Optional[ssl.SSLContext] = None
+_metrics_sink = None
+_lock = Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    # loading the CA bundle is the expensive part of a TLS handshake setup, do it once per container
+    global _ssl_context
+    with _lock:
+        if _ssl_context is None:
+            _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def build_metrics_body(data, solution_id='SO0058') -> bytes:
+    time_stamp = {'TimeStamp': datetime.now(timezone.utc).strftime(METRICS_TIMESTAMP_FORMAT)}
+    params = {'Solution': solution_id,
+              'UUID': os.environ.get('SOLUTION_UUID'),
+              'AccountId': os.environ.get('AWS_ACCOUNT_ID', 'unknown'),
+              'StackId': os.environ.get('STACK_ID', 'unknown'),
+              'Data': data}
+    return json.dumps(dict(time_stamp, **params), cls=DecimalEncoder).encode('utf-8')
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -28,23 +57,13 @@ class Metrics(object):
     def __init__(self):
         self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
 
-    def metrics(self, data, solution_id='SO0058', url='https://metrics.awssolutionsbuilder.com/generic'):
+    def metrics(self, data, solution_id='SO0058', url=METRICS_URL):
         try:
-            uuid = os.environ.get('SOLUTION_UUID')
-            time_stamp = {'TimeStamp': datetime.now(timezone.utc).strftime(METRICS_TIMESTAMP_FORMAT)}
-            params = {'Solution': solution_id,
-                      'UUID': uuid,
-                      'AccountId': os.environ.get('AWS_ACCOUNT_ID', 'unknown'),
-                      'StackId': os.environ.get('STACK_ID', 'unknown'),
-                      'Data': data}
-            metrics = dict(time_stamp, **params)
-            json_data = json.dumps(metrics, cls=DecimalEncoder)
             headers = {'content-type': 'application/json'}
-            context = ssl.create_default_context()
-            req = request.Request(url, data=json_data.encode('utf-8'), headers=headers, method='POST')
+            req = request.Request(url, data=build_metrics_body(data, solution_id), headers=headers, method='POST')
 
             try:
-                with request.urlopen(req, context=context) as response:
+                with request.urlopen(req, context=get_ssl_context()) as response:
                     response_code = response.getcode()  # Get the response code
                     return response_code
             except error.HTTPError as e:
@@ -55,3 +74,76 @@ class Metrics(object):
                 return str(e.reason)
         except Exception as err:
             self.logger.error(str(err))
+
+
+class MetricsSink:
+    """Buffers metrics payloads and posts them over one keep-alive HTTPS connection.
+
+    The metrics API takes one payload per request, so a flush sends the buffered payloads
+    back to back on the same connection instead of opening a TLS session per payload.
+    The buffer is flushed when it reaches batch_size, on flush() and when the process exits.
+    Flushing happens on the caller's thread: Lambda freezes background threads between invocations.
+    """
+
+    def __init__(self, solution_id='SO0058', url=METRICS_URL, batch_size: int = None):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.solution_id = solution_id
+        parsed_url = urlparse(url)
+        self.host = parsed_url.netloc
+        self.path = parsed_url.path or '/'
+        self.batch_size = batch_size if batch_size else int(os.getenv('METRICS_BATCH_SIZE', '50'))
+        self._buffer: List[bytes] = []
+        self._lock = Lock()
+        self._connection: Optional[HTTPSConnection] = None
+
+    def put(self, data) -> None:
+        with self._lock:
+            self._buffer.append(build_metrics_body(data, self.solution_id))
+            buffer_full = len(self._buffer) >= self.batch_size
+        if buffer_full:
+            self.flush()
+
+    def flush(self) -> List[Union[int, str]]:
+        """Sends all buffered payloads, returns the response code (or error) per payload"""
+        with self._lock:
+            bodies, self._buffer = self._buffer, []
+            results = [self._post(body) for body in bodies]
+        if bodies:
+            self.logger.debug(f"Flushed {len(bodies)} metrics payloads: {results}")
+        return results
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._close_connection()
+
+    def _post(self, body: bytes) -> Union[int, str]:
+        # a kept-alive connection may have been closed by the server, reconnect once
+        for attempt in range(2):
+            try:
+                if self._connection is None:
+                    self._connection = HTTPSConnection(self.host, context=get_ssl_context(), timeout=10)
+                self._connection.request('POST', self.path, body=body, headers={'content-type': 'application/json'})
+                response = self._connection.getresponse()
+                response.read()
+                return response.status
+            except (HTTPException, OSError) as err:
+                self._close_connection()
+                if attempt:
+                    self.logger.error(str(err))
+                    return str(err)
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def get_metrics_sink() -> MetricsSink:
+    """Process-wide sink, flushed at interpreter exit"""
+    global _metrics_sink
+    with _lock:
+        if _metrics_sink is None:
+            _metrics_sink = MetricsSink()
+            atexit.register(_metrics_sink.close)
+    return _metrics_sink
@@ -0,0 +1,66 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Accumulates the status tags of a spoke account and writes them with few CreateTags calls"""
+
+import os
+from typing import Dict, List, Tuple
+
+from aws_lambda_powertools import Logger
+
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceNotFoundException
+
+# CreateTags accepts up to 1000 resource ids per call
+MAX_RESOURCES_PER_CALL = 1000
+
+
+class TagWriter:
+    """Collects tag writes per (resource, key) until flush, the last value of a key wins.
+
+    Resources that get the same set of tags share one CreateTags call.
+    """
+
+    def __init__(self, ec2_client):
+        self.logger = Logger(level=os.getenv('LOG_LEVEL'), service=self.__class__.__name__)
+        self.ec2_client = ec2_client
+        self.pending: Dict[Tuple[str, str], str] = {}
+
+    def add(self, resource_id: str, key: str, value: str) -> None:
+        self.pending[(resource_id, key)] = value
+
+    def flush(self) -> int:
+        """Writes the pending tags
+
+        Returns:
+            number of CreateTags calls
+        """
+        tags_by_resource: Dict[str, Dict[str, str]] = {}
+        for (resource_id, key), value in self.pending.items():
+            tags_by_resource.setdefault(resource_id, {})[key] = value
+        self.pending = {}
+
+        resources_by_tags: Dict[Tuple[Tuple[str, str], ...], List[str]] = {}
+        for resource_id, tags in tags_by_resource.items():
+            resources_by_tags.setdefault(tuple(sorted(tags.items())), []).append(resource_id)
+
+        calls = 0
+        for tags, resource_ids in resources_by_tags.items():
+            tags_list = [{"Key": key, "Value": value} for key, value in tags]
+            for index in range(0, len(resource_ids), MAX_RESOURCES_PER_CALL):
+                chunk = resource_ids[index:index + MAX_RESOURCES_PER_CALL]
+                calls += 1
+                try:
+                    self.ec2_client.create_tags_batch(chunk, tags_list)
+                except ResourceNotFoundException:
+                    if len(chunk) == 1:
+                        raise
+                    # a single deleted resource fails the whole call, the others are tagged one by one
+                    calls += self._write_each(chunk, tags_list)
+        return calls
+
+    def _write_each(self, resource_ids: List[str], tags_list: List[dict]) -> int:
+        for resource_id in resource_ids:
+            try:
+                self.ec2_client.create_tags_batch(resource_id, tags_list)
+            except ResourceNotFoundException:
+                self.logger.warning(f"Resource {resource_id} no longer exists, skipping its tags {tags_list}")
+        return len(resource_ids)
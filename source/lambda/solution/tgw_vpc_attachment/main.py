@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: Apache-2.0
 """State Machine Router module"""
 
+import json
 import os.path
 
 import boto3
@@ -14,13 +15,25 @@ from solution.tgw_vpc_attachment.lib.exceptions import (
     AttachmentCreationInProgressException,
     AlreadyConfiguredException,
     ResourceBusyException,
-    RouteTableNotFoundException
+    RouteTableNotFoundException,
+    VpcLeaseLostException
 )
 from solution.tgw_vpc_attachment.lib.handlers.approval_notifications_handler import ApprovalNotification
+from solution.tgw_vpc_attachment.lib.handlers.audit_archive_handler import AuditArchiver
+from solution.tgw_vpc_attachment.lib.handlers.drift_reconciler_handler import TransitGatewayDriftReconciler
 from solution.tgw_vpc_attachment.lib.handlers.dynamodb_handler import DynamoDb
 from solution.tgw_vpc_attachment.lib.handlers.general_functions_handler import GeneralFunctions
 from solution.tgw_vpc_attachment.lib.handlers.resource_access_manager_handler import ResourceAccessManager
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_batch_handler import (
+    TransitGatewayVPCAttachmentBatch,
+    coalesce_tag_events,
+    forward_to_state_machine,
+    latest_tag_events,
+    requires_state_machine
+)
 from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_handler import TransitGatewayVPCAttachments
+from solution.tgw_vpc_attachment.lib.handlers.vpc_lease import VpcLease, acquire_execution_lease, \
+    is_lease_enabled, release_execution_lease
 from solution.tgw_vpc_attachment.lib.handlers.vpc_handler import VPCHandler
 
 ERROR_MESSAGE = "Function name does not match any function in the handler file."
@@ -51,6 +64,8 @@ def lambda_handler(event, _):
                 return sns(event, function_name)
             elif class_name == "GeneralFunctions":
                 return general_functions(event, function_name)
+            elif class_name == "VpcLease":
+                return lease(event, function_name)
             else:
                 logger.info(ERROR_MESSAGE)
                 return {"Message": ERROR_MESSAGE}
@@ -63,7 +78,8 @@ def lambda_handler(event, _):
             AttachmentCreationInProgressException,
             AlreadyConfiguredException,
             ResourceBusyException,
-            RouteTableNotFoundException
+            RouteTableNotFoundException,
+            VpcLeaseLostException
     ) as e:
         raise e
     except Exception as error:
@@ -72,10 +88,118 @@ def lambda_handler(event, _):
         raise error
 
 
+def batch_lambda_handler(event, _):
+    """Coalesces queued tag events per VPC and applies one TGW attachment change per VPC.
+
+    Accepts an SQS batch ("Records") or a list of tag events ("events"). Only subnet attachment tag
+    changes are batched, the other tag events start the state machine. The tag events of a VPC that
+    requires approval start the state machine too. After the attachment change the state machine is
+    started for each tag event of the VPC, it continues with the routes, the association, the propagations
+    and the attachment tags. Messages of VPCs that could not be processed are reported back as
+    batchItemFailures so only they are retried.
+    """
+    logger.info("Batch Lambda Handler Event")
+    logger.info(event)
+    if "Records" in event:
+        events = [(record.get("messageId"), json.loads(record.get("body"))) for record in event["Records"]]
+    else:
+        events = list(enumerate(event.get("events", [])))
+
+    results, failed_message_ids = [], set()
+    batched_events = []
+    for message_id, tag_event in events:
+        if not requires_state_machine(tag_event):
+            batched_events.append((message_id, tag_event))
+            continue
+        try:
+            results.append({"account": tag_event.get("account"), "Resources": tag_event.get("resources"),
+                            "Status": "forwarded", "ExecutionArn": forward_to_state_machine(tag_event)})
+        except Exception as error:
+            logger.exception(f"Error while forwarding the tag event {message_id} to the state machine: {error}")
+            failed_message_ids.add(message_id)
+
+    tag_events = latest_tag_events(batched_events)
+    for account_id, resources in coalesce_tag_events(batched_events).items():
+        try:
+            batch = TransitGatewayVPCAttachmentBatch(account_id)
+            resources_by_vpc = batch.group_resources_by_vpc(list(resources))
+        except Exception as error:
+            logger.exception(f"Error while grouping tag events of account {account_id}: {error}")
+            failed_message_ids.update(message_id for ids in resources.values() for message_id in ids)
+            continue
+
+        for vpc_id, resource_ids in resources_by_vpc.items():
+            message_ids = {message_id for resource_id in resource_ids for message_id in resources.get(resource_id, [])}
+            vpc_events = [tag_events[resource_id] for resource_id in resource_ids if resource_id in tag_events]
+            try:
+                if batch.requires_approval(vpc_events[-1]):
+                    # the approval workflow of the state machine decides on each change
+                    result = {"account": account_id, "VpcId": vpc_id, "Status": "forwarded",
+                              "ExecutionArns": [forward_to_state_machine(vpc_event) for vpc_event in vpc_events]}
+                else:
+                    result = _apply_desired_state(batch, vpc_id)
+                    result.update({"Status": "processed", "ExecutionArns": batch.hand_off(result, vpc_events)})
+            except (ResourceBusyException, AttachmentCreationInProgressException) as error:
+                result = {"account": account_id, "VpcId": vpc_id, "Status": "busy", "Comment": str(error)}
+                failed_message_ids.update(message_ids)
+            except Exception as error:
+                logger.exception(f"Error while applying the desired state of VPC {vpc_id}: {error}")
+                result = {"account": account_id, "VpcId": vpc_id, "Status": "failed", "Comment": str(error)}
+                failed_message_ids.update(message_ids)
+            results.append(result)
+
+    response = {
+        "VpcResults": results,
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in sorted(failed_message_ids, key=str)]
+    }
+    logger.info(response)
+    return response
+
+
+def _apply_desired_state(batch: TransitGatewayVPCAttachmentBatch, vpc_id: str) -> dict:
+    if is_lease_enabled():
+        with VpcLease(vpc_id):
+            return batch.apply_desired_state(batch.get_desired_state(vpc_id))
+    return batch.apply_desired_state(batch.get_desired_state(vpc_id))
+
+
+def reconciler_lambda_handler(event, _):
+    """Scheduled drift detection between the spoke tags and the TGW attachments.
+
+    Set "apply" to correct the association/propagation drift that does not require approval.
+    The spoke accounts with an attachment or an audit record are scanned, "Accounts" adds spoke
+    accounts the solution has never processed, otherwise their MissingAttachment drift is not found.
+    """
+    logger.info("Reconciler Lambda Handler Event")
+    logger.info(event)
+    return TransitGatewayDriftReconciler().reconcile(event.get("Accounts", []), event.get("apply", False))
+
+
+def archiver_lambda_handler(event, _):
+    """Archives the audit items removed by the DynamoDB TTL, invoked by the table stream"""
+    logger.info("Archiver Lambda Handler Event")
+    return AuditArchiver().archive(event.get("Records", []))
+
+
 def transit_gateway(event, function_name):
     logger.info(ROUTER_FUNCTION_NAME.format(function_name))
 
     tgw = TransitGatewayVPCAttachments(event)
+    try:
+        return _route_transit_gateway(tgw, function_name)
+    finally:
+        _flush_tags(tgw.tag_writer)
+
+
+def _flush_tags(tag_writer):
+    # status tags are best effort, a failed write must not replace the result or the error of the step
+    try:
+        tag_writer.flush()
+    except Exception as error:
+        logger.exception(f"Error while writing the status tags: {error}")
+
+
+def _route_transit_gateway(tgw, function_name):
     if function_name == "describe_transit_gateway_vpc_attachments":
         response = tgw.describe_transit_gateway_vpc_attachments()
     elif function_name == "tgw_attachment_crud_operations":
@@ -111,6 +235,13 @@ def vpc(event, function_name):
     logger.info(ROUTER_FUNCTION_NAME.format(function_name))
 
     vpc_handler = VPCHandler(event)
+    try:
+        return _route_vpc(vpc_handler, function_name)
+    finally:
+        _flush_tags(vpc_handler.tag_writer)
+
+
+def _route_vpc(vpc_handler, function_name):
     if function_name == "describe_resources":
         response = vpc_handler.describe_resources()
     elif function_name == "default_route_crud_operations":
@@ -180,3 +311,17 @@ def general_functions(event, function_name):
         return {"Message": ERROR_MESSAGE}
     logger.info(response)
     return response
+
+
+def lease(event, function_name):
+    logger.info(ROUTER_FUNCTION_NAME.format(function_name))
+
+    if function_name == "acquire":
+        response = acquire_execution_lease(event)
+    elif function_name == "release":
+        response = release_execution_lease(event)
+    else:
+        logger.info(ERROR_MESSAGE)
+        return {"Message": ERROR_MESSAGE}
+    logger.info(response)
+    return response
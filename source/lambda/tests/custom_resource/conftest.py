@@ -6,6 +6,9 @@
 import os
 import pytest
 
+# the backfill of the audit table imports the STNO clients, which read USER_AGENT_STRING at import
+os.environ['USER_AGENT_STRING'] = 'AwsSolution/SO0058/v1.0.0'
+
 
 @pytest.fixture(scope="module", autouse=True)
 def aws_credentials():
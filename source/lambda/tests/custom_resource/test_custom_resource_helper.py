@@ -57,6 +57,11 @@ CREATE_PREFIX["ResourceType"] = "Custom::GetPrefixListArns"
 CREATE_METRICS = deepcopy(CFN_REQUEST_EVENT)
 CREATE_METRICS["ResourceType"] = "Custom::SendCFNParameters"
 
+UPDATE_LATEST_STATUS_BACKFILL = deepcopy(CFN_REQUEST_EVENT)
+UPDATE_LATEST_STATUS_BACKFILL["RequestType"] = "Update"
+UPDATE_LATEST_STATUS_BACKFILL["ResourceType"] = "Custom::BackfillLatestStatus"
+UPDATE_LATEST_STATUS_BACKFILL["ResourceProperties"] = {"TableName": "stno_table", "SolutionVersion": "v1.0.0"}
+
 context = Mock()
 context.get_remaining_time_in_millis = Mock()
 context.get_remaining_time_in_millis.return_value = 10000
@@ -83,6 +88,21 @@ class TestClassCfnHandler:
             CREATE_UUID_REQUEST, context, "SUCCESS", mock_uuid, None
         )
 
+    def test__success__backfill_latest_status(self, mocker):
+        """success, the latest audit items get their LatestStatus"""
+        m1 = mocker.patch(
+            "solution.custom_resource.lib.custom_resource_helper.backfill_latest_status",
+            return_value=3,
+        )
+        mocker.patch("solution.custom_resource.lib.custom_resource_helper.DDB")
+        m2 = mocker.patch("solution.custom_resource.lib.custom_resource_helper.send")
+
+        cfn_handler(UPDATE_LATEST_STATUS_BACKFILL, context)
+        assert m1.call_count == 1
+        m2.assert_called_once_with(
+            UPDATE_LATEST_STATUS_BACKFILL, context, "SUCCESS", {"Updated": "3"}, None
+        )
+
     def test__failed__create_uuid(self, mocker):
         """success, create uuid"""
         error = "error in handle_uuid"
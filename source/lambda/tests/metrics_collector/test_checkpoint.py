@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Unit tests for the metrics collector checkpoint"""
+
+from datetime import date
+
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+from solution.metrics_collector.checkpoint import MetricsCheckpoint
+
+CHECKPOINT_TABLE_NAME = 'stno_metrics_checkpoint'
+TGW_ID = 'tgw-0123456789abcdef0'
+
+
+@pytest.fixture
+def checkpoint_table(monkeypatch):
+    # AWS_ACCOUNT_ID would otherwise route DynamoDB calls to the account endpoint, which moto does not mock
+    monkeypatch.setenv('AWS_ACCOUNT_ID_ENDPOINT_MODE', 'disabled')
+    with mock_dynamodb():
+        boto3.client('dynamodb').create_table(
+            TableName=CHECKPOINT_TABLE_NAME,
+            KeySchema=[{'AttributeName': 'TgwId', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'TgwId', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST')
+        yield CHECKPOINT_TABLE_NAME
+
+
+def test_get_last_collected_date_without_checkpoint(checkpoint_table):
+    assert MetricsCheckpoint(checkpoint_table).get_last_collected_date(TGW_ID) is None
+
+
+def test_advance_stores_the_last_collected_date(checkpoint_table):
+    # ARRANGE
+    checkpoint = MetricsCheckpoint(checkpoint_table)
+
+    # ACT
+    advanced = checkpoint.advance(TGW_ID, date(2024, 1, 10))
+
+    # ASSERT
+    assert advanced
+    assert checkpoint.get_last_collected_date(TGW_ID) == date(2024, 1, 10)
+    assert checkpoint.get_last_collected_date('tgw-other') is None
+
+
+def test_advance_never_moves_the_checkpoint_back(checkpoint_table):
+    # ARRANGE
+    checkpoint = MetricsCheckpoint(checkpoint_table)
+    checkpoint.advance(TGW_ID, date(2024, 1, 10))
+
+    # ACT
+    advanced_back = checkpoint.advance(TGW_ID, date(2024, 1, 5))
+    advanced_same = checkpoint.advance(TGW_ID, date(2024, 1, 10))
+
+    # ASSERT
+    assert not advanced_back
+    assert not advanced_same
+    assert checkpoint.get_last_collected_date(TGW_ID) == date(2024, 1, 10)
@@ -20,7 +20,7 @@ class TestMetricsCollectorMain:
         test_context.aws_request_id = "test-request-id"
         
         # Mock MetricsCollector
-        with patch('solution.metrics_collector.main.MetricsCollector') as mock_collector_class:
+        with patch('solution.metrics_collector.handler.MetricsCollector') as mock_collector_class:
             mock_collector_instance = Mock()
             mock_collector_instance.collect_all_metrics.return_value = {
                 "status": "success",
@@ -38,13 +38,15 @@ class TestMetricsCollectorMain:
             assert call_args[0] == test_event  
            
             assert call_args[1] is not None  
+            assert call_args[2] == "tgw-0123456789abcdef0"
             
         
             mock_collector_instance.collect_all_metrics.assert_called_once()
             
    
             assert result["status"] == "success"
-            assert "Collected metrics for TGW" in result["message"]
+            assert result["message"] == "Collected metrics for 1 of 1 transit gateway(s)"
+            assert "Collected metrics for TGW" in result["targets"][0]["message"]
 
     def test_lambda_handler_exception(self):
         """Test Lambda handler exception handling"""
@@ -52,7 +54,7 @@ class TestMetricsCollectorMain:
         test_context = Mock()
         
         # Mock MetricsCollector to raise exception
-        with patch('solution.metrics_collector.main.MetricsCollector') as mock_collector_class:
+        with patch('solution.metrics_collector.handler.MetricsCollector') as mock_collector_class:
             mock_collector_instance = Mock()
             mock_collector_instance.collect_all_metrics.side_effect = Exception("Test error")
             mock_collector_class.return_value = mock_collector_instance
@@ -66,18 +68,18 @@ class TestMetricsCollectorMain:
         test_event = {"source": "aws.events"}
         test_context = Mock()
         
-        with patch('solution.metrics_collector.main.MetricsCollector') as mock_collector_class:
+        with patch('solution.metrics_collector.handler.MetricsCollector') as mock_collector_class:
             with patch('solution.metrics_collector.main.logger') as mock_logger:
                 mock_collector_instance = Mock()
-                mock_collector_instance.collect_all_metrics.return_value = {"status": "success"}
+                mock_collector_instance.collect_all_metrics.return_value = {"status": "success", "message": ""}
                 mock_collector_class.return_value = mock_collector_instance
                 
-                lambda_handler(test_event, test_context)
+                response = lambda_handler(test_event, test_context)
                 
               
                 mock_logger.info.assert_any_call("Metrics Collector - Starting scheduled metrics collection")
                 mock_logger.info.assert_any_call(f"Event: {test_event}")
-                mock_logger.info.assert_any_call(f"Metrics collection completed: {{'status': 'success'}}")
+                mock_logger.info.assert_any_call(f"Metrics collection completed: {response}")
 
     def test_lambda_handler_different_event_types(self):
         """Test Lambda handler with different event types"""
@@ -90,9 +92,9 @@ class TestMetricsCollectorMain:
         
         test_context = Mock()
         
-        with patch('solution.metrics_collector.main.MetricsCollector') as mock_collector_class:
+        with patch('solution.metrics_collector.handler.MetricsCollector') as mock_collector_class:
             mock_collector_instance = Mock()
-            mock_collector_instance.collect_all_metrics.return_value = {"status": "success"}
+            mock_collector_instance.collect_all_metrics.return_value = {"status": "success", "message": ""}
             mock_collector_class.return_value = mock_collector_instance
             
             result = lambda_handler(eventbridge_event, test_context)
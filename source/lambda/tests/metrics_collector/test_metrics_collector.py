@@ -3,12 +3,24 @@
 # SPDX-License-Identifier: Apache-2.0
 """Unit tests for MetricsCollector class"""
 
+import threading
+
 import pytest
 from unittest.mock import Mock, patch
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from freezegun import freeze_time
 from moto import mock_ec2, mock_cloudwatch
 
-from solution.metrics_collector.handler import MetricsCollector
+from solution.metrics_collector.handler import (
+    METRIC_SPECS,
+    MetricsCollector,
+    MetricSpec,
+    build_metric_queries,
+    collect_all_targets,
+    decode_metric_results,
+    get_collection_days,
+    get_collection_targets
+)
 
 
 @mock_ec2
@@ -107,7 +119,8 @@ class TestMetricsCollector:
         
         with patch.object(self.metrics_collector.cloudwatch_client, 'get_metric_data', return_value=mock_cw_response):
             with patch.object(self.metrics_collector, '_emit_attachment_metrics') as mock_emit:
-                self.metrics_collector._collect_batch_metrics(attachments)
+                self.metrics_collector._emit_batch_metrics(
+                    attachments, self.metrics_collector._get_batch_metrics(attachments))
                 
                 # Verify emit was called with correct parameters
                 mock_emit.assert_called_once()
@@ -235,19 +248,16 @@ class TestMetricsCollector:
                 'VpcId': f'vpc-{i}'
             })
         
-        with patch.object(self.metrics_collector, '_collect_batch_metrics') as mock_batch:
+        with patch.object(self.metrics_collector, '_get_batch_metrics') as mock_batch, \
+                patch.object(self.metrics_collector, '_emit_batch_metrics'):
             self.metrics_collector._collect_attachment_metrics_batch(attachments)
             
            
             assert mock_batch.call_count == 2
             
           
-            first_call_attachments = mock_batch.call_args_list[0][0][0]
-            assert len(first_call_attachments) == 125
-            
-         
-            second_call_attachments = mock_batch.call_args_list[1][0][0]
-            assert len(second_call_attachments) == 75
+            batch_sizes = sorted(len(call[0][0]) for call in mock_batch.call_args_list)
+            assert batch_sizes == [75, 125]
 
     def test_hashed_ids_in_payload(self):
         """Test that resource IDs are properly hashed in payloads"""
@@ -285,3 +295,289 @@ class TestMetricsCollector:
             # Verify account_id and stack_id are NOT hashed
             assert payload['account_id'] == '123456789012'
             assert 'arn:aws:cloudformation' in payload['stack_id']
+
+
+def create_collector(days=1):
+    """Collector with a mocked sink, collecting the given number of days up to yesterday"""
+    collector = MetricsCollector({"source": "aws.events"}, Mock())
+    collector.metrics_sink = Mock()
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date()
+    collector.days = [yesterday - timedelta(days=offset) for offset in reversed(range(days))]
+    collector.start_time = datetime.combine(collector.days[0], datetime.min.time()).replace(tzinfo=timezone.utc)
+    return collector
+
+
+def create_attachments(count):
+    return [{'TransitGatewayAttachmentId': f'tgw-attach-{i}', 'VpcId': f'vpc-{i}'} for i in range(count)]
+
+
+@patch.dict('os.environ', {'COLLECTOR_MAX_WORKERS': '3', 'COLLECTOR_REQUESTS_PER_SECOND': '0'})
+@patch('solution.metrics_collector.handler.MAX_QUERIES_PER_REQUEST', 8)
+def test_collect_attachment_metrics_batch_fetches_batches_concurrently():
+    # ARRANGE
+    collector = create_collector()
+    attachments = create_attachments(6)
+    # every fetch waits until three of them run at the same time
+    barrier = threading.Barrier(3, timeout=5)
+
+    def get_batch_metrics(batch, _rate_limiter):
+        barrier.wait()
+        return [[[float(i) for i, _ in enumerate(batch)] for _ in range(4)]]
+
+    # ACT
+    with patch.object(collector, '_get_batch_metrics', side_effect=get_batch_metrics) as mock_fetch:
+        collector._collect_attachment_metrics_batch(attachments)
+
+    # ASSERT
+    assert mock_fetch.call_count == 3
+    emitted = [call[0][0]['data']['attachment']['attachment_id_hash'] for call in collector.metrics_sink.put.call_args_list]
+    assert len(emitted) == 6
+    assert len(set(emitted)) == 6
+
+
+@patch.dict('os.environ', {'COLLECTOR_MAX_WORKERS': '2', 'COLLECTOR_REQUESTS_PER_SECOND': '0'})
+@patch('solution.metrics_collector.handler.MAX_QUERIES_PER_REQUEST', 4)
+def test_collect_attachment_metrics_batch_raises_fetch_error_after_other_batches():
+    # ARRANGE
+    collector = create_collector()
+    attachments = create_attachments(4)
+
+    def get_batch_metrics(batch, _rate_limiter):
+        if batch[0]['TransitGatewayAttachmentId'] == 'tgw-attach-1':
+            raise ValueError("Throttled")
+        return [[[1.0] for _ in range(4)]]
+
+    # ACT
+    with patch.object(collector, '_get_batch_metrics', side_effect=get_batch_metrics):
+        with pytest.raises(ValueError, match="Throttled"):
+            collector._collect_attachment_metrics_batch(attachments)
+
+    # ASSERT
+    assert collector.metrics_sink.put.call_count == 3
+
+
+@patch.dict('os.environ', {'COLLECTOR_MAX_WORKERS': '1', 'COLLECTOR_REQUESTS_PER_SECOND': '0'})
+@patch('solution.metrics_collector.handler.MAX_QUERIES_PER_REQUEST', 4)
+def test_collect_attachment_metrics_batch_emit_error_does_not_block_shutdown():
+    # ARRANGE
+    collector = create_collector()
+    # far more batches than the result queue holds
+    attachments = create_attachments(20)
+    result = {}
+
+    def collect():
+        with patch.object(collector, '_get_batch_metrics', return_value=[[[1.0] for _ in range(4)]]), \
+                patch.object(collector, '_emit_batch_metrics', side_effect=ValueError("Sink failed")):
+            try:
+                collector._collect_attachment_metrics_batch(attachments)
+            except ValueError as error:
+                result['error'] = error
+
+    # ACT
+    thread = threading.Thread(target=collect, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    # ASSERT
+    assert not thread.is_alive()
+    assert str(result['error']) == "Sink failed"
+
+
+def test_metric_spec_defaults():
+    spec = MetricSpec('bytes_in', 'BytesIn')
+    assert (spec.stat, spec.period, spec.namespace) == ('Sum', 86400, 'AWS/TransitGateway')
+
+
+def test_build_metric_queries_ids_and_metric_stats():
+    # ARRANGE
+    specs = (MetricSpec('bytes_in', 'BytesIn'), MetricSpec('peak', 'BytesOut', stat='Maximum', period=3600))
+    dimension_sets = [[{'Name': 'TransitGateway', 'Value': 'tgw-1'}],
+                      [{'Name': 'TransitGateway', 'Value': 'tgw-2'}]]
+
+    # ACT
+    queries = build_metric_queries(specs, dimension_sets)
+
+    # ASSERT
+    assert [query['Id'] for query in queries] == ['m0_0', 'm1_0', 'm0_1', 'm1_1']
+    assert queries[1]['MetricStat'] == {
+        'Metric': {'Namespace': 'AWS/TransitGateway', 'MetricName': 'BytesOut',
+                   'Dimensions': [{'Name': 'TransitGateway', 'Value': 'tgw-1'}]},
+        'Period': 3600,
+        'Stat': 'Maximum'
+    }
+    assert queries[2]['MetricStat']['Metric']['Dimensions'] == dimension_sets[1]
+
+
+def test_build_metric_queries_ids_are_valid_cloudwatch_ids():
+    queries = build_metric_queries(METRIC_SPECS, [[{'Name': 'TransitGateway', 'Value': 'tgw-1'}]] * 125)
+    assert len(queries) == 500
+    assert len({query['Id'] for query in queries}) == 500
+    # GetMetricData ids start with a lower case letter
+    assert all(query['Id'][0].islower() for query in queries)
+
+
+def test_decode_metric_results_columns_by_day_spec_and_position():
+    # ARRANGE
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    results = [
+        {'Id': 'm0_0', 'Timestamps': [start_time, start_time + timedelta(days=1)], 'Values': [10.0, 11.0]},
+        {'Id': 'm1_2', 'Timestamps': [start_time + timedelta(days=1)], 'Values': [5.0]},
+    ]
+
+    # ACT
+    columns = decode_metric_results(results, spec_count=2, target_count=3, start_time=start_time, day_count=2)
+
+    # ASSERT
+    assert columns == [
+        [[10.0, 0.0, 0.0], [0.0, 0.0, 0.0]],
+        [[11.0, 0.0, 0.0], [0.0, 0.0, 5.0]],
+    ]
+
+
+def test_decode_metric_results_missing_datapoints_are_zero():
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    results = [{'Id': 'm0_0', 'Timestamps': [], 'Values': []}, {'Id': 'm1_0'}]
+    assert decode_metric_results(results, 2, 1, start_time) == [[[0.0], [0.0]]]
+
+
+def test_decode_metric_results_ignores_datapoints_outside_the_days():
+    start_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    results = [{'Id': 'm0_0', 'Timestamps': [start_time - timedelta(days=1), start_time + timedelta(days=2)],
+                'Values': [1.0, 2.0]}]
+    assert decode_metric_results(results, 1, 1, start_time, day_count=2) == [[[0.0]], [[0.0]]]
+
+
+@freeze_time("2024-01-15 06:00:00")
+def test_get_collection_days_defaults_to_yesterday():
+    assert get_collection_days({"source": "aws.events"}, None) == [date(2024, 1, 14)]
+
+
+@freeze_time("2024-01-15 06:00:00")
+def test_get_collection_days_resumes_after_the_checkpoint():
+    assert get_collection_days({}, date(2024, 1, 11)) == [date(2024, 1, 12), date(2024, 1, 13), date(2024, 1, 14)]
+
+
+@freeze_time("2024-01-15 06:00:00")
+def test_get_collection_days_up_to_date():
+    assert get_collection_days({}, date(2024, 1, 14)) == []
+
+
+@freeze_time("2024-01-15 06:00:00")
+@patch.dict('os.environ', {'MAX_BACKFILL_DAYS': '3'})
+def test_get_collection_days_clamps_to_max_backfill_days():
+    assert get_collection_days({}, date(2023, 6, 1)) == [date(2024, 1, 12), date(2024, 1, 13), date(2024, 1, 14)]
+
+
+@freeze_time("2024-01-15 06:00:00")
+def test_get_collection_days_backfill_range_never_includes_today():
+    event = {'detail': {'action': 'backfill', 'start_date': '2024-01-13', 'end_date': '2024-01-20'}}
+    assert get_collection_days(event, date(2024, 1, 14)) == [date(2024, 1, 13), date(2024, 1, 14)]
+
+
+def test_get_collection_days_backfill_without_start_date():
+    with pytest.raises(ValueError, match="detail.start_date"):
+        get_collection_days({'detail': {'action': 'backfill'}}, None)
+
+
+@freeze_time("2024-01-15 06:00:00")
+@patch.dict('os.environ', {'CHECKPOINT_TABLE_NAME': 'stno_metrics_checkpoint'})
+@patch('solution.metrics_collector.handler.MetricsCheckpoint')
+def test_collect_all_metrics_advances_the_checkpoint_after_success(mock_checkpoint_class):
+    # ARRANGE
+    mock_checkpoint_class.return_value.get_last_collected_date.return_value = date(2024, 1, 12)
+    collector = MetricsCollector({"source": "aws.events"}, Mock())
+    collector.metrics_sink = Mock()
+
+    # ACT
+    with patch.object(collector, '_get_tgw_attachments', return_value=[]), \
+            patch.object(collector, '_collect_attachment_metrics_batch'), \
+            patch.object(collector, '_collect_tgw_metrics'):
+        collector.collect_all_metrics()
+
+    # ASSERT
+    assert collector.days == [date(2024, 1, 13), date(2024, 1, 14)]
+    mock_checkpoint_class.return_value.advance.assert_called_once_with(collector.tgw_id, date(2024, 1, 14))
+
+
+@freeze_time("2024-01-15 06:00:00")
+@patch.dict('os.environ', {'CHECKPOINT_TABLE_NAME': 'stno_metrics_checkpoint'})
+@patch('solution.metrics_collector.handler.MetricsCheckpoint')
+def test_collect_all_metrics_keeps_the_checkpoint_after_failure(mock_checkpoint_class):
+    # ARRANGE
+    mock_checkpoint_class.return_value.get_last_collected_date.return_value = date(2024, 1, 12)
+    collector = MetricsCollector({"source": "aws.events"}, Mock())
+    collector.metrics_sink = Mock()
+
+    # ACT
+    with patch.object(collector, '_get_tgw_attachments', return_value=[]), \
+            patch.object(collector, '_collect_attachment_metrics_batch', side_effect=ValueError("Throttled")):
+        with pytest.raises(ValueError, match="Throttled"):
+            collector.collect_all_metrics()
+
+    # ASSERT
+    mock_checkpoint_class.return_value.advance.assert_not_called()
+    collector.metrics_sink.flush.assert_called_once()
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': 'tgw-env:eu-west-1'})
+def test_get_collection_targets_event_targets_come_first():
+    event = {'detail': {'targets': [{'TgwId': 'tgw-a', 'Region': 'us-west-2'}, {'TgwId': 'tgw-b'},
+                                    {'TgwId': 'tgw-a', 'Region': 'us-west-2'}]}}
+    assert get_collection_targets(event) == [('tgw-a', 'us-west-2'), ('tgw-b', None)]
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': 'tgw-1:us-east-1, tgw-2 ,,'})
+def test_get_collection_targets_from_the_environment():
+    assert get_collection_targets({}) == [('tgw-1', 'us-east-1'), ('tgw-2', None)]
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': ''})
+def test_get_collection_targets_defaults_to_the_solution_tgw():
+    assert get_collection_targets({}) == [('tgw-0123456789abcdef0', None)]
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': '', 'TGW_ID': ''})
+def test_collect_all_targets_without_targets():
+    with pytest.raises(ValueError, match="TGW_ID environment variable not set"):
+        collect_all_targets({}, Mock())
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': 'tgw-1:us-east-1,tgw-2:us-west-2'})
+@patch('solution.metrics_collector.handler.MetricsCollector')
+def test_collect_all_targets_reports_a_failed_target(mock_collector_class):
+    # ARRANGE
+    def create_collector(_event, _logger, tgw_id, _region, _rate_limiter):
+        collector = Mock()
+        if tgw_id == 'tgw-2':
+            collector.collect_all_metrics.side_effect = ValueError("Throttled")
+        else:
+            collector.collect_all_metrics.return_value = {'status': 'success', 'message': 'Collected'}
+        return collector
+    mock_collector_class.side_effect = create_collector
+
+    # ACT
+    response = collect_all_targets({}, Mock())
+
+    # ASSERT
+    assert response['status'] == 'partial_failure'
+    assert response['message'] == 'Collected metrics for 1 of 2 transit gateway(s)'
+    assert response['targets'] == [
+        {'tgw_id': 'tgw-1', 'region': 'us-east-1', 'status': 'success', 'message': 'Collected'},
+        {'tgw_id': 'tgw-2', 'region': 'us-west-2', 'status': 'failed', 'message': 'Throttled'},
+    ]
+
+
+@patch.dict('os.environ', {'COLLECTOR_TARGETS': 'tgw-1:us-east-1,tgw-2:us-east-1'})
+@patch('solution.metrics_collector.handler.MetricsCollector')
+def test_collect_all_targets_fails_when_every_target_failed(mock_collector_class):
+    # ARRANGE
+    mock_collector_class.return_value.collect_all_metrics.side_effect = ValueError("Throttled")
+
+    # ACT
+    with pytest.raises(ValueError, match="Throttled"):
+        collect_all_targets({}, Mock())
+
+    # ASSERT
+    rate_limiters = {call[0][4] for call in mock_collector_class.call_args_list}
+    # targets in the same region share one rate limit
+    assert len(rate_limiters) == 1
@@ -6,6 +6,8 @@
 import os
 import pytest
 
+from solution.tgw_peering_attachment.lib.transit_gateway import clear_regional_client_cache
+
 
 @pytest.fixture(scope="module", autouse=True)
 def aws_credentials():
@@ -15,7 +17,16 @@ def aws_credentials():
     os.environ["AWS_SECURITY_TOKEN"] = "testing"
     os.environ["AWS_SESSION_TOKEN"] = "testing"
     os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    os.environ["AWS_REGION"] = "us-east-1"
     os.environ["SOLUTION_ID"] = "SOTestID"
     os.environ["TGW_PEERING_TAG"] = "TgwPeer"
     os.environ["TGW_ID"] = "tgw-0101010hubaccount"
     os.environ["AWS_ACCOUNT"] = "123456789012"
+
+
+@pytest.fixture(autouse=True)
+def clear_clients():
+    """Clients cached by a previous test are bound to its mocks"""
+    clear_regional_client_cache()
+    yield
+    clear_regional_client_cache()
@@ -0,0 +1,41 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Peering planner test module"""
+
+import pytest
+from solution.tgw_peering_attachment.lib.peering_planner import parse_peering_tag, plan_peering_changes
+from solution.tgw_peering_attachment.lib.utils import TGWPeer
+
+
+@pytest.mark.TDD
+class TestPlanPeeringChanges:
+    """TDD test class for the peering planner"""
+
+    def test__success__parse_tag(self):
+        """peers are indexed by tgw id and region"""
+        desired = parse_peering_tag("tgw-1_us-east-1/tgw-2_us-east-2")
+        assert list(desired) == [("tgw-1", "us-east-1"), ("tgw-2", "us-east-2")]
+        assert parse_peering_tag("Delete") == {}
+
+    def test__success__plan(self):
+        """create missing peers, delete undesired and duplicate attachments, accept initiating ones"""
+        current = [
+            TGWPeer("tgw-1", "us-east-1", "attach-1", state="available"),
+            TGWPeer("tgw-2", "us-east-2", "attach-2", state="initiatingRequest"),
+            TGWPeer("tgw-2", "us-east-2", "attach-3", state="available"),
+            # same tgw id, other region than the tag value
+            TGWPeer("tgw-3", "us-west-1", "attach-4", state="available"),
+        ]
+        plan = plan_peering_changes("tgw-1_us-east-1/tgw-2_us-east-2/tgw-3_us-west-2", current)
+
+        assert plan.create == [TGWPeer("tgw-3", "us-west-2")]
+        assert [peer.attachment_id for peer in plan.delete] == ["attach-3", "attach-4"]
+        assert [peer.attachment_id for peer in plan.accept] == ["attach-2"]
+        assert [peer.attachment_id for peer in plan.unchanged] == ["attach-1", "attach-2"]
+
+    def test__success__delete_all(self):
+        """the Delete tag value deletes every attachment"""
+        current = [TGWPeer("tgw-1", "us-east-1", "attach-1", state="available")]
+        plan = plan_peering_changes("DELETE", current)
+        assert plan.delete == current
+        assert plan.create == [] and plan.accept == []
@@ -5,8 +5,13 @@
 import asyncio
 from copy import deepcopy
 import os
+import threading
 import pytest
-from solution.tgw_peering_attachment.lib.tgw_peering_helper import validate_tag, tag_event_router
+from solution.tgw_peering_attachment.lib.tgw_peering_helper import (
+    validate_tag,
+    tag_event_router,
+    accept_ready_peering_requests,
+)
 from solution.tgw_peering_attachment.lib.utils import TGWPeer
 
 
@@ -96,21 +101,23 @@ class TestTagEventRouter:
         m1 = mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.delete_tgw_peering_attachment"
         )
-        mocker.patch(
+        m0 = mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
-            side_effect=[
-                [],
-                [self.peer1_with_attachment, self.peer2_with_attachment],
-            ],
+            return_value=[],
         )
         m2 = mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment",
+            side_effect=lambda tgw_id, peer: {
+                "TransitGatewayAttachmentId": "attach-1" if peer == self.peer1 else "attach-2",
+                "State": "initiatingRequest",
+            },
         )
         m3 = mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.accept_tgw_peering_attachment",
         )
         asyncio.run(tag_event_router(self.tag_value))
 
+        assert m0.call_count == 1  # a single describe
         assert m1.call_count == 0
 
         assert m2.call_count == 2  # create 2 peering attachments
@@ -161,13 +168,11 @@ class TestTagEventRouter:
 
         mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
-            side_effect=[
-                [self.peer1_with_attachment, self.peer2_with_attachment],
-                [new_peer_with_attachment],
-            ],
+            return_value=[self.peer1_with_attachment, self.peer2_with_attachment],
         )
         m1 = mocker.patch(
-            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment"
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment",
+            return_value={"TransitGatewayAttachmentId": new_peer_attachment, "State": "initiatingRequest"},
         )
         m2 = mocker.patch(
             "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.delete_tgw_peering_attachment",
@@ -187,6 +192,64 @@ class TestTagEventRouter:
         m2.assert_called_once_with(self.peer2_with_attachment)
         m3.assert_called_once_with(new_peer_with_attachment)
 
+    def test__success__create_concurrently(self, mocker):
+        """success, both peering attachments are created at the same time"""
+        # each create only returns once the other one has started
+        barrier = threading.Barrier(2, timeout=5)
+        mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
+            return_value=[],
+        )
+        m1 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment",
+            side_effect=lambda **_: barrier.wait(),
+        )
+
+        asyncio.run(tag_event_router(self.tag_value))
+        assert m1.call_count == 2
+        assert not barrier.broken
+
+    def test__success__deferred_acceptance(self, mocker):
+        """success, deferred mode creates the attachments and leaves acceptance to the sweep"""
+        mocker.patch.dict(os.environ, {"PEERING_ACCEPTANCE_MODE": "deferred"})
+        m1 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
+            return_value=[],
+        )
+        m2 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment"
+        )
+        m3 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.accept_tgw_peering_attachment"
+        )
+
+        asyncio.run(tag_event_router(self.tag_value))
+        assert m1.call_count == 1
+        assert m2.call_count == 2
+        assert m3.call_count == 0
+
+    def test__success__dry_run(self, mocker):
+        """success, dry run returns the plan without changing peering attachments"""
+        pending_peer = deepcopy(self.peer1_with_attachment)
+        pending_peer.state = "pendingAcceptance"
+        mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
+            return_value=[pending_peer],
+        )
+        m1 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.create_tgw_peering_attachment"
+        )
+        m2 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.accept_tgw_peering_attachment"
+        )
+
+        plan = asyncio.run(tag_event_router(self.tag_value, dry_run=True))
+        assert [peer["TransitGatewayId"] for peer in plan["Create"]] == [self.peer2.transit_gateway]
+        assert [peer["AttachmentId"] for peer in plan["Accept"]] == ["attach-1"]
+        assert plan["Delete"] == []
+        assert m1.call_count == 0
+        assert m2.call_count == 0
+
     def test__fail__get_tgw_peers(self, mocker):
         """fail with get_tgw_peers throwing client error"""
         mocker.patch(
@@ -197,3 +260,27 @@ class TestTagEventRouter:
         with pytest.raises(Exception) as err:
             asyncio.run(tag_event_router(""))
         assert str(err.value) == "error raised from get_tgw_peers"
+
+
+@pytest.mark.BDD
+class TestAcceptReadyPeeringRequests:
+    """BDD test class for the peering acceptance sweep"""
+
+    def test__success(self, mocker):
+        """success, all attachments pending acceptance are accepted without waiter, failures are skipped"""
+        peer1 = TGWPeer(transit_gateway="tgw-1", aws_region="us-east-2", attachment_id="attach-1")
+        peer2 = TGWPeer(transit_gateway="tgw-2", aws_region="us-west-2", attachment_id="attach-2")
+        m1 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.get_tgw_peers",
+            return_value=[peer1, peer2],
+        )
+        m2 = mocker.patch(
+            "solution.tgw_peering_attachment.lib.transit_gateway.TGWPeering.accept_tgw_peering_attachment",
+            side_effect=[None, Exception("accept failed")],
+        )
+
+        accepted = asyncio.run(accept_ready_peering_requests(os.environ.get("TGW_ID")))
+        assert accepted == [peer1]
+        assert m1.call_args.kwargs["states"][0].value == "pendingAcceptance"
+        m2.assert_any_call(peer1, wait=False)
+        m2.assert_any_call(peer2, wait=False)
@@ -8,7 +8,7 @@ import pytest
 from botocore.stub import Stubber
 from botocore.exceptions import ClientError, WaiterError
 from moto import mock_ec2
-from solution.tgw_peering_attachment.lib.transit_gateway import TGWPeering
+from solution.tgw_peering_attachment.lib.transit_gateway import TGWPeering, get_regional_ec2_client
 from solution.tgw_peering_attachment.lib.utils import TGWPeer, AttachmentState
 
 
@@ -208,3 +208,21 @@ class TestAcceptPeeringAttachment:
         with pytest.raises(WaiterError) as err:
             asyncio.run(tgw.accept_tgw_peering_attachment(peer))
         assert str(err.value.last_response) == "waiter_failed"
+
+
+@pytest.mark.TDD
+class TestRegionalClientCache:
+    """TDD test class for the regional EC2 client cache"""
+
+    def test__success__client_reused(self):
+        """TGWPeering instances share the hub client, peer regions get their own client"""
+        assert TGWPeering().ec2_client is TGWPeering().ec2_client
+        assert get_regional_ec2_client("us-west-2") is get_regional_ec2_client("us-west-2")
+        assert get_regional_ec2_client("us-west-2").meta.region_name == "us-west-2"
+        assert get_regional_ec2_client("us-west-2") is not TGWPeering().ec2_client
+
+    def test__success__hub_region_client_shared(self, monkeypatch):
+        """The Lambda region shares one client whether it is named or omitted"""
+        monkeypatch.setenv("AWS_REGION", "us-east-1")
+        assert TGWPeering().ec2_client is get_regional_ec2_client("us-east-1")
+        assert get_regional_ec2_client().meta.region_name == "us-east-1"
@@ -14,7 +14,14 @@ from mypy_boto3_ec2.type_defs import VpcTypeDef, SubnetTypeDef, TransitGatewayTy
     TransitGatewayVpcAttachmentTypeDef, TransitGatewayRouteTableTypeDef
 
 os.environ['USER_AGENT_STRING'] = 'something'
+from solution.tgw_vpc_attachment.lib.clients.client_factory import clear_client_cache
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import clear_ddb_cache
+from solution.tgw_vpc_attachment.lib.clients.organizations import clear_organizations_cache
+from solution.tgw_vpc_attachment.lib.clients.sts import clear_credentials_cache
+from solution.tgw_vpc_attachment.lib.handlers.tgw_route_table_snapshot import invalidate_route_table_snapshot
+
 TABLE_NAME = 'stno_table'
+LEASE_TABLE_NAME = 'stno_lease_table'
 
 
 def override_environment_variables():
@@ -27,6 +34,7 @@ def override_environment_variables():
     os.environ["AWS_REGION"] = "us-east-1"
     os.environ["LOG_LEVEL"] = "debug"
     os.environ['TABLE_NAME'] = TABLE_NAME
+    os.environ['LEASE_TABLE_NAME'] = LEASE_TABLE_NAME
     os.environ['TTL'] = '90'
     os.environ['ASSOCIATION_TAG'] = 'Associate-with'
     os.environ['ATTACHMENT_TAG'] = 'Attach-to'
@@ -44,6 +52,22 @@ def aws_credentials():
     override_environment_variables()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # warm-container caches must not leak state between tests
+    clear_credentials_cache()
+    clear_client_cache()
+    clear_organizations_cache()
+    invalidate_route_table_snapshot()
+    clear_ddb_cache()
+    yield
+    clear_credentials_cache()
+    clear_client_cache()
+    clear_organizations_cache()
+    invalidate_route_table_snapshot()
+    clear_ddb_cache()
+
+
 @pytest.fixture
 def dynamodb_table(aws_credentials):
     with mock_dynamodb():
@@ -54,14 +78,36 @@ def dynamodb_table(aws_credentials):
                        {"AttributeName": "Version", "KeyType": "RANGE"}],
             AttributeDefinitions=[
                 {"AttributeName": "SubnetId", "AttributeType": "S"},
-                {"AttributeName": "Version", "AttributeType": "S"}, ],
+                {"AttributeName": "Version", "AttributeType": "S"},
+                {"AttributeName": "VpcId", "AttributeType": "S"},
+                {"AttributeName": "LatestStatus", "AttributeType": "S"}, ],
+            GlobalSecondaryIndexes=[{
+                "IndexName": "VpcId-index",
+                "KeySchema": [{"AttributeName": "VpcId", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "INCLUDE", "NonKeyAttributes": ["VpcCidr"]},
+                "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}},
+                {"IndexName": "LatestStatus-index",
+                 "KeySchema": [{"AttributeName": "LatestStatus", "KeyType": "HASH"}],
+                 "Projection": {"ProjectionType": "ALL"},
+                 "ProvisionedThroughput": {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}}],
             ProvisionedThroughput={"ReadCapacityUnits": 5,
                                    "WriteCapacityUnits": 5}, )
         table.wait_until_exists()
         os.environ['TABLE_NAME'] = table.table_name
+        dynamodb_client_resource.create_table(
+            TableName=LEASE_TABLE_NAME,
+            KeySchema=[{"AttributeName": "VpcId", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "VpcId", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST", ).wait_until_exists()
+        os.environ['LEASE_TABLE_NAME'] = LEASE_TABLE_NAME
         yield table
 
 
+@pytest.fixture
+def lease_table(dynamodb_table):
+    yield boto3.resource("dynamodb").Table(LEASE_TABLE_NAME)
+
+
 @pytest.fixture
 def sts_client(aws_credentials):
     with mock_sts():
@@ -0,0 +1,81 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import gzip
+import json
+
+import boto3
+from moto import mock_s3
+
+from solution.tgw_vpc_attachment.lib.handlers.audit_archive_handler import AuditArchiver, is_ttl_removal
+from solution.tgw_vpc_attachment.main import archiver_lambda_handler
+
+BUCKET_NAME = 'audit-archive'
+TTL_IDENTITY = {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'}
+
+
+def stream_record(sequence_number, version, request_time='2022-08-12T18:04:42Z', user_identity=TTL_IDENTITY):
+    record = {
+        'eventName': 'REMOVE',
+        'dynamodb': {
+            'ApproximateCreationDateTime': 1700000000,
+            'SequenceNumber': sequence_number,
+            'OldImage': {
+                'SubnetId': {'S': 'subnet-1'},
+                'Version': {'S': version},
+                'RequestTimeStamp': {'S': request_time},
+                'TimeToLive': {'N': '1700000000'},
+                'PropagationRouteTables': {'L': [{'S': 'tgw-rtb-1'}]}
+            }
+        }
+    }
+    if user_identity:
+        record['userIdentity'] = user_identity
+    return record
+
+
+def test_is_ttl_removal():
+    assert is_ttl_removal(stream_record('1', '1'))
+    assert not is_ttl_removal(stream_record('1', '1', user_identity=None))
+
+
+@mock_s3
+def test_archive_writes_gzipped_json_lines_per_day(aws_credentials):
+    # ARRANGE
+    s3_client = boto3.client('s3', region_name='us-east-1')
+    s3_client.create_bucket(Bucket=BUCKET_NAME)
+    records = [
+        stream_record('100', '1'),
+        stream_record('101', '2'),
+        stream_record('102', 'latest'),
+        stream_record('103', '3', request_time='2022-08-13T01:00:00Z'),
+        stream_record('104', '4', user_identity={'type': 'AWS', 'principalId': 'user'})
+    ]
+
+    # ACT
+    response = AuditArchiver(BUCKET_NAME).archive(records)
+
+    # ASSERT
+    assert response['Archived'] == 3
+    assert response['Skipped'] == 2
+    assert response['Objects'] == [
+        'audit-history/year=2022/month=08/day=12/100.jsonl.gz',
+        'audit-history/year=2022/month=08/day=13/103.jsonl.gz'
+    ]
+    body = s3_client.get_object(Bucket=BUCKET_NAME, Key=response['Objects'][0])['Body'].read()
+    items = [json.loads(line) for line in gzip.decompress(body).decode('utf-8').splitlines()]
+    assert [item['Version'] for item in items] == ['1', '2']
+    assert items[0]['TimeToLive'] == 1700000000
+    assert items[0]['PropagationRouteTables'] == ['tgw-rtb-1']
+
+
+@mock_s3
+def test_archiver_lambda_handler(aws_credentials, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('ARCHIVE_BUCKET_NAME', BUCKET_NAME)
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET_NAME)
+
+    # ACT
+    response = archiver_lambda_handler({'Records': [stream_record('100', '1', request_time=None)]}, None)
+
+    # ASSERT
+    assert response['Objects'] == ['audit-history/year=2023/month=11/day=14/100.jsonl.gz']
@@ -2,10 +2,13 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import pytest
+from boto3.dynamodb.conditions import Key
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from moto import mock_sts, mock_dynamodb
 
-from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from tests.tgw_vpc_attachment.conftest import override_environment_variables, TABLE_NAME
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import backfill_latest_status, get_ddb
+from solution.tgw_vpc_attachment.lib.handlers.dynamodb_handler import DynamoDb
 from solution.tgw_vpc_attachment.main import lambda_handler
 
 
@@ -43,3 +46,113 @@ def test_dynamodb_throws_table_not_found():
                 'time': '2022-08-12T18:04:42Z'
             }
         }, LambdaContext())
+
+
+def test_put_item_writes_versioned_and_latest_items(dynamodb_table):
+    # ACT
+    DynamoDb({
+        'SubnetId': 'subnet-1',
+        'VpcId': 'vpc-1',
+        'Action': 'AddSubnet',
+        'Status': 'auto-approved',
+        'time': '2022-08-12T18:04:42Z',
+        'detail': {'version': '0'}
+    }).put_item()
+
+    # ASSERT
+    versions = {item['Version']: item for item in dynamodb_table.scan()['Items']}
+    assert set(versions) == {'0', 'latest'}
+    assert versions['latest']['Status'] == versions['0']['Status'] == 'auto-approved'
+
+
+def test_put_item_writes_the_record_and_its_latest_item_in_one_transaction(dynamodb_table, mocker):
+    # ARRANGE
+    transact_put_items = mocker.spy(get_ddb(TABLE_NAME), 'transact_put_items')
+
+    # ACT
+    for version, status in [('1', 'requested'), ('2', 'approved')]:
+        DynamoDb({
+            'SubnetId': 'subnet-1',
+            'Status': status,
+            'time': '2022-08-12T18:04:42Z',
+            'detail': {'version': version}
+        }).put_item()
+
+    # ASSERT
+    assert transact_put_items.call_count == 2
+    for (items,), version, status in zip([call.args for call in transact_put_items.call_args_list],
+                                         ['1', '2'], ['requested', 'approved']):
+        assert [(item['Version'], item['Status']) for item in items] == [(version, status), ('latest', status)]
+    latest = dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': 'latest'})['Item']
+    assert latest['Status'] == 'approved'
+
+
+def test_latest_items_are_queried_from_latest_status_index(dynamodb_table):
+    # ARRANGE
+    for subnet_id, version, status in [('subnet-1', '1', 'requested'), ('subnet-1', '2', 'auto-approved'),
+                                       ('subnet-2', '1', 'auto-approved'), ('subnet-3', '1', 'failed')]:
+        DynamoDb({
+            'SubnetId': subnet_id,
+            'VpcId': None,
+            'Status': status,
+            'time': '2022-08-12T18:04:42Z',
+            'detail': {'version': version}
+        }).put_item()
+
+    # ACT
+    completed = dynamodb_table.query(
+        IndexName='LatestStatus-index',
+        KeyConditionExpression=Key('LatestStatus').eq('completed')
+    )
+    pending = dynamodb_table.query(
+        IndexName='LatestStatus-index',
+        KeyConditionExpression=Key('LatestStatus').eq('pending')
+    )
+
+    # ASSERT
+    assert sorted(item['SubnetId'] for item in completed['Items']) == ['subnet-1', 'subnet-2']
+    assert {item['Version'] for item in completed['Items']} == {'latest'}
+    assert {item['VpcId'] for item in completed['Items']} == {'None'}
+    assert [item['SubnetId'] for item in pending['Items']] == ['subnet-3']
+
+
+def test_backfill_latest_status_of_items_written_before_the_index(dynamodb_table):
+    # ARRANGE
+    dynamodb_table.put_item(Item={'SubnetId': 'subnet-1', 'Version': 'latest', 'Status': 'approved'})
+    dynamodb_table.put_item(Item={'SubnetId': 'subnet-1', 'Version': '1', 'Status': 'approved'})
+    dynamodb_table.put_item(Item={'SubnetId': 'subnet-2', 'Version': 'latest', 'Status': 'failed'})
+    dynamodb_table.put_item(Item={'SubnetId': 'subnet-3', 'Version': 'latest', 'Status': 'requested',
+                                  'LatestStatus': 'pending'})
+
+    # ACT
+    updated = backfill_latest_status(get_ddb(TABLE_NAME))
+
+    # ASSERT
+    assert updated == 2
+    assert dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': 'latest'})['Item']['LatestStatus'] \
+        == 'completed'
+    assert dynamodb_table.get_item(Key={'SubnetId': 'subnet-2', 'Version': 'latest'})['Item']['LatestStatus'] \
+        == 'pending'
+    # the history items stay out of the sparse index
+    assert 'LatestStatus' not in dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': '1'})['Item']
+    assert backfill_latest_status(get_ddb(TABLE_NAME)) == 0
+
+
+def test_history_items_are_compact(dynamodb_table):
+    # ACT
+    DynamoDb({
+        'SubnetId': 'subnet-1',
+        'Status': 'auto-approved',
+        'Propagate-to': ['tgw-rtb-1', 'tgw-rtb-2'],
+        'time': '2022-08-12T18:04:42Z',
+        'detail': {'version': '1'}
+    }).put_item()
+
+    # ASSERT
+    history = dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': '1'})['Item']
+    latest = dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': 'latest'})['Item']
+    assert history['PropagationRouteTables'] == ['tgw-rtb-1', 'tgw-rtb-2']
+    assert 'PropagationRouteTablesString' not in history
+    assert 'VpcId' not in history and 'Comment' not in history
+    assert latest['PropagationRouteTablesString'] == 'tgw-rtb-1,tgw-rtb-2'
+    assert latest['VpcId'] == 'None'
@@ -27,3 +27,15 @@ def test_create_tags_batch_success(mocker):
     ec2.create_tags_batch(resource_id, tags_list)
     spy_logger.assert_called_with(log_message)
 
+
+
+def test_create_tags_batch_multiple_resources():
+    ec2 = EC2()
+    client_stubber = Stubber(ec2.ec2_client)
+    tags_list = [{"Key": "STNOStatus-Subnet", "Value": "added"}]
+    expected_params = {"Resources": ["subnet-1", "subnet-2"], "Tags": tags_list}
+
+    client_stubber.add_response("create_tags", {}, expected_params)
+    client_stubber.activate()
+    ec2.create_tags_batch(["subnet-1", "subnet-2"], tags_list)
+    client_stubber.assert_no_pending_responses()
@@ -1,6 +1,7 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import pytest
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from tests.tgw_vpc_attachment.conftest import override_environment_variables
@@ -32,3 +33,22 @@ def test_function_not_found():
 
     # ASSERT
     assert response["Message"] == "Function name does not match any function in the handler file."
+
+
+def test_tag_flush_error_does_not_replace_the_step_error(mocker):
+    # ARRANGE
+    override_environment_variables()
+
+    # import after setup, because import causes usages of env variables
+    from solution.tgw_vpc_attachment import main
+    tgw = mocker.Mock()
+    tgw.tgw_attachment_crud_operations.side_effect = ValueError("attachment failed")
+    tgw.tag_writer.flush.side_effect = RuntimeError("tagging failed")
+    mocker.patch.object(main, "TransitGatewayVPCAttachments", return_value=tgw)
+
+    # ACT
+    with pytest.raises(ValueError, match="attachment failed"):
+        main.transit_gateway({}, "tgw_attachment_crud_operations")
+
+    # ASSERT
+    tgw.tag_writer.flush.assert_called_once()
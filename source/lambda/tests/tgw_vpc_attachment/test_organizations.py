@@ -110,3 +110,32 @@ def test_get_ou_path_exception(mocker):
     client_stubber.activate()
     return_value = organization.get_ou_path(account_id)
     assert return_value is None
+
+
+def test_get_ou_path_is_cached():
+    organization = Organizations()
+    account_id = "12345"
+    client_stubber = Stubber(organization.org_client)
+    client_stubber.add_response(
+        "list_parents", {"Parents": [{"Id": "ou-1", "Type": "ORGANIZATIONAL_UNIT"}]}, {"ChildId": account_id})
+    client_stubber.add_response(
+        "describe_organizational_unit", {"OrganizationalUnit": {"Name": "Workloads"}}, {"OrganizationalUnitId": "ou-1"})
+    client_stubber.add_response("list_parents", {"Parents": [{"Id": "r-1", "Type": "Root"}]}, {"ChildId": "ou-1"})
+    client_stubber.activate()
+
+    assert organization.get_ou_path(account_id) == "Root/Workloads/"
+    # resolved from the cache, the stubber has no responses left
+    assert Organizations().get_ou_path(account_id) == "Root/Workloads/"
+    client_stubber.assert_no_pending_responses()
+
+
+def test_get_account_name_exception_is_not_cached():
+    organization = Organizations()
+    account_id = "12345"
+    client_stubber = Stubber(organization.org_client)
+    client_stubber.add_client_error("describe_account", "TooManyRequestsException")
+    client_stubber.add_response("describe_account", {"Account": {"Name": "Test"}}, {"AccountId": account_id})
+    client_stubber.activate()
+
+    assert organization.get_account_name(account_id) is None
+    assert organization.get_account_name(account_id) == "Test"
@@ -0,0 +1,144 @@
+# !/bin/python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""VPC lease module tests"""
+import pytest
+from freezegun import freeze_time
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceBusyException, VpcLeaseLostException
+from solution.tgw_vpc_attachment.lib.handlers.vpc_lease import EXECUTION_LEASE, VpcLease, \
+    acquire_execution_lease, release_execution_lease, renew_execution_lease, vpc_lease
+from solution.tgw_vpc_attachment.main import lambda_handler
+
+VPC_ID = 'vpc-1234567890'
+
+
+def test_lease_is_exclusive(lease_table):
+    # ARRANGE
+    lease = VpcLease(VPC_ID, owner='execution-1')
+    other = VpcLease(VPC_ID, owner='execution-2')
+
+    # ACT
+    token = lease.acquire()
+
+    # ASSERT
+    with pytest.raises(ResourceBusyException):
+        other.acquire()
+    assert lease.release()
+    assert other.acquire() == token + 1
+
+
+def test_lease_is_reentrant_for_the_same_owner(lease_table):
+    lease = VpcLease(VPC_ID, owner='execution-1')
+
+    first_token = lease.acquire()
+    second_token = VpcLease(VPC_ID, owner='execution-1').acquire()
+
+    assert second_token == first_token + 1
+
+
+def test_expired_lease_is_taken_over_and_cannot_be_released_by_the_old_owner(lease_table):
+    # ARRANGE
+    lease = VpcLease(VPC_ID, owner='execution-1', duration_in_seconds=30)
+    other = VpcLease(VPC_ID, owner='execution-2')
+    with freeze_time('2025-01-01 00:00:00'):
+        lease.acquire()
+
+    # ACT
+    with freeze_time('2025-01-01 00:01:00'):
+        other.acquire()
+        released = lease.release()
+
+    # ASSERT
+    assert not released
+    item = lease_table.get_item(Key=other.key)['Item']
+    assert item['LeaseOwner'] == 'execution-2'
+
+
+def test_vpc_lease_decorator_holds_lease_while_running(lease_table, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('VPC_LEASE_ENABLED', 'Yes')
+
+    class Handler:
+        event = {'VpcId': VPC_ID}
+
+        @vpc_lease
+        def operation(self):
+            with pytest.raises(ResourceBusyException):
+                VpcLease(VPC_ID).acquire()
+            return 'done'
+
+    # ACT
+    response = Handler().operation()
+
+    # ASSERT
+    assert response == 'done'
+    assert 'LeaseOwner' not in lease_table.get_item(Key=VpcLease(VPC_ID).key)['Item']
+
+
+def test_execution_lease_is_held_until_released(lease_table, dynamodb_table, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('VPC_LEASE_ENABLED', 'Yes')
+
+    # ACT
+    event = lambda_handler({'params': {'ClassName': 'VpcLease', 'FunctionName': 'acquire'},
+                            'event': {'VpcId': VPC_ID}}, LambdaContext())
+
+    # ASSERT
+    assert event[EXECUTION_LEASE]['FencingToken'] == 1
+    with pytest.raises(ResourceBusyException):
+        VpcLease(VPC_ID).acquire()
+    renew_execution_lease(event)
+    event = lambda_handler({'params': {'ClassName': 'VpcLease', 'FunctionName': 'release'},
+                            'event': event}, LambdaContext())
+    assert EXECUTION_LEASE not in event
+    assert VpcLease(VPC_ID).acquire() == 2
+    # the lease items are kept out of the audit table
+    assert dynamodb_table.scan()['Items'] == []
+
+
+def test_execution_lease_is_not_acquired_when_disabled(lease_table, monkeypatch):
+    monkeypatch.setenv('VPC_LEASE_ENABLED', 'No')
+
+    assert acquire_execution_lease({'VpcId': VPC_ID}) == {'VpcId': VPC_ID}
+    assert 'Item' not in lease_table.get_item(Key={'VpcId': VPC_ID})
+
+
+def test_expired_execution_lease_cannot_be_renewed_or_released(lease_table, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('VPC_LEASE_ENABLED', 'Yes')
+    monkeypatch.setenv('VPC_LEASE_DURATION', '30')
+    with freeze_time('2025-01-01 00:00:00'):
+        event = acquire_execution_lease({'VpcId': VPC_ID})
+
+    # ACT
+    with freeze_time('2025-01-01 00:01:00'):
+        VpcLease(VPC_ID, owner='execution-2').acquire()
+
+        # ASSERT
+        with pytest.raises(VpcLeaseLostException):
+            renew_execution_lease(event)
+        release_execution_lease(event)
+    assert lease_table.get_item(Key={'VpcId': VPC_ID})['Item']['LeaseOwner'] == 'execution-2'
+
+
+def test_vpc_lease_decorator_checks_the_execution_lease(lease_table, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('VPC_LEASE_ENABLED', 'Yes')
+    event = acquire_execution_lease({'VpcId': VPC_ID})
+    lease_table.update_item(Key={'VpcId': VPC_ID}, UpdateExpression='ADD FencingToken :one',
+                            ExpressionAttributeValues={':one': 1})
+
+    class Handler:
+        def __init__(self):
+            self.event = event
+
+        @vpc_lease
+        def operation(self):
+            return 'done'
+
+    # ACT / ASSERT
+    with pytest.raises(VpcLeaseLostException):
+        Handler().operation()
@@ -0,0 +1,65 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+from solution.tgw_vpc_attachment.lib.handlers.approval_rule_engine import (
+    compile_approval_rules,
+    evaluate_approval_rules,
+    get_approval_rules,
+    ou_path_prefixes
+)
+
+RULE_TAGS = {
+    'approvalrule-default-association': 'reject',
+    'approvalrule-default-propagation': 'approvalrequired',
+    'approvalrule-01-inous': 'root/core, workloads/prod',
+    'approvalrule-01-association': 'accept',
+    'approvalrule-02-notinous': 'root/workloads',
+    'approvalrule-02-propagation': 'reject',
+    # group 04 is never evaluated, there is no group 03
+    'approvalrule-04-inous': 'root/workloads',
+    'approvalrule-04-association': 'accept',
+}
+
+
+def test_compile_approval_rules():
+    rule_set = compile_approval_rules(RULE_TAGS)
+
+    assert rule_set.default_association == 'reject'
+    assert [group.number for group in rule_set.groups] == [1, 2]
+    assert rule_set.groups[0].in_ous == frozenset(['root/core/', 'root/workloads/prod/'])
+    assert rule_set.groups[1].not_in_ous == frozenset(['root/workloads/'])
+
+
+def test_ou_path_prefixes():
+    assert ou_path_prefixes('Root/Workloads/Dev/') == frozenset(['root/', 'root/workloads/', 'root/workloads/dev/'])
+
+
+def test_evaluate_in_ous_matches_nested_ou():
+    rule_set = compile_approval_rules(RULE_TAGS)
+
+    assert evaluate_approval_rules(rule_set, 'Association', 'Root/Workloads/Prod/Team/') == 'accept'
+    # group 01 does not set a propagation action
+    assert evaluate_approval_rules(rule_set, 'Propagation', 'Root/Core/') == 'approvalrequired'
+
+
+def test_evaluate_not_in_ous():
+    rule_set = compile_approval_rules(RULE_TAGS)
+
+    assert evaluate_approval_rules(rule_set, 'Propagation', 'Root/Sandbox/') == 'reject'
+    # inside root/workloads, none of the groups match
+    assert evaluate_approval_rules(rule_set, 'Association', 'Root/Workloads/Dev/') == 'reject'
+    assert evaluate_approval_rules(rule_set, 'Propagation', 'Root/Workloads/Dev/') == 'approvalrequired'
+
+
+def test_evaluate_without_ou_path_returns_default():
+    rule_set = compile_approval_rules(RULE_TAGS)
+
+    assert evaluate_approval_rules(rule_set, 'Association', None) == 'reject'
+
+
+def test_get_approval_rules_recompiles_when_tags_change():
+    rule_set = get_approval_rules('tgw-rtb-1', RULE_TAGS)
+
+    assert get_approval_rules('tgw-rtb-1', dict(RULE_TAGS)) is rule_set
+    changed = get_approval_rules('tgw-rtb-1', dict(RULE_TAGS, **{'approvalrule-default-association': 'accept'}))
+    assert changed is not rule_set
+    assert changed.default_association == 'accept'
@@ -0,0 +1,144 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+import boto3
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from moto import mock_organizations, mock_sts
+
+from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from solution.tgw_vpc_attachment.lib.handlers.drift_reconciler_handler import (
+    MISSING_ATTACHMENT,
+    PROPAGATION_DRIFT,
+    SUBNET_DRIFT,
+    UNKNOWN_ROUTE_TABLE,
+    split_propagation_tag
+)
+from solution.tgw_vpc_attachment.main import reconciler_lambda_handler
+
+ACCOUNT_ID = '123456789012'
+
+
+def create_route_table(ec2_client, tgw_id, name):
+    return ec2_client.create_transit_gateway_route_table(
+        TransitGatewayId=tgw_id,
+        TagSpecifications=[{'ResourceType': 'transit-gateway-route-table', 'Tags': [{'Key': 'Name', 'Value': name}]}]
+    )['TransitGatewayRouteTable']['TransitGatewayRouteTableId']
+
+
+def create_tagged_vpc(ec2_client, cidr, association=None, propagation=None):
+    vpc_id = ec2_client.create_vpc(CidrBlock=cidr)['Vpc']['VpcId']
+    tags = []
+    if association:
+        tags.append({'Key': os.environ['ASSOCIATION_TAG'], 'Value': association})
+    if propagation:
+        tags.append({'Key': os.environ['PROPAGATION_TAG'], 'Value': propagation})
+    if tags:
+        ec2_client.create_tags(Resources=[vpc_id], Tags=tags)
+    subnet_id = ec2_client.create_subnet(CidrBlock=cidr.replace('0.0/16', '0.0/24'), VpcId=vpc_id,
+                                         AvailabilityZone='us-east-1a')['Subnet']['SubnetId']
+    ec2_client.create_tags(Resources=[subnet_id], Tags=[{'Key': os.environ['ATTACHMENT_TAG'], 'Value': 'yes'}])
+    return vpc_id, subnet_id
+
+
+def test_split_propagation_tag():
+    assert split_propagation_tag('Flat/ On-Prem:dev,') == ['flat', 'on-prem', 'dev']
+
+
+@mock_sts
+@mock_organizations
+def test_reconciler_reports_missing_attachment_and_unknown_route_table(ec2_client, dynamodb_table):
+    # ARRANGE
+    override_environment_variables()
+    os.environ['TGW_ID'] = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    create_route_table(ec2_client, os.environ['TGW_ID'], 'flat')
+    vpc_id, _ = create_tagged_vpc(ec2_client, '10.1.0.0/16', association='flat', propagation='flat,unknown')  # NOSONAR
+
+    # ACT
+    response = reconciler_lambda_handler({'Accounts': [ACCOUNT_ID]}, LambdaContext())
+
+    # ASSERT
+    assert response['Errors'] == []
+    assert response['Actions'] == []
+    drift = next(entry for entry in response['Drift'] if entry['VpcId'] == vpc_id)
+    assert MISSING_ATTACHMENT in drift['Drift']
+    assert UNKNOWN_ROUTE_TABLE in drift['Drift']
+    assert 'unknown' in drift['Comment']
+
+
+@mock_sts
+@mock_organizations
+def test_reconciler_applies_missing_propagation(ec2_client, dynamodb_table):
+    # ARRANGE
+    override_environment_variables()
+    tgw_id = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    os.environ['TGW_ID'] = tgw_id
+    flat_id = create_route_table(ec2_client, tgw_id, 'flat')
+    on_prem_id = create_route_table(ec2_client, tgw_id, 'on-prem')
+    vpc_id, subnet_id = create_tagged_vpc(ec2_client, '10.2.0.0/16', association='flat',  # NOSONAR
+                                          propagation='flat/on-prem')
+    attachment_id = ec2_client.create_transit_gateway_vpc_attachment(
+        TransitGatewayId=tgw_id, VpcId=vpc_id, SubnetIds=[subnet_id]
+    )['TransitGatewayVpcAttachment']['TransitGatewayAttachmentId']
+    ec2_client.associate_transit_gateway_route_table(
+        TransitGatewayRouteTableId=flat_id, TransitGatewayAttachmentId=attachment_id)
+    ec2_client.enable_transit_gateway_route_table_propagation(
+        TransitGatewayRouteTableId=flat_id, TransitGatewayAttachmentId=attachment_id)
+
+    # ACT
+    response = reconciler_lambda_handler({'apply': True}, LambdaContext())
+
+    # ASSERT
+    assert response['Errors'] == []
+    drift = next(entry for entry in response['Drift'] if entry['VpcId'] == vpc_id)
+    assert drift['Drift'] == [PROPAGATION_DRIFT]
+    assert drift['EnablePropagationRouteTableIds'] == [on_prem_id]
+    assert drift['DisablePropagationRouteTableIds'] == []
+    assert response['Actions'] == [
+        {'VpcId': vpc_id, 'Action': 'EnableTgwRtPropagation', 'RouteTableId': on_prem_id}
+    ]
+
+
+@mock_sts
+@mock_organizations
+def test_reconciler_scans_accounts_of_the_audit_table(ec2_client, dynamodb_table):
+    # ARRANGE
+    override_environment_variables()
+    os.environ['TGW_ID'] = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    vpc_id, subnet_id = create_tagged_vpc(ec2_client, '10.3.0.0/16')  # NOSONAR
+    # the attachment of the VPC was deleted, only its audit item is left
+    boto3.resource('dynamodb').Table(os.environ['TABLE_NAME']).put_item(
+        Item={'SubnetId': subnet_id, 'Version': 'latest', 'VpcId': vpc_id, 'AWSSpokeAccountId': ACCOUNT_ID,
+              'Status': 'auto-approved', 'LatestStatus': 'completed'})
+
+    # ACT
+    response = reconciler_lambda_handler({}, LambdaContext())
+
+    # ASSERT
+    assert response['Errors'] == []
+    drift = next(entry for entry in response['Drift'] if entry['VpcId'] == vpc_id)
+    assert drift['Drift'] == [MISSING_ATTACHMENT]
+    assert drift['DesiredSubnetIds'] == [subnet_id]
+
+
+@mock_sts
+@mock_organizations
+def test_reconciler_keeps_the_attached_subnet_of_an_availability_zone(ec2_client, dynamodb_table):
+    # ARRANGE
+    override_environment_variables()
+    tgw_id = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    os.environ['TGW_ID'] = tgw_id
+    vpc_id, first_subnet_id = create_tagged_vpc(ec2_client, '10.4.0.0/16')  # NOSONAR
+    second_subnet_id = ec2_client.create_subnet(CidrBlock='10.4.1.0/24', VpcId=vpc_id,  # NOSONAR
+                                                AvailabilityZone='us-east-1a')['Subnet']['SubnetId']
+    ec2_client.create_tags(Resources=[second_subnet_id], Tags=[{'Key': os.environ['ATTACHMENT_TAG'], 'Value': 'yes'}])
+    attached_subnet_id = max(first_subnet_id, second_subnet_id)
+    ec2_client.create_transit_gateway_vpc_attachment(TransitGatewayId=tgw_id, VpcId=vpc_id,
+                                                     SubnetIds=[attached_subnet_id])
+
+    # ACT
+    response = reconciler_lambda_handler({}, LambdaContext())
+
+    # ASSERT
+    assert response['Errors'] == []
+    assert all(SUBNET_DRIFT not in entry['Drift'] for entry in response['Drift'] if entry['VpcId'] == vpc_id)
@@ -0,0 +1,164 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+import boto3
+import pytest
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from moto import mock_sts
+
+from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
+from solution.tgw_vpc_attachment.lib.handlers.tgw_route_table_snapshot import RouteTableSnapshot, \
+    get_route_table_snapshot
+from solution.tgw_vpc_attachment.main import lambda_handler
+
+
+def route_table(route_table_id, name=None):
+    tags = [{'Key': 'Name', 'Value': name}] if name else []
+    return {'TransitGatewayRouteTableId': route_table_id, 'Tags': tags}
+
+
+def test_snapshot_indexes_route_tables_by_normalized_name():
+    snapshot = RouteTableSnapshot('tgw-1', [
+        route_table('tgw-rtb-1', ' Flat '),
+        route_table('tgw-rtb-2', 'shared'),
+        route_table('tgw-rtb-3'),
+    ])
+
+    assert snapshot.get_ids('flat') == ['tgw-rtb-1']
+    assert snapshot.get_ids('shared') == ['tgw-rtb-2']
+    assert snapshot.get_ids('missing') == []
+    assert snapshot.route_table_ids == ['tgw-rtb-1', 'tgw-rtb-2', 'tgw-rtb-3']
+    snapshot.throw_exception_if_duplicate_names()
+
+
+def test_snapshot_duplicate_names():
+    snapshot = RouteTableSnapshot('tgw-1', [
+        route_table('tgw-rtb-1', 'flat'),
+        route_table('tgw-rtb-2', 'flat'),
+    ])
+
+    with pytest.raises(ValueError) as error_info:
+        snapshot.throw_exception_if_duplicate_names()
+
+    assert 'Multiple route tables are tagged with the name flat' in str(error_info.value)
+
+
+def test_get_route_table_snapshot_is_cached_per_tgw(vpc_setup_with_explicit_route_table, mocker):
+    ec2 = EC2()
+    describe = mocker.spy(ec2, 'describe_transit_gateway_route_tables')
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+
+    first = get_route_table_snapshot(ec2, tgw_id)
+    second = get_route_table_snapshot(ec2, tgw_id)
+    refreshed = get_route_table_snapshot(ec2, tgw_id, refresh=True)
+
+    assert first is second
+    assert refreshed is not first
+    assert describe.call_count == 2
+
+
+def test_get_route_table_snapshot_ttl_disabled(vpc_setup_with_explicit_route_table, mocker, monkeypatch):
+    monkeypatch.setenv('ROUTE_TABLE_CACHE_TTL', '0')
+    ec2 = EC2()
+    describe = mocker.spy(ec2, 'describe_transit_gateway_route_tables')
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+
+    get_route_table_snapshot(ec2, tgw_id)
+    get_route_table_snapshot(ec2, tgw_id)
+
+    assert describe.call_count == 2
+
+
+def describe_route_tables_event(association, propagations):
+    return {
+        'params': {
+            'ClassName': 'TransitGateway',
+            'FunctionName': 'describe_transit_gateway_route_tables'
+        },
+        'event': {
+            os.getenv('ASSOCIATION_TAG'): association,
+            os.getenv('PROPAGATION_TAG'): propagations,
+        }
+    }
+
+
+@mock_sts
+def test_describe_route_tables_reads_approval_tags_fresh(vpc_setup_with_explicit_route_table):
+    # ARRANGE
+    override_environment_variables()
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+    route_table_id = vpc_setup_with_explicit_route_table['transit_gateway_route_table']
+    get_route_table_snapshot(EC2(), tgw_id)
+    boto3.client("ec2", region_name="us-east-1").create_tags(
+        Resources=[route_table_id], Tags=[{'Key': os.environ['APPROVAL_KEY'], 'Value': 'Yes'}])
+
+    # ACT
+    response = lambda_handler(describe_route_tables_event('flat', ['flat']), LambdaContext())
+
+    # ASSERT
+    assert response['AssociationRouteTableId'] == route_table_id
+    assert response['ApprovalRequired'] == 'yes'
+
+
+@mock_sts
+def test_describe_route_tables_maps_names_again_after_rename(vpc_setup_with_explicit_route_table):
+    # ARRANGE
+    override_environment_variables()
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+    old_route_table_id = vpc_setup_with_explicit_route_table['transit_gateway_route_table']
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    new_route_table_id = ec2_client.create_transit_gateway_route_table(
+        TransitGatewayId=tgw_id,
+        TagSpecifications=[{
+            'ResourceType': 'transit-gateway-route-table',
+            'Tags': [{'Key': 'Name', 'Value': 'shared'}, {'Key': os.environ['APPROVAL_KEY'], 'Value': 'No'}]
+        }]
+    )['TransitGatewayRouteTable']['TransitGatewayRouteTableId']
+    get_route_table_snapshot(EC2(), tgw_id)
+    # swap the names of the two route tables after the snapshot was taken
+    ec2_client.create_tags(Resources=[old_route_table_id], Tags=[{'Key': 'Name', 'Value': 'shared'}])
+    ec2_client.create_tags(Resources=[new_route_table_id], Tags=[{'Key': 'Name', 'Value': 'flat'}])
+
+    # ACT
+    response = lambda_handler(describe_route_tables_event('flat', ['shared']), LambdaContext())
+
+    # ASSERT
+    assert response['AssociationRouteTableId'] == new_route_table_id
+    assert response['PropagationRouteTableIds'] == [old_route_table_id]
+
+
+@mock_sts
+def test_describe_route_tables_refreshes_stale_snapshot(vpc_setup_with_explicit_route_table):
+    # ARRANGE
+    override_environment_variables()
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+    os.environ['TGW_ID'] = tgw_id
+    get_route_table_snapshot(EC2(), tgw_id)
+    new_route_table_id = boto3.client("ec2", region_name="us-east-1").create_transit_gateway_route_table(
+        TransitGatewayId=tgw_id,
+        TagSpecifications=[{
+            'ResourceType': 'transit-gateway-route-table',
+            'Tags': [{'Key': 'Name', 'Value': 'new-table'}, {'Key': os.environ['APPROVAL_KEY'], 'Value': 'No'}]
+        }]
+    )['TransitGatewayRouteTable']['TransitGatewayRouteTableId']
+
+    # ACT
+    response = lambda_handler({
+        'params': {
+            'ClassName': 'TransitGateway',
+            'FunctionName': 'describe_transit_gateway_route_tables'
+        },
+        'event': {
+            'TransitGatewayAttachmentId': vpc_setup_with_explicit_route_table['tgw_vpc_attachment'],
+            os.getenv('ASSOCIATION_TAG'): 'new-table',
+            os.getenv('PROPAGATION_TAG'): ['flat', 'new-table'],
+        }
+    }, LambdaContext())
+
+    # ASSERT
+    assert response['AssociationRouteTableId'] == new_route_table_id
+    assert sorted(response['PropagationRouteTableIds']) == sorted(
+        [vpc_setup_with_explicit_route_table['transit_gateway_route_table'], new_route_table_id])
+    assert new_route_table_id in response['RouteTableList']
@@ -0,0 +1,281 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import json
+import os
+
+import boto3
+import pytest
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from moto import mock_stepfunctions, mock_sts
+
+from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceBusyException
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_batch_handler import coalesce_tag_events, \
+    get_handoff_action, requires_state_machine
+from solution.tgw_vpc_attachment.main import batch_lambda_handler, lambda_handler
+
+ACCOUNT_ID = '123456789012'
+
+
+@pytest.fixture(autouse=True)
+def attachment_propagations(mocker):
+    # not implemented in moto, the approval rules are evaluated before the batched attachment change
+    return mocker.patch('solution.tgw_vpc_attachment.lib.clients.ec2.EC2.get_transit_gateway_attachment_propagations',
+                        return_value=[])
+
+
+def tag_event(resource_id, tag_key=None):
+    resource_type = resource_id.split('-')[0]
+    return {
+        'id': f'event-{resource_id}',
+        'account': ACCOUNT_ID,
+        'source': 'aws.tag',
+        'time': '2026-10-17T10:00:00Z',
+        'resources': [f'arn:aws:ec2:us-east-1:{ACCOUNT_ID}:{resource_type}/{resource_id}'],
+        'detail': {'changed-tag-keys': [tag_key or os.environ['ATTACHMENT_TAG']], 'version': 3}
+    }
+
+
+def create_state_machine():
+    sfn_client = boto3.client('stepfunctions', region_name='us-east-1')
+    state_machine_arn = sfn_client.create_state_machine(
+        name='STNO-StateMachine',
+        definition=json.dumps({'StartAt': 'Done', 'States': {'Done': {'Type': 'Succeed'}}}),
+        roleArn=f'arn:aws:iam::{ACCOUNT_ID}:role/state-machine-role'
+    )['stateMachineArn']
+    os.environ['STATE_MACHINE_ARN'] = state_machine_arn
+    return sfn_client
+
+
+def create_subnet(ec2_client, vpc_id, cidr, az, tagged=True):
+    subnet_id = ec2_client.create_subnet(CidrBlock=cidr, VpcId=vpc_id, AvailabilityZone=az)['Subnet']['SubnetId']
+    if tagged:
+        ec2_client.create_tags(Resources=[subnet_id], Tags=[{'Key': os.environ['ATTACHMENT_TAG'], 'Value': 'yes'}])
+    return subnet_id
+
+
+def create_tgw_route_table(ec2_client, tgw_id, name, approval_required='No'):
+    return ec2_client.create_transit_gateway_route_table(
+        TransitGatewayId=tgw_id,
+        TagSpecifications=[{'ResourceType': 'transit-gateway-route-table', 'Tags': [
+            {'Key': 'Name', 'Value': name}, {'Key': os.environ['APPROVAL_KEY'], 'Value': approval_required}]}]
+    )['TransitGatewayRouteTable']['TransitGatewayRouteTableId']
+
+
+def tag_vpc(ec2_client, vpc_id, route_table_name):
+    ec2_client.create_tags(Resources=[vpc_id], Tags=[{'Key': os.environ['ASSOCIATION_TAG'], 'Value': route_table_name},
+                                                     {'Key': os.environ['PROPAGATION_TAG'], 'Value': route_table_name}])
+
+
+def execution_inputs(sfn_client):
+    return [json.loads(sfn_client.describe_execution(executionArn=execution['executionArn'])['input'])
+            for execution in sfn_client.list_executions(stateMachineArn=os.environ['STATE_MACHINE_ARN'])['executions']]
+
+
+def run_subnet_steps(sf_input):
+    """Runs the steps the state machine takes for a subnet tag event that needs no approval"""
+    event = sf_input
+    for class_name, function_name in (('VPC', 'describe_resources'),
+                                      ('TransitGateway', 'describe_transit_gateway_vpc_attachments'),
+                                      ('TransitGateway', 'describe_transit_gateway_route_tables'),
+                                      ('TransitGateway', 'tgw_attachment_crud_operations'),
+                                      ('VPC', 'default_route_crud_operations'),
+                                      ('TransitGateway', 'associate_transit_gateway_route_table'),
+                                      ('TransitGateway', 'enable_transit_gateway_route_table_propagation'),
+                                      ('TransitGateway', 'tag_transit_gateway_attachment')):
+        event = lambda_handler({'params': {'ClassName': class_name, 'FunctionName': function_name},
+                                'event': event}, LambdaContext())
+    return event
+
+
+def describe_attachments(ec2_client, vpc_id):
+    return [attachment for attachment in ec2_client.describe_transit_gateway_vpc_attachments(
+        Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])['TransitGatewayVpcAttachments']
+            if attachment['State'] != 'deleted']
+
+
+def test_coalesce_tag_events():
+    events = [(1, tag_event('subnet-1')), (2, tag_event('subnet-1')), (3, tag_event('vpc-1'))]
+
+    assert coalesce_tag_events(events) == {ACCOUNT_ID: {'subnet-1': [1, 2], 'vpc-1': [3]}}
+
+
+def test_requires_state_machine():
+    assert not requires_state_machine(tag_event('subnet-1'))
+    assert requires_state_machine(tag_event('subnet-1', os.environ['ROUTING_TAG']))
+    assert requires_state_machine(tag_event('vpc-1', os.environ['ASSOCIATION_TAG']))
+    assert requires_state_machine(tag_event('vpc-1', os.environ['PROPAGATION_TAG']))
+
+
+def test_get_handoff_action():
+    created = {'Action': 'CreateTgwVpcAttachment', 'DesiredSubnetIds': ['subnet-1'], 'RejectedSubnetIds': ['subnet-2']}
+    modified = {'Action': 'None', 'DesiredSubnetIds': ['subnet-1'], 'RejectedSubnetIds': []}
+    deleted = {'Action': 'DeleteTgwVpcAttachment', 'DesiredSubnetIds': [], 'RejectedSubnetIds': []}
+
+    assert get_handoff_action(created, 'subnet-1') == 'CreateTgwVpcAttachment'
+    assert get_handoff_action(created, 'subnet-2') is None
+    assert get_handoff_action(modified, 'subnet-1') == 'AddSubnet'
+    assert get_handoff_action(modified, 'subnet-3') == 'RemoveSubnet'
+    assert get_handoff_action(deleted, 'subnet-1') == 'DeleteTgwVpcAttachment'
+
+
+@mock_sts
+@mock_stepfunctions
+def test_batch_creates_one_attachment_with_all_subnets(ec2_client, org_client):
+    # ARRANGE
+    override_environment_variables()
+    sfn_client = create_state_machine()
+    os.environ['TGW_ID'] = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    vpc_id = ec2_client.create_vpc(CidrBlock='10.1.0.0/16')['Vpc']['VpcId']  # NOSONAR
+    subnet_a = create_subnet(ec2_client, vpc_id, '10.1.0.0/24', 'us-east-1a')  # NOSONAR
+    subnet_b = create_subnet(ec2_client, vpc_id, '10.1.1.0/24', 'us-east-1b')  # NOSONAR
+    subnet_a_2 = create_subnet(ec2_client, vpc_id, '10.1.2.0/24', 'us-east-1a')  # NOSONAR
+    create_subnet(ec2_client, vpc_id, '10.1.3.0/24', 'us-east-1c', tagged=False)  # NOSONAR
+
+    # ACT
+    response = batch_lambda_handler({
+        'events': [tag_event(subnet_a), tag_event(subnet_b), tag_event(subnet_a_2),
+                   tag_event(vpc_id, os.environ['ASSOCIATION_TAG'])]
+    }, LambdaContext())
+
+    # ASSERT
+    assert response['batchItemFailures'] == []
+    assert len(response['VpcResults']) == 2
+    forwarded, result = response['VpcResults']
+    assert forwarded['Status'] == 'forwarded'
+    assert result['Status'] == 'processed'
+    assert result['Action'] == 'CreateTgwVpcAttachment'
+    assert result['DesiredSubnetIds'] == sorted([min(subnet_a, subnet_a_2), subnet_b])
+    assert result['RejectedSubnetIds'] == [max(subnet_a, subnet_a_2)]
+    attachments = describe_attachments(ec2_client, vpc_id)
+    assert len(attachments) == 1
+    assert sorted(attachments[0]['SubnetIds']) == result['DesiredSubnetIds']
+    # every tag event continues in the state machine, the subnets in the attachment with the applied change
+    actions = {sf_input['resources'][0].split('/')[-1]: sf_input.get('Action') for sf_input in execution_inputs(sfn_client)}
+    assert actions == {vpc_id: None, subnet_a: get_handoff_action(result, subnet_a),
+                       subnet_b: 'CreateTgwVpcAttachment', subnet_a_2: get_handoff_action(result, subnet_a_2)}
+    assert sorted(action for action in actions.values() if action) == ['CreateTgwVpcAttachment'] * 2
+    assert len(result['ExecutionArns']) == 3
+
+
+@mock_sts
+@mock_stepfunctions
+def test_batch_created_attachment_ends_with_routes_and_route_tables(ec2_client, org_client, monkeypatch):
+    # ARRANGE
+    override_environment_variables()
+    monkeypatch.setenv('DEFAULT_ROUTE', 'All-Traffic')
+    sfn_client = create_state_machine()
+    tgw_id = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    os.environ['TGW_ID'] = tgw_id
+    tgw_route_table_id = create_tgw_route_table(ec2_client, tgw_id, 'flat')
+    vpc_id = ec2_client.create_vpc(CidrBlock='10.1.0.0/16')['Vpc']['VpcId']  # NOSONAR
+    tag_vpc(ec2_client, vpc_id, 'flat')
+    route_table_id = ec2_client.create_route_table(VpcId=vpc_id)['RouteTable']['RouteTableId']
+    subnet_ids = [create_subnet(ec2_client, vpc_id, '10.1.0.0/24', 'us-east-1a'),  # NOSONAR
+                  create_subnet(ec2_client, vpc_id, '10.1.1.0/24', 'us-east-1b')]  # NOSONAR
+    for subnet_id in subnet_ids:
+        ec2_client.associate_route_table(RouteTableId=route_table_id, SubnetId=subnet_id)
+
+    # ACT
+    response = batch_lambda_handler({'events': [tag_event(subnet_id) for subnet_id in subnet_ids]}, LambdaContext())
+    events = [run_subnet_steps(sf_input) for sf_input in execution_inputs(sfn_client)]
+
+    # ASSERT
+    assert response['VpcResults'][0]['Action'] == 'CreateTgwVpcAttachment'
+    attachment_id = response['VpcResults'][0]['TransitGatewayAttachmentId']
+    assert len(describe_attachments(ec2_client, vpc_id)) == 1
+    assert {event['RoutePlan']['Create'] == ['0.0.0.0/0'] for event in events} == {True, False}  # NOSONAR
+    routes = ec2_client.describe_route_tables(RouteTableIds=[route_table_id])['RouteTables'][0]['Routes']
+    assert [route['TransitGatewayId'] for route in routes if route.get('DestinationCidrBlock') == '0.0.0.0/0'] \
+        == [tgw_id]  # NOSONAR
+    associations = ec2_client.get_transit_gateway_route_table_associations(
+        TransitGatewayRouteTableId=tgw_route_table_id)['Associations']
+    assert [association['TransitGatewayAttachmentId'] for association in associations] == [attachment_id]
+    propagations = ec2_client.get_transit_gateway_route_table_propagations(
+        TransitGatewayRouteTableId=tgw_route_table_id)['TransitGatewayRouteTablePropagations']
+    assert [propagation['TransitGatewayAttachmentId'] for propagation in propagations] == [attachment_id]
+
+
+@mock_sts
+@mock_stepfunctions
+def test_batch_forwards_vpcs_that_require_approval(ec2_client, org_client):
+    # ARRANGE
+    override_environment_variables()
+    sfn_client = create_state_machine()
+    tgw_id = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    os.environ['TGW_ID'] = tgw_id
+    create_tgw_route_table(ec2_client, tgw_id, 'shared', approval_required='Yes')
+    vpc_id = ec2_client.create_vpc(CidrBlock='10.1.0.0/16')['Vpc']['VpcId']  # NOSONAR
+    tag_vpc(ec2_client, vpc_id, 'shared')
+    subnet_id = create_subnet(ec2_client, vpc_id, '10.1.0.0/24', 'us-east-1a')  # NOSONAR
+
+    # ACT
+    response = batch_lambda_handler({'events': [tag_event(subnet_id)]}, LambdaContext())
+
+    # ASSERT
+    assert response['VpcResults'][0]['Status'] == 'forwarded'
+    assert describe_attachments(ec2_client, vpc_id) == []
+    assert [sf_input.get('Action') for sf_input in execution_inputs(sfn_client)] == [None]
+
+
+@mock_sts
+@mock_stepfunctions
+def test_batch_modifies_and_deletes_existing_attachment(vpc_setup_with_explicit_route_table, ec2_client, org_client):
+    # ARRANGE
+    override_environment_variables()
+    create_state_machine()
+    os.environ['TGW_ID'] = vpc_setup_with_explicit_route_table['tgw_id']
+    vpc_id = vpc_setup_with_explicit_route_table['vpc_id']
+    attached_subnet = vpc_setup_with_explicit_route_table['subnet_id']
+    new_subnet = create_subnet(ec2_client, vpc_id, '10.0.0.16/28', 'us-east-1b')  # NOSONAR
+
+    # ACT
+    modify_response = batch_lambda_handler({'events': [tag_event(new_subnet), tag_event(attached_subnet)]},
+                                           LambdaContext())
+    ec2_client.delete_tags(Resources=[new_subnet], Tags=[{'Key': os.environ['ATTACHMENT_TAG']}])
+    delete_response = batch_lambda_handler({'events': [tag_event(new_subnet)]}, LambdaContext())
+
+    # ASSERT
+    modify_result = modify_response['VpcResults'][0]
+    assert modify_result['Action'] == 'ModifyTgwVpcAttachment'
+    assert modify_result['AddedSubnetIds'] == [new_subnet]
+    assert modify_result['RemovedSubnetIds'] == [attached_subnet]
+    assert delete_response['VpcResults'][0]['Action'] == 'DeleteTgwVpcAttachment'
+    assert describe_attachments(ec2_client, vpc_id) == []
+
+
+@mock_sts
+def test_batch_reports_busy_vpc_messages_as_failures(vpc_setup_with_explicit_route_table, org_client, mocker):
+    # ARRANGE
+    override_environment_variables()
+    mocker.patch(
+        'solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_batch_handler.'
+        'TransitGatewayVPCAttachmentBatch.get_desired_state',
+        side_effect=ResourceBusyException('modifying'))
+    subnet_id = vpc_setup_with_explicit_route_table['subnet_id']
+
+    # ACT
+    response = batch_lambda_handler({'Records': [
+        {'messageId': 'message-1', 'body': json.dumps(tag_event(subnet_id))},
+        {'messageId': 'message-2', 'body': json.dumps(tag_event('subnet-deleted'))},
+    ]}, LambdaContext())
+
+    # ASSERT
+    assert response['VpcResults'][0]['Status'] == 'busy'
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'message-1'}]
+
+
+@mock_sts
+def test_batch_reports_forwarding_failures(mocker):
+    # ARRANGE
+    override_environment_variables()
+    mocker.patch('solution.tgw_vpc_attachment.main.forward_to_state_machine', side_effect=ValueError('throttled'))
+
+    # ACT
+    response = batch_lambda_handler({'Records': [
+        {'messageId': 'message-1', 'body': json.dumps(tag_event('vpc-1', os.environ['PROPAGATION_TAG']))},
+    ]}, LambdaContext())
+
+    # ASSERT
+    assert response['VpcResults'] == []
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'message-1'}]
@@ -9,9 +9,10 @@ from mypy_boto3_ec2 import EC2Client
 
 from tests.tgw_vpc_attachment.conftest import override_environment_variables
 from solution.tgw_vpc_attachment.lib.clients.ec2 import EC2
-from solution.tgw_vpc_attachment.lib.exceptions import ResourceBusyException
+from solution.tgw_vpc_attachment.lib.exceptions import AlreadyConfiguredException, ResourceBusyException
 from solution.tgw_vpc_attachment.main import lambda_handler
-from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_handler import TransitGatewayVPCAttachments
+from solution.tgw_vpc_attachment.lib.handlers.tgw_vpc_attachment_handler import TransitGatewayVPCAttachments, \
+    get_tag_delta
 
 from unittest.mock import patch
 
@@ -191,6 +192,41 @@ def test_enable_transit_gateway_route_table_propagation_raises_exception(
         tgw_attachments.enable_transit_gateway_route_table_propagation()
 
 
+@mock_sts
+@mock_ec2
+@patch('solution.tgw_vpc_attachment.lib.clients.ec2.EC2.enable_transit_gateway_route_table_propagation')
+@patch.object(TransitGatewayVPCAttachments, '_get_propagation_route_tables_to_enable')
+def test_enable_transit_gateway_route_table_propagation_attempts_all_route_tables(
+        mock_get_propagation_rtb, mock_enable_propagation, vpc_setup_with_explicit_route_table):
+
+    # ARRANGE
+    vpc_setup_with_explicit_route_table['AttachmentState'] = "available"
+    mock_get_propagation_rtb.return_value = ['rtb-0000', 'rtb-0001', 'rtb-0002']
+    errors = {'rtb-0000': AlreadyConfiguredException('rtb-0000'), 'rtb-0001': ResourceBusyException('rtb-0001')}
+
+    def enable_propagation(route_table_id, _):
+        if route_table_id in errors:
+            raise errors[route_table_id]
+
+    mock_enable_propagation.side_effect = enable_propagation
+
+    # ACT
+    tgw_attachments = TransitGatewayVPCAttachments(vpc_setup_with_explicit_route_table)
+
+    # ASSERT
+    with pytest.raises(ResourceBusyException):
+        tgw_attachments.enable_transit_gateway_route_table_propagation()
+    assert sorted(call.args[0] for call in mock_enable_propagation.call_args_list) == \
+           ['rtb-0000', 'rtb-0001', 'rtb-0002']
+
+    # ACT
+    del errors['rtb-0001']
+
+    # ASSERT
+    with pytest.raises(AlreadyConfiguredException):
+        tgw_attachments.enable_transit_gateway_route_table_propagation()
+
+
 @mock_sts
 def test_enable_transit_gateway_route_table_propagation(vpc_setup_with_explicit_route_table):
     # ARRANGE
@@ -310,6 +346,17 @@ def test_tag_transit_gateway_attachment(vpc_setup_with_explicit_route_table):
     assert transit_gateway_vpc_attachment['Tags'][0]['Value'] == tag_value
 
 
+def test_get_tag_delta():
+    existing_tags = [{'Key': 'foo', 'Value': 'bar'}, {'Key': 'env', 'Value': 'dev'}]
+
+    assert get_tag_delta(existing_tags, {'foo': 'bar', 'env': 'prod', 'team': 'net'}) == [
+        {'Key': 'env', 'Value': 'prod'},
+        {'Key': 'team', 'Value': 'net'}
+    ]
+    assert get_tag_delta(existing_tags, {'foo': 'bar'}) == []
+    assert get_tag_delta(None, {'foo': 'bar'}) == [{'Key': 'foo', 'Value': 'bar'}]
+
+
 @mock_sts
 def test_subnet_deletion_event(vpc_setup_with_explicit_route_table):
     # ARRANGE
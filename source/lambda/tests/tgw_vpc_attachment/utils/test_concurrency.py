@@ -0,0 +1,21 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+from solution.tgw_vpc_attachment.lib.utils.concurrency import run_concurrently
+
+
+def fail_on_odd(item):
+    if item % 2:
+        raise ValueError(item)
+    return item * 10
+
+
+def test_run_concurrently_keeps_order_and_collects_errors():
+    results = run_concurrently(fail_on_odd, range(6), max_workers=3)
+
+    assert [result.item for result in results] == list(range(6))
+    assert [result.result for result in results if result.error is None] == [0, 20, 40]
+    assert [str(result.error) for result in results if result.error is not None] == ['1', '3', '5']
+
+
+def test_run_concurrently_without_items():
+    assert run_concurrently(fail_on_odd, []) == []
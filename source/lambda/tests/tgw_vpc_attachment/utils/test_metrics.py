@@ -10,6 +10,7 @@ import pytest
 from datetime import datetime
 from solution.tgw_vpc_attachment.lib.utils.metrics import (
     Metrics, 
+    MetricsSink,
     DecimalEncoder, 
     METRICS_TIMESTAMP_FORMAT
 )
@@ -276,3 +277,68 @@ class TestMetrics:
         assert is_valid_format, (
             f"Timestamp {timestamp} does not match expected format '{METRICS_TIMESTAMP_FORMAT}'"
         )
+
+
+class TestMetricsSink:
+    """Test class for MetricsSink"""
+
+    @patch('solution.tgw_vpc_attachment.lib.utils.metrics.HTTPSConnection')
+    def test_sink_flushes_full_buffer_on_one_connection(self, mock_connection_class):
+        """Test buffered payloads are sent over a single kept-alive connection"""
+        # ARRANGE
+        mock_connection = mock_connection_class.return_value
+        mock_connection.getresponse.return_value.status = 200
+        sink = MetricsSink(batch_size=3)
+
+        # ACT
+        sink.put({'index': 0})
+        sink.put({'index': 1})
+
+        # ASSERT
+        mock_connection.request.assert_not_called()
+
+        # ACT
+        sink.put({'index': 2})
+
+        # ASSERT
+        mock_connection_class.assert_called_once()
+        assert mock_connection.request.call_count == 3
+        method, path = mock_connection.request.call_args[0]
+        body = json.loads(mock_connection.request.call_args[1]['body'].decode('utf-8'))
+        assert (method, path) == ('POST', '/generic')
+        assert body['Data'] == {'index': 2}
+        assert body['Solution'] == 'SO0058'
+        assert sink.flush() == []
+
+    @patch('solution.tgw_vpc_attachment.lib.utils.metrics.HTTPSConnection')
+    def test_sink_reconnects_once_on_connection_error(self, mock_connection_class):
+        """Test a connection closed by the server is reopened"""
+        # ARRANGE
+        mock_connection = mock_connection_class.return_value
+        mock_connection.request.side_effect = [ConnectionResetError('reset'), None]
+        mock_connection.getresponse.return_value.status = 200
+        sink = MetricsSink()
+        sink.put({'test_key': 'test_value'})
+
+        # ACT
+        result = sink.flush()
+
+        # ASSERT
+        assert result == [200]
+        assert mock_connection_class.call_count == 2
+
+    @patch('solution.tgw_vpc_attachment.lib.utils.metrics.HTTPSConnection')
+    def test_sink_returns_error_after_retry(self, mock_connection_class):
+        """Test errors are reported per payload instead of raised"""
+        # ARRANGE
+        mock_connection_class.return_value.request.side_effect = OSError('unreachable')
+        sink = MetricsSink()
+        sink.put({'test_key': 'test_value'})
+
+        # ACT
+        result = sink.flush()
+
+        # ASSERT
+        assert result == ['unreachable']
+        assert mock_connection_class.call_count == 2
+
@@ -0,0 +1,64 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+from unittest.mock import Mock
+
+from solution.tgw_vpc_attachment.lib.exceptions import ResourceNotFoundException
+from solution.tgw_vpc_attachment.lib.utils.tag_writer import TagWriter
+
+
+def test_flush_combines_resources_with_the_same_tags():
+    # ARRANGE
+    ec2_client = Mock()
+    tag_writer = TagWriter(ec2_client)
+    tag_writer.add('subnet-1', 'STNOStatus-Subnet-Error', 'first')
+    tag_writer.add('subnet-1', 'STNOStatus-Subnet-Error', 'error')
+    tag_writer.add('subnet-2', 'STNOStatus-Subnet-Error', 'error')
+    tag_writer.add('vpc-1', 'STNOStatus-VPC-Error', 'error')
+
+    # ACT
+    calls = tag_writer.flush()
+
+    # ASSERT
+    assert calls == 2
+    ec2_client.create_tags_batch.assert_any_call(
+        ['subnet-1', 'subnet-2'], [{'Key': 'STNOStatus-Subnet-Error', 'Value': 'error'}])
+    ec2_client.create_tags_batch.assert_any_call(['vpc-1'], [{'Key': 'STNOStatus-VPC-Error', 'Value': 'error'}])
+    assert tag_writer.flush() == 0
+
+
+def test_flush_writes_all_keys_of_a_resource_in_one_call():
+    # ARRANGE
+    ec2_client = Mock()
+    tag_writer = TagWriter(ec2_client)
+    tag_writer.add('vpc-1', 'STNOStatus-VPCAssociation', 'pending')
+    tag_writer.add('vpc-1', 'STNOStatus-VPCPropagation', 'pending')
+
+    # ACT
+    tag_writer.flush()
+
+    # ASSERT
+    ec2_client.create_tags_batch.assert_called_once_with(['vpc-1'], [
+        {'Key': 'STNOStatus-VPCAssociation', 'Value': 'pending'},
+        {'Key': 'STNOStatus-VPCPropagation', 'Value': 'pending'}
+    ])
+
+
+def test_flush_tags_the_remaining_resources_when_one_was_deleted():
+    # ARRANGE
+    ec2_client = Mock()
+
+    def create_tags_batch(resource_ids, _tags_list):
+        if 'subnet-deleted' in resource_ids:
+            raise ResourceNotFoundException('InvalidSubnetID.NotFound')
+    ec2_client.create_tags_batch.side_effect = create_tags_batch
+    tag_writer = TagWriter(ec2_client)
+    for subnet_id in ['subnet-1', 'subnet-deleted', 'subnet-2']:
+        tag_writer.add(subnet_id, 'STNOStatus-Subnet', 'attached')
+
+    # ACT
+    calls = tag_writer.flush()
+
+    # ASSERT
+    assert calls == 4
+    ec2_client.create_tags_batch.assert_any_call('subnet-1', [{'Key': 'STNOStatus-Subnet', 'Value': 'attached'}])
+    ec2_client.create_tags_batch.assert_any_call('subnet-2', [{'Key': 'STNOStatus-Subnet', 'Value': 'attached'}])
@@ -0,0 +1,181 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_sts
+from mypy_boto3_ec2 import EC2Client
+
+from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from solution.tgw_vpc_attachment.lib.handlers.vpc_handler import VPCHandler
+
+TGW_STATUS_KEY = "STNOStatus-RouteTable"
+
+
+@pytest.fixture(autouse=True)
+def organizations(org_client):
+    # the handler looks up the account name and OU path of the spoke account
+    yield org_client
+
+
+def _vpc_handler(vpc_setup, **event) -> VPCHandler:
+    override_environment_variables()
+    os.environ["TGW_ID"] = vpc_setup['tgw_id']
+    event.update({
+        'account': '123456789012',
+        'VpcId': vpc_setup['vpc_id'],
+        'SubnetId': vpc_setup['subnet_id'],
+        'RouteTableId': vpc_setup['route_table_id'],
+    })
+    return VPCHandler(event)
+
+
+def _routes(ec2_client: EC2Client, route_table_id: str) -> dict:
+    route_table = ec2_client.describe_route_tables(RouteTableIds=[route_table_id])['RouteTables'][0]
+    return {route['DestinationCidrBlock']: route for route in route_table['Routes']}
+
+
+def _pending_tags(handler: VPCHandler, resource_id: str) -> dict:
+    return {key: value for (resource, key), value in handler.tag_writer.pending.items() if resource == resource_id}
+
+
+@mock_sts
+def test_apply_route_plan_creates_missing_routes(vpc_setup_with_explicit_route_table, ec2_client: EC2Client):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    handler = _vpc_handler(setup, Action='AddSubnet')
+    destinations = ['10.10.0.0/16', '10.20.0.0/16']  # NOSONAR
+
+    # ACT
+    handler._apply_route_plan(destinations, list(_routes(ec2_client, setup['route_table_id']).values()))
+
+    # ASSERT
+    routes = _routes(ec2_client, setup['route_table_id'])
+    for destination in destinations:
+        assert routes[destination]['TransitGatewayId'] == setup['tgw_id']
+    assert handler.event['RoutePlan']['Create'] == destinations
+    assert "added" in _pending_tags(handler, setup['route_table_id'])[TGW_STATUS_KEY]
+
+
+@mock_sts
+def test_apply_route_plan_replaces_blackhole_route(vpc_setup_with_explicit_route_table, ec2_client: EC2Client):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    stale_tgw_id = ec2_client.create_transit_gateway()['TransitGateway']['TransitGatewayId']
+    ec2_client.create_route(
+        RouteTableId=setup['route_table_id'],
+        DestinationCidrBlock='10.10.0.0/16',  # NOSONAR
+        TransitGatewayId=stale_tgw_id
+    )
+    existing_routes = list(_routes(ec2_client, setup['route_table_id']).values())
+    for route in existing_routes:
+        if route.get('TransitGatewayId') == stale_tgw_id:
+            route['State'] = 'blackhole'
+    handler = _vpc_handler(setup, Action='AddSubnet')
+
+    # ACT
+    handler._apply_route_plan(['10.10.0.0/16'], existing_routes)  # NOSONAR
+
+    # ASSERT
+    assert _routes(ec2_client, setup['route_table_id'])['10.10.0.0/16']['TransitGatewayId'] == setup['tgw_id']
+    assert handler.event['RoutePlan']['Replace'] == ['10.10.0.0/16']  # NOSONAR
+
+
+@mock_sts
+def test_apply_route_plan_tolerates_spoke_role_without_replace_route(
+        vpc_setup_with_explicit_route_table, ec2_client: EC2Client, mocker):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    existing_routes = [{
+        'DestinationCidrBlock': '10.10.0.0/16',  # NOSONAR
+        'TransitGatewayId': 'tgw-0123456789abcdef0',
+        'State': 'blackhole',
+    }]
+    handler = _vpc_handler(setup, Action='AddSubnet')
+    mocker.patch.object(handler.spoke_ec2_client, 'replace_route', side_effect=ClientError(
+        {'Error': {'Code': 'UnauthorizedOperation', 'Message': 'not authorized'}}, 'ReplaceRoute'))
+
+    # ACT
+    handler._apply_route_plan(['10.10.0.0/16', '10.20.0.0/16'], existing_routes)  # NOSONAR
+
+    # ASSERT
+    assert _routes(ec2_client, setup['route_table_id'])['10.20.0.0/16']['TransitGatewayId'] == setup['tgw_id']
+    assert handler.event['RoutePlan']['Replace'] == []
+    assert handler.event['RoutePlan']['Unchanged'] == ['10.10.0.0/16']  # NOSONAR
+    tags = _pending_tags(handler, setup['route_table_id'])
+    assert "ec2:ReplaceRoute" in tags[TGW_STATUS_KEY + "-Error"]
+    assert "added" in tags[TGW_STATUS_KEY]
+
+
+@mock_sts
+def test_apply_route_plan_raises_other_replace_route_errors(
+        vpc_setup_with_explicit_route_table, ec2_client: EC2Client, mocker):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    existing_routes = [{
+        'DestinationCidrBlock': '10.10.0.0/16',  # NOSONAR
+        'TransitGatewayId': 'tgw-0123456789abcdef0',
+        'State': 'blackhole',
+    }]
+    handler = _vpc_handler(setup, Action='AddSubnet')
+    mocker.patch.object(handler.spoke_ec2_client, 'replace_route', side_effect=ClientError(
+        {'Error': {'Code': 'InvalidRoute.NotFound', 'Message': 'no route'}}, 'ReplaceRoute'))
+
+    # ACT
+    with pytest.raises(ClientError):
+        handler._apply_route_plan(['10.10.0.0/16'], existing_routes)  # NOSONAR
+
+    # ASSERT
+    assert TGW_STATUS_KEY + "-Error" in _pending_tags(handler, setup['route_table_id'])
+
+
+@mock_sts
+def test_apply_route_plan_deletes_routes_to_tgw(vpc_setup_with_explicit_route_table, ec2_client: EC2Client):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    ec2_client.create_route(
+        RouteTableId=setup['route_table_id'],
+        DestinationCidrBlock='10.10.0.0/16',  # NOSONAR
+        TransitGatewayId=setup['tgw_id']
+    )
+    handler = _vpc_handler(setup, Action='DeleteTgwVpcAttachment')
+
+    # ACT
+    handler._apply_route_plan(['10.10.0.0/16'], list(_routes(ec2_client, setup['route_table_id']).values()))
+
+    # ASSERT
+    assert '10.10.0.0/16' not in _routes(ec2_client, setup['route_table_id'])  # NOSONAR
+    assert handler.event['RoutePlan']['Delete'] == ['10.10.0.0/16']  # NOSONAR
+    assert "removed" in _pending_tags(handler, setup['route_table_id'])[TGW_STATUS_KEY]
+
+
+@mock_sts
+def test_apply_route_plan_keeps_routes_used_by_other_subnets(
+        vpc_setup_with_explicit_route_table, ec2_client: EC2Client):
+    # ARRANGE
+    setup = vpc_setup_with_explicit_route_table
+    other_subnet_id = ec2_client.create_subnet(
+        CidrBlock='10.0.0.16/28',  # NOSONAR
+        VpcId=setup['vpc_id']
+    )['Subnet']['SubnetId']
+    ec2_client.associate_route_table(RouteTableId=setup['route_table_id'], SubnetId=other_subnet_id)
+    ec2_client.modify_transit_gateway_vpc_attachment(
+        TransitGatewayAttachmentId=setup['tgw_vpc_attachment'],
+        AddSubnetIds=[other_subnet_id]
+    )
+    ec2_client.create_route(
+        RouteTableId=setup['route_table_id'],
+        DestinationCidrBlock='10.10.0.0/16',  # NOSONAR
+        TransitGatewayId=setup['tgw_id']
+    )
+    handler = _vpc_handler(setup, Action='RemoveSubnet', RouteTableType='Explicit')
+
+    # ACT
+    handler._apply_route_plan(['10.10.0.0/16'], list(_routes(ec2_client, setup['route_table_id']).values()))
+
+    # ASSERT
+    assert _routes(ec2_client, setup['route_table_id'])['10.10.0.0/16']['TransitGatewayId'] == setup['tgw_id']
+    assert handler.event['RoutePlan']['Delete'] == []
+    assert handler.event['RoutePlan']['Unchanged'] == ['10.10.0.0/16']  # NOSONAR
+    assert _pending_tags(handler, setup['route_table_id']) == {}
@@ -271,6 +271,44 @@ def test_update_vpc_cidr_associate(organizations_setup, vpc_setup_with_multiple_
     assert '10.1.0.0/24' in cidrs
 
 
+@mock_sts
+def test_update_vpc_cidr_reports_counts(organizations_setup, vpc_setup_with_multiple_cidrs, dynamodb_table):
+    # ARRANGE
+    override_environment_variables()
+    vpc_id = vpc_setup_with_multiple_cidrs['vpc_id']
+    subnet_id = vpc_setup_with_multiple_cidrs['subnet_id']
+    for version, cidr in (('latest', '10.0.0.0/24'), ('v1', '10.0.0.0/24, 10.1.0.0/24')):
+        dynamodb_table.put_item(Item={'SubnetId': subnet_id, 'Version': version, 'VpcId': vpc_id, 'VpcCidr': cidr})
+    dynamodb_table.put_item(Item={'SubnetId': 'subnet-other', 'Version': 'latest', 'VpcId': 'vpc-other',
+                                  'VpcCidr': '10.9.0.0/24'})
+
+    # ACT
+    response = lambda_handler({
+        'params': {
+            'ClassName': 'VPC',
+            'FunctionName': 'update_vpc_cidr'
+        },
+        'event': {
+            'account': DEFAULT_ACCOUNT_ID,
+            'detail': {
+                'eventName': 'AssociateVpcCidrBlock',
+                'requestParameters': {
+                    'AssociateVpcCidrBlockRequest': {
+                        'VpcId': vpc_id,
+                        'CidrBlock': '10.1.0.0/24'
+                    }
+                },
+                'responseElements': {}
+            }
+        }
+    }, LambdaContext())
+
+    # ASSERT
+    assert response['VpcCidrUpdate'] == {'ItemsRead': 2, 'ItemsUpdated': 1, 'ItemsSkipped': 1}
+    item = dynamodb_table.get_item(Key={'SubnetId': 'subnet-other', 'Version': 'latest'})['Item']
+    assert item['VpcCidr'] == '10.9.0.0/24'
+
+
 @mock_sts
 def test_update_vpc_cidr_disassociate(organizations_setup, vpc_setup_with_multiple_cidrs, dynamodb_table):
     # ARRANGE
@@ -0,0 +1,105 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from moto import mock_sts
+from moto.core import DEFAULT_ACCOUNT_ID
+from mypy_boto3_ec2 import EC2Client
+
+from tests.tgw_vpc_attachment.conftest import override_environment_variables
+from solution.tgw_vpc_attachment.lib.handlers.route_planner import (
+    CREATE_ROUTES,
+    DELETE_ROUTES,
+    index_routes,
+    plan_route_changes
+)
+from solution.tgw_vpc_attachment.main import lambda_handler
+
+EXISTING_ROUTES = [
+    {'DestinationCidrBlock': '10.0.0.0/24', 'GatewayId': 'local'},
+    {'DestinationCidrBlock': '10.0.0.0/8', 'TransitGatewayId': 'tgw-1', 'State': 'active'},
+    {'DestinationCidrBlock': '172.16.0.0/12', 'TransitGatewayId': 'tgw-1', 'State': 'blackhole'},
+    {'DestinationCidrBlock': '192.168.0.0/16', 'NatGatewayId': 'nat-1', 'State': 'active'},
+    {'DestinationPrefixListId': 'pl-1', 'TransitGatewayId': 'tgw-1', 'State': 'active'},
+]
+
+
+def test_index_routes_by_cidr_and_prefix_list():
+    routes = index_routes(EXISTING_ROUTES)
+
+    assert set(routes) == {'10.0.0.0/24', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', 'pl-1'}
+
+
+def test_plan_create_routes():
+    plan = plan_route_changes(
+        ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', 'pl-1', 'pl-2', '100.64.0.0/10', 'pl-2'],
+        EXISTING_ROUTES,
+        CREATE_ROUTES
+    )
+
+    assert plan.create == ['pl-2', '100.64.0.0/10']
+    assert plan.replace == ['172.16.0.0/12']
+    assert plan.delete == []
+    # the route to the NAT gateway is not taken over
+    assert plan.unchanged == ['10.0.0.0/8', '192.168.0.0/16', 'pl-1']
+
+
+def test_plan_delete_routes():
+    plan = plan_route_changes(['10.0.0.0/8', '192.168.0.0/16', 'pl-1', 'pl-2'], EXISTING_ROUTES, DELETE_ROUTES)
+
+    assert plan.create == []
+    assert plan.delete == ['10.0.0.0/8', 'pl-1']
+    assert plan.unchanged == ['192.168.0.0/16', 'pl-2']
+    assert set(plan.existing) == {'10.0.0.0/8', '192.168.0.0/16', 'pl-1'}
+
+
+def test_plan_without_operation_changes_nothing():
+    plan = plan_route_changes(['10.0.0.0/8', 'pl-2'], EXISTING_ROUTES, None)
+
+    assert not plan.has_changes()
+    assert plan.unchanged == ['10.0.0.0/8', 'pl-2']
+
+
+@mock_sts
+def test_default_route_crud_operations_applies_route_plan(organizations_setup, vpc_setup_with_explicit_route_table,
+                                                          ec2_client: EC2Client):
+    # ARRANGE
+    override_environment_variables()
+    os.environ['DEFAULT_ROUTE'] = 'RFC-1918'
+    os.environ['RFC_1918_ROUTES'] = '10.1.0.0/16, 10.2.0.0/16, 10.3.0.0/16'
+    route_table_id = vpc_setup_with_explicit_route_table['route_table_id']
+    tgw_id = vpc_setup_with_explicit_route_table['tgw_id']
+    ec2_client.create_route(RouteTableId=route_table_id, DestinationCidrBlock='10.1.0.0/16', TransitGatewayId=tgw_id)
+    gateway = ec2_client.create_internet_gateway()['InternetGateway']
+    ec2_client.create_route(RouteTableId=route_table_id, DestinationCidrBlock='10.2.0.0/16',
+                            GatewayId=gateway['InternetGatewayId'])
+
+    # ACT
+    response = lambda_handler({
+        'params': {
+            'ClassName': 'VPC',
+            'FunctionName': 'default_route_crud_operations'
+        },
+        'event': {
+            'SubnetId': vpc_setup_with_explicit_route_table['subnet_id'],
+            'VpcId': vpc_setup_with_explicit_route_table['vpc_id'],
+            'account': DEFAULT_ACCOUNT_ID,
+            'region': 'us-east-1',
+            'Action': 'AddSubnet'
+        }}, LambdaContext())
+
+    # ASSERT
+    assert response['RoutePlan'] == {
+        'Create': ['10.3.0.0/16'],
+        'Replace': [],
+        'Delete': [],
+        'Unchanged': ['10.1.0.0/16', '10.2.0.0/16']
+    }
+    assert response['DestinationRouteExists'] == 'yes'
+    assert response['DefaultRouteToTgwExists'] == 'yes'
+    routes = ec2_client.describe_route_tables(RouteTableIds=[route_table_id])['RouteTables'][0]['Routes']
+    targets = {route.get('DestinationCidrBlock'): route.get('TransitGatewayId') or route.get('GatewayId')
+               for route in routes}
+    assert targets['10.3.0.0/16'] == tgw_id
+    assert targets['10.2.0.0/16'] == gateway['InternetGatewayId']
@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import os
+
+from solution.tgw_vpc_attachment.lib.clients.dynamodb import DDB
+from solution.tgw_vpc_attachment.lib.handlers.vpc_handler import VPCHandler
+
+
+def _put_items(table):
+    table.put_item(Item={'SubnetId': 'subnet-1', 'Version': 'latest', 'VpcId': 'vpc-1',
+                         'VpcCidr': '10.0.0.0/24'})  # NOSONAR
+    table.put_item(Item={'SubnetId': 'subnet-1', 'Version': 'v1', 'VpcId': 'vpc-1',
+                         'VpcCidr': '10.1.0.0/24'})  # NOSONAR
+    table.put_item(Item={'SubnetId': 'subnet-2', 'Version': 'latest', 'VpcId': 'vpc-2',
+                         'VpcCidr': '10.2.0.0/24'})  # NOSONAR
+
+
+def test_update_vpc_cidr_scans_without_the_vpc_id_index(dynamodb_table, mocker, monkeypatch):
+    # ARRANGE
+    monkeypatch.delenv('VPC_ID_INDEX_ENABLED', raising=False)
+    _put_items(dynamodb_table)
+    query_index = mocker.spy(DDB, 'query_index')
+
+    # ACT
+    counts = VPCHandler._update_vpc_cidr_in_ddb(dynamodb_table.table_name, 'vpc-1', '10.0.0.0/24')  # NOSONAR
+
+    # ASSERT
+    query_index.assert_not_called()
+    assert counts == {'ItemsRead': 2, 'ItemsUpdated': 1, 'ItemsSkipped': 1}
+    item = dynamodb_table.get_item(Key={'SubnetId': 'subnet-1', 'Version': 'v1'})['Item']
+    assert item['VpcCidr'] == '10.0.0.0/24'  # NOSONAR
+
+
+def test_update_vpc_cidr_queries_the_vpc_id_index_when_enabled(dynamodb_table, mocker, monkeypatch):
+    # ARRANGE
+    monkeypatch.setenv('VPC_ID_INDEX_ENABLED', 'Yes')
+    _put_items(dynamodb_table)
+    scan = mocker.spy(DDB, 'scan')
+
+    # ACT
+    counts = VPCHandler._update_vpc_cidr_in_ddb(dynamodb_table.table_name, 'vpc-1', '10.0.0.0/24')  # NOSONAR
+
+    # ASSERT
+    scan.assert_not_called()
+    assert counts == {'ItemsRead': 2, 'ItemsUpdated': 1, 'ItemsSkipped': 1}
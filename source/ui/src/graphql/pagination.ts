@@ -0,0 +1,28 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: Apache-2.0
+
+import {generateClient} from "aws-amplify/api";
+import {CommonItem} from "../types/CommonItem";
+
+type GraphQLClient = ReturnType<typeof generateClient>;
+
+// the resolvers query DynamoDB one page at a time, a page can be empty and still have a nextToken
+export const listAllItems = async (
+    client: GraphQLClient,
+    query: string,
+    fieldName: string,
+    variables: Record<string, unknown> = {}
+): Promise<CommonItem[]> => {
+    const items: CommonItem[] = [];
+    let nextToken: string | null = null;
+    do {
+        const result: any = await client.graphql({
+            query,
+            variables: {...variables, nextToken}
+        });
+        const page = result['data'][fieldName];
+        items.push(...(page['items'] as CommonItem[]));
+        nextToken = page['nextToken'];
+    } while (nextToken);
+    return items;
+}
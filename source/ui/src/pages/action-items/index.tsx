@@ -5,6 +5,7 @@ import React, {useContext, useEffect, useRef, useState} from "react";
 import {Button, ButtonDropdown, SpaceBetween} from "@cloudscape-design/components";
 import {generateClient} from "aws-amplify/api";
 import {getActionItemsFromTransitNetworkOrchestratorTables, getDashboardItemsFromTransitNetworkOrchestratorTables} from "../../graphql/queries";
+import {listAllItems} from "../../graphql/pagination";
 import {CommonItem} from "../../types/CommonItem";
 import {UserContext} from "../../components/context";
 import {updateTransitNetworkOrchestratorTable} from "../../graphql/mutation";
@@ -26,17 +27,14 @@ const ActionItems = () => {
     const groups = user?.groups || [];
     const loadActionItems = async () => {
         setLoading(true)
-        const [actionResult, dashboardResult] = await Promise.all([
-            client.graphql({ query: getActionItemsFromTransitNetworkOrchestratorTables }),
-            client.graphql({ query: getDashboardItemsFromTransitNetworkOrchestratorTables })
+        const [items, dashboardItems] = await Promise.all([
+            listAllItems(client, getActionItemsFromTransitNetworkOrchestratorTables, 'getActionItemsFromTransitNetworkOrchestratorTables'),
+            listAllItems(client, getDashboardItemsFromTransitNetworkOrchestratorTables, 'getDashboardItemsFromTransitNetworkOrchestratorTables')
         ])
 
-        // @ts-ignore
-        const items = actionResult['data']['getActionItemsFromTransitNetworkOrchestratorTables']['items'] as CommonItem[]
         setActionItems(items)
         actionItemsRef.current = items
-        // @ts-ignore
-        dashboardItemsRef.current = dashboardResult['data']['getDashboardItemsFromTransitNetworkOrchestratorTables']['items'] as CommonItem[]
+        dashboardItemsRef.current = dashboardItems
 
         setLoading(false)
     }
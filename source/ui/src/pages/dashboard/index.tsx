@@ -4,6 +4,7 @@
 import {useContext, useEffect, useState} from "react";
 import {Button} from "@cloudscape-design/components";
 import {getDashboardItemsFromTransitNetworkOrchestratorTables} from "../../graphql/queries";
+import {listAllItems} from "../../graphql/pagination";
 
 import {generateClient} from 'aws-amplify/api';
 import {UserContext} from "../../components/context";
@@ -24,12 +25,13 @@ const Dashboard = () => {
     const getDashboardItems = async () => {
         setLoading(true)
         setDashboardItem([])
-        const result = await client.graphql({
-            query: getDashboardItemsFromTransitNetworkOrchestratorTables
-        })
+        const items = await listAllItems(
+            client,
+            getDashboardItemsFromTransitNetworkOrchestratorTables,
+            'getDashboardItemsFromTransitNetworkOrchestratorTables'
+        )
 
-        // @ts-ignore
-        setDashboardItem(result['data']['getDashboardItemsFromTransitNetworkOrchestratorTables']['items'] as CommonItem[]);
+        setDashboardItem(items);
         setLoading(false);
     }
 
@@ -8,6 +8,7 @@ import {UserContext} from "../../components/context";
 import {VersionHistoryResultTable} from "../../components/table/ApplicationResultTable";
 import {generateClient} from "aws-amplify/api";
 import {getVersionHistoryForSubnetFromTransitNetworkOrchestratorTables} from "../../graphql/queries";
+import {listAllItems} from "../../graphql/pagination";
 import { CommonItem } from "../../types/CommonItem";
 import {columnDefinitions} from "../../components/table/ColumnDefinitions";
 
@@ -23,14 +24,13 @@ const DashboardVersionHistory = () => {
 
     const getVersionHistory = async (subnetId?: string) => {
         setLoading(true)
-        const result = await client.graphql({
-            query: getVersionHistoryForSubnetFromTransitNetworkOrchestratorTables,
-            variables: {
-                "filter": {"SubnetId": {"eq": subnetId}, "Version": {"ne": "latest"}}
-            }
-        })
-        // @ts-ignore
-        setVersionHistory(result['data']['getVersionHistoryForSubnetFromTransitNetworkOrchestratorTables']['items'] as CommonItem[])
+        const items = await listAllItems(
+            client,
+            getVersionHistoryForSubnetFromTransitNetworkOrchestratorTables,
+            'getVersionHistoryForSubnetFromTransitNetworkOrchestratorTables',
+            {"filter": {"SubnetId": {"eq": subnetId}, "Version": {"ne": "latest"}}}
+        )
+        setVersionHistory(items)
         setLoading(false)
     }
 